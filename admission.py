@@ -0,0 +1,209 @@
+"""
+Admission control module for the multi-model query application.
+
+Query and debate requests go through one bounded ``AdmissionQueue`` instead of
+each starting immediately; admitted coroutine jobs run on the shared async
+worker loop. At most ``max_active`` jobs run at once and the rest wait in FIFO
+order, up to ``max_depth`` jobs. Each session may hold at most ``per_session``
+jobs. Anything beyond that is rejected at once with a ``retry_after`` hint, so
+bursts don't pile onto a few Ollama slots.
+"""
+
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+from async_worker import AsyncWorker, async_worker
+
+
+class AdmissionRejected(Exception):
+    """Raised when a job can't be admitted; ``retry_after`` is in seconds."""
+
+    def __init__(self, reason: str, message: str, retry_after: float):
+        super().__init__(message)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+@dataclass
+class AdmissionTicket:
+    """One admitted job, queued or running."""
+    id: int
+    session_id: str
+    kind: str  # "query", "debate" or "dashboard"
+    estimate: float  # expected run time in seconds
+    target: Callable
+    args: Tuple = ()
+    enqueued_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+
+    def to_dict(self) -> Dict:
+        return {
+            'id': self.id,
+            'session_id': self.session_id,
+            'kind': self.kind,
+            'estimate': round(self.estimate, 1),
+            'waited': round((self.started_at or time.time()) - self.enqueued_at, 1)
+        }
+
+
+class AdmissionQueue:
+    """Bounded FIFO admission in front of the query and debate workers."""
+
+    def __init__(self, max_active: int = 2, max_depth: int = 10, per_session: int = 2,
+                 on_queued: Optional[Callable[[AdmissionTicket, int, float], None]] = None,
+                 worker: Optional[AsyncWorker] = None):
+        self.max_active = max(1, max_active)
+        self.max_depth = max(0, max_depth)
+        self.per_session = max(1, per_session)
+        self.on_queued = on_queued
+        self.worker = worker or async_worker
+        self.stats = {'admitted': 0, 'queued': 0, 'rejected': 0, 'cancelled': 0}
+        self._pending = deque()
+        self._active: Dict[int, AdmissionTicket] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config, on_queued=None) -> "AdmissionQueue":
+        """Build a queue from the ``admission_*`` settings of a ConfigManager."""
+        return cls(
+            max_active=config.get("admission_max_active", 2),
+            max_depth=config.get("admission_max_depth", 10),
+            per_session=config.get("admission_per_session", 2),
+            on_queued=on_queued
+        )
+
+    def submit(self, session_id: str, kind: str, target: Callable, args: Tuple = (),
+               estimate: float = 30.0) -> AdmissionTicket:
+        """Run ``target(*args)`` now or queue it; raises AdmissionRejected when full.
+
+        Coroutine functions run on the async worker loop; plain callables get a thread.
+        """
+        ticket = AdmissionTicket(next(self._ids), session_id, kind, estimate, target, args)
+        with self._lock:
+            held = [t for t in itertools.chain(self._active.values(), self._pending) if t.session_id == session_id]
+            if len(held) >= self.per_session:
+                self.stats['rejected'] += 1
+                retry_after = min(self._finish_eta_locked(t) for t in held)
+                raise AdmissionRejected(
+                    'session_limit',
+                    f"You already have {len(held)} requests in progress; try again in ~{retry_after:.0f}s",
+                    round(retry_after, 1)
+                )
+
+            if len(self._active) < self.max_active and not self._pending:
+                ticket.started_at = time.time()
+                self._active[ticket.id] = ticket
+                self.stats['admitted'] += 1
+                queued = False
+            elif len(self._pending) >= self.max_depth:
+                self.stats['rejected'] += 1
+                retry_after = self._eta_locked(len(self._pending))
+                raise AdmissionRejected(
+                    'queue_full',
+                    f"Server is busy ({len(self._pending)} requests waiting); try again in ~{retry_after:.0f}s",
+                    round(retry_after, 1)
+                )
+            else:
+                self._pending.append(ticket)
+                self.stats['queued'] += 1
+                queued = True
+
+        if queued:
+            self._notify_positions()
+        else:
+            self._start(ticket)
+        return ticket
+
+    def cancel(self, session_id: str, kind: Optional[str] = None) -> int:
+        """Drop a session's queued (not yet running) jobs; returns how many were removed."""
+        with self._lock:
+            removed = [t for t in self._pending if t.session_id == session_id and kind in (None, t.kind)]
+            for ticket in removed:
+                self._pending.remove(ticket)
+            self.stats['cancelled'] += len(removed)
+        if removed:
+            self._notify_positions()
+        return len(removed)
+
+    def status(self) -> Dict:
+        with self._lock:
+            return {
+                'max_active': self.max_active,
+                'max_depth': self.max_depth,
+                'per_session': self.per_session,
+                'active': [t.to_dict() for t in self._active.values()],
+                'queued': [dict(t.to_dict(), position=i + 1, eta=round(self._eta_locked(i), 1))
+                           for i, t in enumerate(self._pending)],
+                'stats': dict(self.stats)
+            }
+
+    def _eta_locked(self, position: int) -> float:
+        """Seconds until the job at ``position`` (0 = head of the queue) can start."""
+        now = time.time()
+        slots = [max(0.0, t.estimate - (now - t.started_at)) for t in self._active.values()]
+        slots += [0.0] * (self.max_active - len(slots))
+        heapq.heapify(slots)
+        for ticket in list(self._pending)[:position]:
+            heapq.heappush(slots, heapq.heappop(slots) + ticket.estimate)
+        return slots[0]
+
+    def _finish_eta_locked(self, ticket: AdmissionTicket) -> float:
+        if ticket.started_at is not None:
+            return max(0.0, ticket.estimate - (time.time() - ticket.started_at))
+        return self._eta_locked(self._pending.index(ticket)) + ticket.estimate
+
+    def _start(self, ticket: AdmissionTicket):
+        if asyncio.iscoroutinefunction(ticket.target):
+            future = self.worker.submit(ticket.target(*ticket.args))
+            future.add_done_callback(lambda done: self._done(ticket, done.exception() if not done.cancelled() else None))
+            return
+        thread = threading.Thread(target=self._run, args=(ticket,), name=f"{ticket.kind}-{ticket.id}")
+        thread.daemon = True
+        thread.start()
+
+    def _run(self, ticket: AdmissionTicket):
+        error = None
+        try:
+            ticket.target(*ticket.args)
+        except Exception as e:
+            error = e
+        self._done(ticket, error)
+
+    def _done(self, ticket: AdmissionTicket, error: Optional[BaseException]):
+        if error:
+            print(f"⚠️  {ticket.kind} job {ticket.id} failed: {error}")
+        self._finish(ticket)
+
+    def _finish(self, ticket: AdmissionTicket):
+        started: List[AdmissionTicket] = []
+        with self._lock:
+            self._active.pop(ticket.id, None)
+            while self._pending and len(self._active) < self.max_active:
+                next_ticket = self._pending.popleft()
+                next_ticket.started_at = time.time()
+                self._active[next_ticket.id] = next_ticket
+                self.stats['admitted'] += 1
+                started.append(next_ticket)
+        for next_ticket in started:
+            self._start(next_ticket)
+        if started:
+            self._notify_positions()
+
+    def _notify_positions(self):
+        """Tell every waiting job its (1-based) position and ETA."""
+        if not self.on_queued:
+            return
+        with self._lock:
+            positions = [(t, i + 1, self._eta_locked(i)) for i, t in enumerate(self._pending)]
+        for ticket, position, eta in positions:
+            try:
+                self.on_queued(ticket, position, eta)
+            except Exception as e:
+                print(f"⚠️  Queue notification failed: {e}")
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+ASGI server mode for the unified application.
+
+The default ``python unified_app.py`` runs Flask-SocketIO in threading mode,
+where every long-lived stream is driven by OS threads. This module serves
+the same routes and events from one asyncio loop instead:
+
+- Socket.IO runs on python-socketio's ``AsyncServer``, and the unified app's
+  ``RoomEmitter`` is rebound to it, so emits are coroutines on the server loop;
+- the async worker adopts the server loop, so query and debate jobs (model
+  streams included) run there as well;
+- the dashboard updater is a coroutine;
+- the Flask routes (short JSON/page handlers) are served unchanged through
+  a small WSGI bridge that runs each HTTP request in the default executor.
+
+Run with ``python asgi_app.py`` or ``uvicorn asgi_app:application`` (needs
+``pip install uvicorn``).
+"""
+
+import asyncio
+import io
+import sys
+from typing import Callable, Dict, List, Optional
+
+import socketio
+
+try:
+    import uvicorn
+except ImportError:
+    uvicorn = None
+
+import unified_app as unified
+from async_worker import async_worker, uvloop
+from socket_rooms import RoomEmitter
+
+sio = socketio.AsyncServer(async_mode='asgi', cors_allowed_origins='*', serializer=unified.wire.serializer)
+
+
+class AsyncServerBridge:
+    """The Flask-SocketIO surface ``RoomEmitter`` uses, backed by an ``AsyncServer``.
+
+    ``emit`` schedules the send as a task when called on the server loop (in
+    call order, so chunks stay ordered) and hands it to the loop when called
+    from another thread (background refresher, usage sampler).
+    """
+
+    def __init__(self, server: socketio.AsyncServer):
+        self.server = self
+        self.sio = server
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._tasks = set()
+
+    @property
+    def manager(self):
+        return self.sio.manager
+
+    def emit(self, event: str, data=None, room=None, to=None, namespace='/', callback=None, ignore_queue=False):
+        coro = self.sio.emit(event, data, to=to or room, namespace=namespace, callback=callback,
+                             ignore_queue=ignore_queue)
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is not None and running is self.loop:
+            task = running.create_task(coro)
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        elif self.loop is not None and self.loop.is_running():
+            asyncio.run_coroutine_threadsafe(coro, self.loop)
+        else:
+            coro.close()
+
+    def enter_room(self, sid: str, room: str, namespace: str = '/'):
+        self.sio.manager.basic_enter_room(sid, namespace, room)
+
+    def leave_room(self, sid: str, room: str, namespace: str = '/'):
+        self.sio.manager.basic_leave_room(sid, namespace, room)
+
+
+class WSGIBridge:
+    """Serve a WSGI app over ASGI HTTP; each request runs in the default executor."""
+
+    def __init__(self, wsgi_app: Callable):
+        self.wsgi_app = wsgi_app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return
+        body = b''
+        more = True
+        while more:
+            message = await receive()
+            body += message.get('body', b'')
+            more = message.get('more_body', False)
+
+        response: Dict = {}
+
+        def start_response(status, headers, exc_info=None):
+            response['status'] = int(status.split(' ', 1)[0])
+            response['headers'] = headers
+            return lambda data: None
+
+        loop = asyncio.get_running_loop()
+        chunks = await loop.run_in_executor(None, self._call, self.environ(scope, body), start_response)
+        await send({
+            'type': 'http.response.start',
+            'status': response['status'],
+            'headers': [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                        for name, value in response['headers']]
+        })
+        await send({'type': 'http.response.body', 'body': b''.join(chunks)})
+
+    def _call(self, environ: Dict, start_response) -> List[bytes]:
+        result = self.wsgi_app(environ, start_response)
+        try:
+            return list(result)
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+
+    @staticmethod
+    def environ(scope: Dict, body: bytes) -> Dict:
+        """Build a PEP 3333 environ from an ASGI HTTP scope."""
+        server = scope.get('server') or ('localhost', 80)
+        client = scope.get('client') or ('', 0)
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+            'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+            'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+            'SERVER_NAME': str(server[0]),
+            'SERVER_PORT': str(server[1]),
+            'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+            'REMOTE_ADDR': client[0],
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': io.BytesIO(body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False
+        }
+        for name, value in scope.get('headers', []):
+            name, value = name.decode('latin-1'), value.decode('latin-1')
+            if name == 'content-type':
+                environ['CONTENT_TYPE'] = value
+            elif name == 'content-length':
+                environ['CONTENT_LENGTH'] = value
+            else:
+                key = 'HTTP_' + name.upper().replace('-', '_')
+                environ[key] = f"{environ[key]},{value}" if key in environ else value
+        return environ
+
+
+bridge = AsyncServerBridge(sio)
+# Every emit in unified_app (streams, queue updates, dashboard) now goes through the async server
+unified.emitter = RoomEmitter(bridge, unified.emitter.topics)
+_background: List[asyncio.Task] = []
+
+
+async def _reply(sid: str, reply):
+    if reply:
+        await sio.emit(reply[0], reply[1], to=sid)
+
+
+@sio.event
+async def connect(sid, environ, auth=None):
+    print(f"Client connected: {sid}")
+    await sio.emit('connected', {'session_id': sid}, to=sid)
+    unified.sessions.touch(sid)
+    unified.emitter.probe_rtt(sid)
+
+
+@sio.event
+async def disconnect(sid, *args):
+    print(f"Client disconnected: {sid}")
+    unified.end_session(sid)
+
+
+@sio.on('subscribe')
+async def handle_subscribe(sid, data):
+    topics = unified.subscribe_topics(sid, data)
+    await sio.emit('subscribed', {'topics': topics}, to=sid)
+
+
+@sio.on('unsubscribe')
+async def handle_unsubscribe(sid, data):
+    unified.unsubscribe_topics(sid, data)
+
+
+@sio.on('query_models')
+async def handle_query(sid, data):
+    await _reply(sid, unified.submit_query(data, sid))
+
+
+@sio.on('start_debate')
+async def handle_start_debate(sid, data):
+    await _reply(sid, unified.submit_debate(data, sid))
+
+
+@sio.on('ask_llm')
+async def handle_ask_llm(sid, data):
+    await _reply(sid, unified.submit_dashboard_question(data, sid))
+
+
+@sio.on('cancel_query')
+async def handle_cancel_query(sid, data):
+    unified.cancel_job(sid, 'query')
+
+
+@sio.on('cancel_debate')
+async def handle_cancel_debate(sid, data):
+    unified.cancel_job(sid, 'debate')
+
+
+async def dashboard_updates(idle: float = 1.0):
+    """Push due dashboard widgets to their subscribers from the server loop."""
+    while True:
+        try:
+            delay = unified.dashboard_feed.tick()
+        except Exception as e:
+            print(f"Dashboard update error: {e}")
+            delay = 10.0
+        # New subscribers get their snapshot on subscribe; only the cadence is polled here
+        await asyncio.sleep(idle if delay is None else min(delay, idle))
+
+
+async def startup():
+    loop = asyncio.get_running_loop()
+    bridge.loop = loop
+    async_worker.adopt(loop)
+    # Ollama model listing is blocking I/O; run it once off the loop
+    await loop.run_in_executor(None, unified.start_background_services)
+    _background.append(loop.create_task(dashboard_updates()))
+    print("📊 Dashboard updates running on the server loop")
+
+
+async def shutdown():
+    for task in _background:
+        task.cancel()
+    await asyncio.gather(*_background, return_exceptions=True)
+    await async_worker.shutdown()
+
+
+application = socketio.ASGIApp(sio, other_asgi_app=WSGIBridge(unified.app),
+                               on_startup=startup, on_shutdown=shutdown)
+
+
+def main(host: str = '0.0.0.0', port: int = 5000) -> int:
+    if uvicorn is None:
+        print("❌ ASGI mode needs uvicorn: pip install uvicorn")
+        return 1
+    use_uvloop = unified.config_manager.get("use_uvloop", True)
+    loop = "uvloop" if use_uvloop and uvloop is not None else "asyncio"
+    print(f"🚀 Starting Unified Multi-Model Application (ASGI, {loop})...")
+    print(f"📡 Server will be available at: http://localhost:{port}")
+    uvicorn.run(application, host=host, port=port, loop=loop, log_level="warning")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
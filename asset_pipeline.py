@@ -0,0 +1,184 @@
+"""
+Asset pipeline module for the web apps.
+
+The page templates carry thousands of lines of inline CSS and JavaScript,
+which were rendered and sent uncompressed, uncached, on every page load.
+``AssetPipeline`` needs no build step; the first time a page is served
+(or at startup, via ``warm``) it:
+
+- renders the template once and moves every inline ``<style>`` and
+  ``<script>`` block into a content-hashed asset (``/assets/<page>.<hash>.css``),
+  served with ``Cache-Control: immutable`` since its URL changes with its content;
+- keeps the remaining HTML shell in rendered form, revalidated by ETag;
+- precompresses shell and assets with gzip (and brotli when installed) and
+  picks the encoding from ``Accept-Encoding``.
+
+Assets are also written to ``asset_dir`` (with ``.gz``/``.br`` siblings) for
+a front-end web server to serve directly.
+"""
+
+import gzip
+import hashlib
+import os
+import re
+import threading
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Optional, Tuple
+
+from flask import Response, current_app, render_template, request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+ASSET_PREFIX = '/assets/'
+DEFAULT_ASSET_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'assets')
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+# Inline blocks only: <script src=...> tags have attributes and are left alone
+_INLINE = re.compile(r'<(style|script)>(.*?)</\1>', re.DOTALL | re.IGNORECASE)
+_CONTENT_TYPES = {
+    'css': 'text/css; charset=utf-8',
+    'js': 'text/javascript; charset=utf-8',
+    'html': 'text/html; charset=utf-8'
+}
+
+
+@dataclass
+class Encoded:
+    """One response body in every encoding worth sending."""
+    content_type: str
+    etag: str
+    bodies: Dict[str, bytes] = field(default_factory=dict)
+
+    @classmethod
+    def build(cls, body: bytes, content_type: str) -> "Encoded":
+        encoded = cls(content_type, hashlib.sha256(body).hexdigest()[:16], {'identity': body})
+        variants = {'gzip': gzip.compress(body, 9, mtime=0)}
+        if brotli is not None:
+            variants['br'] = brotli.compress(body, quality=11)
+        for encoding, compressed in variants.items():
+            if len(compressed) < len(body):
+                encoded.bodies[encoding] = compressed
+        return encoded
+
+    def negotiate(self, accept_encodings) -> Tuple[str, bytes]:
+        """Smallest body the client accepts (``accept_encodings`` as in ``request.accept_encodings``)."""
+        for encoding in ('br', 'gzip'):
+            if encoding in self.bodies and accept_encodings[encoding] > 0:
+                return encoding, self.bodies[encoding]
+        return 'identity', self.bodies['identity']
+
+    def sizes(self) -> Dict[str, int]:
+        return {encoding: len(body) for encoding, body in self.bodies.items()}
+
+
+class AssetPipeline:
+    """Rendered page shells plus the hashed assets extracted from them."""
+
+    def __init__(self, enabled: bool = True, asset_dir: Optional[str] = DEFAULT_ASSET_DIR):
+        self.enabled = enabled
+        self.asset_dir = asset_dir
+        self.pages: Dict[Tuple, Encoded] = {}
+        self.assets: Dict[str, Encoded] = {}
+        self.page_assets: Dict[Tuple, list] = {}
+        self._uptodate: Dict[Tuple, Callable[[], bool]] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config) -> "AssetPipeline":
+        return cls(enabled=config.get("asset_pipeline", True),
+                   asset_dir=config.get("asset_dir", DEFAULT_ASSET_DIR))
+
+    def page(self, template: str, **context) -> Response:
+        """Serve ``template`` as a cached shell (or rendered as usual when the pipeline is off)."""
+        if not self.enabled:
+            return Response(render_template(template, **context), mimetype='text/html')
+        key = (template, tuple(sorted(context.items())))
+        page = self.pages.get(key)
+        # In debug mode, an edited template is picked up on the next request
+        if page is None or (current_app.jinja_env.auto_reload and not self._uptodate[key]()):
+            page = self._build_page(key, template, context)
+        return self._respond(page, 'no-cache')
+
+    def asset(self, name: str) -> Response:
+        """Serve an extracted asset by its hashed file name."""
+        asset = self.assets.get(name)
+        if asset is None:
+            return Response('Not found', status=404, mimetype='text/plain')
+        return self._respond(asset, IMMUTABLE)
+
+    def warm(self, app, template: str, **context):
+        """Build a page ahead of its first request (call at startup)."""
+        if self.enabled:
+            with app.test_request_context('/'):
+                key = (template, tuple(sorted(context.items())))
+                if key not in self.pages:
+                    self._build_page(key, template, context)
+
+    def _build_page(self, key: Tuple, template: str, context: Dict) -> Encoded:
+        stem = os.path.splitext(os.path.basename(template))[0]
+        _, _, uptodate = current_app.jinja_env.loader.get_source(current_app.jinja_env, template)
+        html = render_template(template, **context)
+        names = []
+
+        def extract(match):
+            kind, body = match.group(1).lower(), match.group(2)
+            ext = 'css' if kind == 'style' else 'js'
+            data = body.strip().encode('utf-8')
+            name = f"{stem}.{hashlib.sha256(data).hexdigest()[:12]}.{ext}"
+            if name not in self.assets:
+                self.assets[name] = Encoded.build(data, _CONTENT_TYPES[ext])
+                self._write(name, self.assets[name])
+            names.append(name)
+            if ext == 'css':
+                return f'<link rel="stylesheet" href="{ASSET_PREFIX}{name}">'
+            return f'<script src="{ASSET_PREFIX}{name}"></script>'
+
+        with self._lock:
+            shell = _INLINE.sub(extract, html)
+            page = Encoded.build(shell.encode('utf-8'), _CONTENT_TYPES['html'])
+            self.pages[key] = page
+            self.page_assets[key] = names
+            self._uptodate[key] = uptodate or (lambda: True)
+        return page
+
+    def _write(self, name: str, asset: Encoded):
+        if not self.asset_dir:
+            return
+        try:
+            os.makedirs(self.asset_dir, exist_ok=True)
+            suffixes = {'identity': '', 'gzip': '.gz', 'br': '.br'}
+            for encoding, body in asset.bodies.items():
+                path = os.path.join(self.asset_dir, name + suffixes[encoding])
+                if os.path.exists(path):
+                    continue
+                # Workers of a fleet may write the same asset at once
+                temp = f"{path}.{os.getpid()}.tmp"
+                with open(temp, 'wb') as f:
+                    f.write(body)
+                os.replace(temp, path)
+        except OSError as e:
+            print(f"⚠️  Could not write asset {name}: {e}")
+
+    def _respond(self, encoded: Encoded, cache_control: str) -> Response:
+        encoding, body = encoded.negotiate(request.accept_encodings)
+        response = Response(body, content_type=encoded.content_type)
+        if encoding != 'identity':
+            response.headers['Content-Encoding'] = encoding
+        response.headers['Vary'] = 'Accept-Encoding'
+        response.headers['Cache-Control'] = cache_control
+        response.set_etag(f"{encoded.etag}-{encoding}")
+        return response.make_conditional(request)
+
+    def stats(self) -> Dict:
+        """Bytes per page: shell and assets, per encoding."""
+        with self._lock:
+            return {
+                key[0]: {
+                    'shell': self.pages[key].sizes(),
+                    'assets': {name: self.assets[name].sizes() for name in self.page_assets[key]}
+                }
+                for key in self.pages
+            }
@@ -0,0 +1,129 @@
+"""
+Async worker module for the multi-model query application.
+
+One dedicated thread runs a persistent event loop (uvloop when installed) for
+every query and debate job. Request handlers hand coroutines over with
+``run_coroutine_threadsafe`` instead of starting a thread and a fresh event
+loop per request, so all sessions share one aiohttp connection pool, the same
+caches and one scheduler. An ASGI server can instead ``adopt`` its own loop,
+so jobs run on the server's loop with no thread at all.
+"""
+
+import asyncio
+import atexit
+import concurrent.futures
+import threading
+from typing import Awaitable, Callable, List, Optional
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+
+class AsyncWorker:
+    """A long-lived event loop running in its own daemon thread."""
+
+    def __init__(self, name: str = "async-worker"):
+        self.name = name
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.loop_type = ""
+        self.shutdown_hooks: List[Callable[[], Awaitable]] = []
+        self._thread: Optional[threading.Thread] = None
+        self._adopted = False
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        if self._adopted:
+            return self.loop.is_running()
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, use_uvloop: bool = True) -> asyncio.AbstractEventLoop:
+        """Start the loop thread (idempotent) and return its loop."""
+        with self._lock:
+            if self.running:
+                return self.loop
+            if use_uvloop and uvloop is not None:
+                self.loop, self.loop_type = uvloop.new_event_loop(), "uvloop"
+            else:
+                self.loop, self.loop_type = asyncio.new_event_loop(), "asyncio"
+            ready = threading.Event()
+            self._thread = threading.Thread(target=self._run, args=(ready,), name=self.name, daemon=True)
+            self._thread.start()
+            ready.wait()
+            atexit.register(self.stop)
+        print(f"🔄 Async worker loop started ({self.loop_type})")
+        return self.loop
+
+    def adopt(self, loop: Optional[asyncio.AbstractEventLoop] = None) -> asyncio.AbstractEventLoop:
+        """Run jobs on an existing loop (default: the running one) instead of a thread.
+
+        The loop's owner is responsible for awaiting ``shutdown()`` before it stops.
+        """
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                raise RuntimeError("Async worker already runs its own loop thread")
+            self.loop = loop or asyncio.get_running_loop()
+            self.loop_type = "uvloop" if type(self.loop).__module__.startswith("uvloop") else "asyncio"
+            self._adopted = True
+        print(f"🔄 Async worker adopted the server loop ({self.loop_type})")
+        return self.loop
+
+    def _run(self, ready: threading.Event):
+        asyncio.set_event_loop(self.loop)
+        self.loop.call_soon(ready.set)
+        try:
+            self.loop.run_forever()
+        finally:
+            pending = asyncio.all_tasks(self.loop)
+            for task in pending:
+                task.cancel()
+            self.loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+            self.loop.run_until_complete(self.loop.shutdown_asyncgens())
+            self.loop.close()
+
+    def submit(self, coro: Awaitable) -> concurrent.futures.Future:
+        """Schedule a coroutine on the worker loop from any thread."""
+        if not self.running:
+            self.start()
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro: Awaitable, timeout: Optional[float] = None):
+        """Run a coroutine on the worker loop and wait for its result."""
+        return self.submit(coro).result(timeout)
+
+    def owns_current_loop(self) -> bool:
+        """True when called from a coroutine running on the worker loop."""
+        try:
+            return self.loop is not None and asyncio.get_running_loop() is self.loop
+        except RuntimeError:
+            return False
+
+    def add_shutdown_hook(self, hook: Callable[[], Awaitable]):
+        """Register a coroutine function to await on the loop before it stops."""
+        self.shutdown_hooks.append(hook)
+
+    async def shutdown(self):
+        """Await the shutdown hooks on the current loop (adopted mode)."""
+        for hook in self.shutdown_hooks:
+            try:
+                await hook()
+            except Exception as e:
+                print(f"⚠️  Async worker shutdown hook failed: {e}")
+
+    def stop(self, timeout: float = 5.0):
+        """Run shutdown hooks, stop the loop and join the thread."""
+        if not self.running or self._adopted:
+            return
+        for hook in self.shutdown_hooks:
+            try:
+                self.run(hook(), timeout)
+            except Exception as e:
+                print(f"⚠️  Async worker shutdown hook failed: {e}")
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout)
+
+
+# Global instance
+async_worker = AsyncWorker()
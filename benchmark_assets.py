@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Page-load benchmark for the asset pipeline (works offline).
+
+Requests the unified app's pages through Flask's test client the way a
+browser would and reports, per page, bytes transferred and an estimated
+time to interactive over a simulated link for:
+
+- inline:   the template rendered on every request, uncompressed, uncached
+- cold:     pipeline shell plus its hashed assets, gzip/brotli-encoded
+- warm:     a repeat visit: the shell revalidates (304), assets come from cache
+
+Time to interactive is modelled as server time + one round trip and the
+transfer time of the HTML, then (when there are assets) one more round
+trip and the assets sharing the link; parse/eval time in the browser is
+not included.
+
+Usage: python benchmark_assets.py [--mbps 10] [--rtt-ms 50] [--runs 20]
+"""
+
+import argparse
+import gzip
+import re
+import sys
+import time
+
+import unified_app as unified
+from asset_pipeline import brotli
+
+ASSET_LINK = re.compile(r'/assets/[\w.]+')
+HEADER_BYTES = 300  # rough size of response headers per request
+
+
+def _load(client, path, headers, runs):
+    """Fastest of ``runs`` requests: (response, server seconds)."""
+    best = None
+    for _ in range(runs):
+        started = time.perf_counter()
+        response = client.get(path, headers=headers)
+        elapsed = time.perf_counter() - started
+        if best is None or elapsed < best[1]:
+            best = (response, elapsed)
+    return best
+
+
+def _tti(server_seconds, html_bytes, asset_bytes, mbps, rtt):
+    bytes_per_second = mbps * 1e6 / 8
+    seconds = server_seconds + rtt + html_bytes / bytes_per_second
+    if asset_bytes:
+        seconds += rtt + asset_bytes / bytes_per_second
+    return seconds
+
+
+def measure(path, mbps, rtt, runs):
+    client = unified.app.test_client()
+    encodings = {'Accept-Encoding': 'gzip, deflate, br'}
+    results = []
+
+    unified.assets.enabled = False
+    response, server = _load(client, path, encodings, runs)
+    size = len(response.data) + HEADER_BYTES
+    results.append(('inline', 1, size, _tti(server, size, 0, mbps, rtt)))
+
+    unified.assets.enabled = True
+    response, server = _load(client, path, encodings, runs)
+    shell = len(response.data) + HEADER_BYTES
+    body = response.get_data()
+    if response.headers.get('Content-Encoding') == 'gzip':
+        body = gzip.decompress(body)
+    elif response.headers.get('Content-Encoding') == 'br':
+        body = brotli.decompress(body)
+    assets = [client.get(link, headers=encodings) for link in ASSET_LINK.findall(body.decode('utf-8'))]
+    asset_bytes = sum(len(asset.data) + HEADER_BYTES for asset in assets)
+    results.append(('cold', 1 + len(assets), shell + asset_bytes, _tti(server, shell, asset_bytes, mbps, rtt)))
+
+    revalidated, server = _load(client, path, dict(encodings, **{'If-None-Match': response.headers['ETag']}), runs)
+    assert revalidated.status_code == 304
+    results.append(('warm', 1, HEADER_BYTES, _tti(server, HEADER_BYTES, 0, mbps, rtt)))
+
+    print(f"📄 {path}")
+    for mode, requests_made, transferred, tti in results:
+        print(f"   {mode:<6} {requests_made:>2} request(s) {transferred:>9,} bytes  ~{tti * 1000:>7.1f} ms to interactive")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--mbps", type=float, default=10.0)
+    parser.add_argument("--rtt-ms", type=float, default=50.0)
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+    print(f"🌐 Simulated link: {args.mbps:g} Mbit/s, {args.rtt_ms:g} ms round trip")
+    for path in ('/', '/dashboard'):
+        measure(path, args.mbps, args.rtt_ms / 1000, args.runs)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Token IPC benchmark: shared-memory ring buffer vs multiprocessing queues (works offline).
+
+One producer process (standing in for the Ollama stream reader) emits
+``--tokens`` short token chunks spread over ``--streams`` streams; each of
+``--consumers`` processes (standing in for Socket.IO servers) receives every
+chunk. Reports delivered tokens per second and per-token cost for:
+
+- queue: one ``multiprocessing.Queue`` per consumer, (stream, seq, text, done)
+  tuples pickled onto each
+- ring:  one ``ChunkRing`` written once, read by every consumer's own cursor
+
+Usage: python benchmark_ipc.py [--tokens 200000] [--streams 12] [--consumers 2]
+"""
+
+import argparse
+import multiprocessing as mp
+import sys
+import time
+
+from shm_ring import ChunkRing
+
+WORDS = " the model streams tokens while the server fans each one out to its clients".split(" ")
+
+
+def _token(i: int) -> str:
+    return " " + WORDS[i % len(WORDS)]
+
+
+def queue_producer(queues, tokens, streams, barrier, started):
+    sequences = [0] * streams
+    barrier.wait()
+    started.value = time.time()
+    for i in range(tokens):
+        stream = i % streams
+        item = (stream, sequences[stream], _token(i), False)
+        sequences[stream] += 1
+        for q in queues:
+            q.put(item)
+    for stream in range(streams):
+        for q in queues:
+            q.put((stream, sequences[stream], "", True))
+
+
+def queue_consumer(q, streams, barrier, results):
+    received = 0
+    open_streams = streams
+    barrier.wait()
+    while open_streams:
+        stream, seq, text, done = q.get()
+        if done:
+            open_streams -= 1
+        else:
+            received += 1
+    results.put((time.time(), received, 0))
+
+
+def ring_producer(name, tokens, streams, barrier, started):
+    ring = ChunkRing.attach(name)
+    writer = ring.writer()
+    barrier.wait()
+    started.value = time.time()
+    for i in range(tokens):
+        writer.write(i % streams, _token(i))
+    for stream in range(streams):
+        writer.write(stream, b"", done=True)
+    ring.close()
+
+
+def ring_consumer(name, streams, barrier, results):
+    ring = ChunkRing.attach(name)
+    reader = ring.reader(from_start=True)
+    received = 0
+    open_streams = streams
+    barrier.wait()
+    while open_streams and not reader.overruns:
+        chunks = reader.poll()
+        if not chunks:
+            time.sleep(0.0001)
+        for chunk in chunks:
+            if chunk.done:
+                open_streams -= 1
+            else:
+                received += 1
+    results.put((time.time(), received, reader.overruns))
+    ring.close()
+
+
+def run_mode(mode, tokens, streams, consumers, ring_bytes):
+    ctx = mp.get_context('spawn')
+    barrier = ctx.Barrier(consumers + 1)
+    started = ctx.Value('d', 0.0)
+    results = ctx.Queue()
+    ring = None
+    if mode == 'queue':
+        queues = [ctx.Queue() for _ in range(consumers)]
+        producer = ctx.Process(target=queue_producer, args=(queues, tokens, streams, barrier, started))
+        readers = [ctx.Process(target=queue_consumer, args=(q, streams, barrier, results)) for q in queues]
+    else:
+        ring = ChunkRing.create(ring_bytes)
+        producer = ctx.Process(target=ring_producer, args=(ring.name, tokens, streams, barrier, started))
+        readers = [ctx.Process(target=ring_consumer, args=(ring.name, streams, barrier, results))
+                   for _ in range(consumers)]
+    try:
+        for process in readers + [producer]:
+            process.start()
+        outcomes = [results.get(timeout=600) for _ in readers]
+        for process in readers + [producer]:
+            process.join()
+    finally:
+        if ring is not None:
+            ring.close()
+
+    wall = max(finished for finished, _, _ in outcomes) - started.value
+    delivered = sum(received for _, received, _ in outcomes)
+    overruns = sum(overrun for _, _, overrun in outcomes)
+    summary = {
+        'mode': mode,
+        'delivered': delivered,
+        'wall_seconds': round(wall, 3),
+        'tokens_per_sec': round(delivered / wall),
+        'us_per_token': round(wall / tokens * 1e6, 2),
+        'overruns': overruns
+    }
+    print(f"   {mode:<6} {delivered:>9,} deliveries in {summary['wall_seconds']:>6}s  "
+          f"{summary['tokens_per_sec']:>10,} tokens/s  {summary['us_per_token']:>6} us/token"
+          + (f"  ({overruns} overruns)" if overruns else ""))
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--tokens", type=int, default=200000)
+    parser.add_argument("--streams", type=int, default=12)
+    parser.add_argument("--consumers", type=int, default=2)
+    parser.add_argument("--ring-mb", type=int, default=64)
+    args = parser.parse_args()
+    print(f"🔁 {args.tokens:,} tokens over {args.streams} streams to {args.consumers} consumer process(es)")
+    results = [run_mode(mode, args.tokens, args.streams, args.consumers, args.ring_mb << 20)
+               for mode in ('queue', 'ring')]
+    print(f"⚡ ring is {results[0]['wall_seconds'] / results[1]['wall_seconds']:.1f}x faster end to end")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Concurrent streaming benchmark: Flask-SocketIO threading mode vs ASGI mode vs a worker fleet.
+
+Starts a fake Ollama server that streams tokens at a fixed rate, launches the
+unified app in each mode against it, opens N Socket.IO sessions that all ask
+a question at once, and reports wall time, server CPU time and concurrent
+streaming sessions per core (sessions x wall time / CPU seconds).
+
+Usage: python benchmark_server.py [--sessions 50] [--tokens 200] [--token-interval 0.02]
+                                  [--modes flask asgi cluster] [--workers 2]
+ASGI mode needs uvicorn. Cluster mode runs run_web.py's broker, sticky front end
+and ``--workers`` Flask workers; its CPU time covers every process.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import aiohttp
+import psutil
+import socketio
+from aiohttp import web
+
+REPO = os.path.dirname(os.path.abspath(__file__))
+MODEL = "bench:1b"
+LAUNCH = {
+    'flask': "import unified_app; unified_app.run_flask(port={port}, debug=False)",
+    'asgi': "import sys, asgi_app; sys.exit(asgi_app.main(port={port}))",
+    'cluster': "import asyncio, models, run_web; "
+               "asyncio.run(run_web.run_fleet({workers}, '127.0.0.1', {port}, models.ConfigManager()))",
+}
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+async def start_fake_ollama(tokens: int, interval: float):
+    """An Ollama stand-in that lists one small model and streams ``tokens`` tokens."""
+    async def tags(request):
+        return web.json_response({'models': [{
+            'name': MODEL, 'size': 1_000_000_000, 'digest': 'bench',
+            'details': {'family': 'llama', 'parameter_size': '1B', 'quantization_level': 'Q4_0'}
+        }]})
+
+    async def generate(request):
+        response = web.StreamResponse(headers={'Content-Type': 'application/x-ndjson'})
+        await response.prepare(request)
+        for i in range(tokens):
+            await asyncio.sleep(interval)
+            await response.write(json.dumps({'response': f" tok{i}", 'done': False}).encode() + b"\n")
+        await response.write(json.dumps({'response': "", 'done': True, 'eval_count': tokens}).encode() + b"\n")
+        return response
+
+    async def empty(request):
+        return web.json_response({'models': []})
+
+    app = web.Application()
+    app.router.add_get('/api/tags', tags)
+    app.router.add_post('/api/generate', generate)
+    app.router.add_get('/api/ps', empty)
+    app.router.add_post('/api/show', lambda request: web.json_response({}))
+    runner = web.AppRunner(app)
+    await runner.setup()
+    port = _free_port()
+    await web.TCPSite(runner, '127.0.0.1', port).start()
+    return runner, f"http://127.0.0.1:{port}"
+
+
+def launch_server(mode: str, ollama_url: str, sessions: int, workdir: str, workers: int = 2):
+    port = _free_port()
+    with open(os.path.join(workdir, "config.json"), "w") as f:
+        json.dump({
+            'ollama_url': ollama_url,
+            'request_timeout': 120,
+            'max_concurrent_requests': sessions,
+            'min_concurrent_requests': sessions,
+            'admission_max_active': sessions,
+            'admission_max_depth': sessions,
+            'admission_per_session': 1,
+            'degrade_under_pressure': False,
+            'catalog_cache_path': os.path.join(workdir, "catalog.json")
+        }, f)
+    env = dict(os.environ, PYTHONPATH=REPO + os.pathsep + os.environ.get('PYTHONPATH', ''))
+    process = subprocess.Popen([sys.executable, "-c", LAUNCH[mode].format(port=port, workers=workers)], cwd=workdir, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return process, f"http://127.0.0.1:{port}"
+
+
+async def wait_until_up(url: str, process, timeout: float = 60.0) -> bool:
+    deadline = time.time() + timeout
+    async with aiohttp.ClientSession() as session:
+        while time.time() < deadline and process.poll() is None:
+            try:
+                async with session.get(f"{url}/api/admission") as response:
+                    if response.status == 200:
+                        return True
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.25)
+    return False
+
+
+async def run_session(url: str, start: asyncio.Event, results: list):
+    client = socketio.AsyncClient(reconnection=False)
+    done = asyncio.Event()
+    stats = {'frames': 0, 'error': None}
+
+    @client.on('rtt_probe')
+    def on_probe(data):
+        return True
+
+    @client.on('chunk_received')
+    def on_chunk(data):
+        stats['frames'] += 1
+
+    @client.on('query_completed')
+    def on_completed(data):
+        done.set()
+
+    @client.on('error')
+    def on_error(data):
+        stats['error'] = data.get('message')
+        done.set()
+
+    await client.connect(url, transports=['websocket'])
+    await start.wait()
+    began = time.time()
+    await client.emit('query_models', {'question': "benchmark", 'selected_models': [MODEL], 'streaming': True})
+    await done.wait()
+    stats['seconds'] = time.time() - began
+    results.append(stats)
+    await client.disconnect()
+
+
+def _cpu_seconds(process: psutil.Process) -> float:
+    """User + system CPU of ``process`` and its live children (the fleet's workers)."""
+    total = 0.0
+    for proc in [process] + process.children(recursive=True):
+        try:
+            total += sum(proc.cpu_times()[:2])
+        except psutil.NoSuchProcess:
+            pass
+    return total
+
+
+async def bench_mode(mode: str, ollama_url: str, sessions: int, workers: int = 2):
+    with tempfile.TemporaryDirectory() as workdir:
+        process, url = launch_server(mode, ollama_url, sessions, workdir, workers)
+        try:
+            if not await wait_until_up(url, process):
+                print(f"   {mode:<6} failed to start" + (" (pip install uvicorn)" if mode == 'asgi' else ""))
+                return None
+            server = psutil.Process(process.pid)
+            start, results = asyncio.Event(), []
+            clients = [asyncio.ensure_future(run_session(url, start, results)) for _ in range(sessions)]
+            await asyncio.sleep(1.0)
+            cpu_before = _cpu_seconds(server)
+            began = time.time()
+            start.set()
+            await asyncio.gather(*clients, return_exceptions=True)
+            wall = time.time() - began
+            cpu = max(1e-6, _cpu_seconds(server) - cpu_before)
+        finally:
+            process.terminate()
+            process.wait(10)
+
+    completed = [r for r in results if not r['error']]
+    summary = {
+        'mode': mode,
+        'sessions': sessions,
+        'completed': len(completed),
+        'wall_seconds': round(wall, 2),
+        'cpu_seconds': round(cpu, 2),
+        'sessions_per_core': round(len(completed) * wall / cpu, 1),
+        'frames': sum(r['frames'] for r in results)
+    }
+    print(f"   {mode:<6} {summary['completed']}/{sessions} done in {summary['wall_seconds']}s, "
+          f"CPU {summary['cpu_seconds']}s, {summary['frames']} frames → "
+          f"{summary['sessions_per_core']} streaming sessions per core")
+    return summary
+
+
+async def run(sessions: int, tokens: int, interval: float, modes, workers: int = 2):
+    runner, ollama_url = await start_fake_ollama(tokens, interval)
+    print(f"🏁 {sessions} concurrent sessions, {tokens} tokens each at {1 / interval:.0f} tokens/s")
+    try:
+        return [summary for mode in modes if (summary := await bench_mode(mode, ollama_url, sessions, workers))]
+    finally:
+        await runner.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--tokens", type=int, default=200)
+    parser.add_argument("--token-interval", type=float, default=0.02)
+    parser.add_argument("--modes", nargs="+", choices=sorted(LAUNCH), default=['flask', 'asgi'])
+    parser.add_argument("--workers", type=int, default=2, help="worker processes in cluster mode")
+    args = parser.parse_args()
+    asyncio.run(run(args.sessions, args.tokens, args.token_interval, args.modes, args.workers))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Wire-size benchmark for streamed Socket.IO payloads (works offline).
+
+Encodes a simulated multi-model answer with python-socketio's own packet
+classes and reports bytes on the wire per generated token for:
+
+- legacy:    one JSON dict frame per token ({model, chunk, session_id})
+- coalesced: JSON dict frames carrying several tokens each
+- compact:   MessagePack [model_id, text] frames (needs the msgpack package)
+
+plus the end-of-debate payload as JSON, MessagePack and deflated MessagePack.
+
+Usage: python benchmark_wire.py [--models 6] [--tokens 400] [--tokens-per-frame 6]
+"""
+
+import argparse
+import random
+import sys
+
+from socketio import packet
+
+from wire_protocol import CompactWire, msgpack
+
+WORDS = ("the model streams tokens while the server frames each one and the browser "
+         "renders text as it arrives so every byte of overhead is paid per token").split()
+SESSION_ID = "Qx3bT0mFhZ8pLr2dAAAB"
+
+
+def _tokens(count, seed):
+    rng = random.Random(seed)
+    return [rng.choice(("", " ")) + rng.choice(WORDS) for _ in range(count)]
+
+
+def _frame_bytes(packet_class, event, payload):
+    encoded = packet_class(packet.EVENT, data=[event, payload], namespace='/').encode()
+    # Engine.IO adds a one-byte message type to text frames
+    return len(encoded) + 1 if isinstance(encoded, str) else len(encoded)
+
+
+def run(models, tokens, tokens_per_frame):
+    names = [f"llama3.1:8b-instruct-q{i}" for i in range(models)]
+    streams = {name: _tokens(tokens, seed) for seed, name in enumerate(names)}
+    total_tokens = models * tokens
+    results = {}
+
+    def stream_bytes(packet_class, per_frame, payload_for):
+        total = 0
+        for name, stream in streams.items():
+            for start in range(0, len(stream), per_frame):
+                text = "".join(stream[start:start + per_frame])
+                total += _frame_bytes(packet_class, 'chunk_received', payload_for(name, text))
+        return total
+
+    json_wire = CompactWire(enabled=False)
+    results['legacy'] = stream_bytes(packet.Packet, 1, lambda name, text: json_wire.chunk(SESSION_ID, name, text))
+    results['coalesced'] = stream_bytes(packet.Packet, tokens_per_frame,
+                                        lambda name, text: json_wire.chunk(SESSION_ID, name, text))
+
+    history = [{'round': r, 'model': name, 'content': "".join(streams[name]), 'session_id': SESSION_ID}
+               for r in range(3) for name in names]
+    debate = {'topic': "benchmark", 'participants': names, 'debate_history': history, 'session_id': SESSION_ID}
+    debate_sizes = {'json': _frame_bytes(packet.Packet, 'debate_completed', debate)}
+
+    if msgpack is not None:
+        from socketio import msgpack_packet
+        compact_wire = CompactWire(enabled=True)
+        results['compact'] = stream_bytes(msgpack_packet.MsgPackPacket, tokens_per_frame,
+                                          lambda name, text: compact_wire.chunk(SESSION_ID, name, text))
+        debate_sizes['msgpack'] = _frame_bytes(msgpack_packet.MsgPackPacket, 'debate_completed', debate)
+        debate_sizes['msgpack+deflate'] = _frame_bytes(msgpack_packet.MsgPackPacket, 'debate_completed',
+                                                       compact_wire.large(debate))
+
+    print(f"📏 {models} models x {tokens} tokens, {tokens_per_frame} tokens per coalesced frame")
+    baseline = results['legacy'] / total_tokens
+    for mode, total in results.items():
+        per_token = total / total_tokens
+        print(f"   {mode:<10} {total:>9,} bytes  {per_token:6.1f} B/token  ({per_token / baseline:.0%} of legacy)")
+    if msgpack is None:
+        print("   compact    skipped (pip install msgpack)")
+    print("📦 debate_completed payload")
+    for mode, size in debate_sizes.items():
+        print(f"   {mode:<16} {size:>9,} bytes")
+    return results, debate_sizes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--models", type=int, default=6)
+    parser.add_argument("--tokens", type=int, default=400)
+    parser.add_argument("--tokens-per-frame", type=int, default=6)
+    args = parser.parse_args()
+    run(args.models, args.tokens, args.tokens_per_frame)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
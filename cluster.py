@@ -0,0 +1,550 @@
+"""
+Cluster module for running the unified app as several worker processes.
+
+One Flask-SocketIO process keeps every stream, emit and route on one
+interpreter (and one GIL). ``run_web.py`` instead starts a small broker, N
+worker processes and a sticky TCP front end:
+
+- the broker relays Socket.IO message-queue traffic (python-socketio's
+  ``PubSubManager`` protocol), so an emit from any worker reaches a client
+  connected to any other, and it hosts the one ``FairScheduler`` every
+  worker takes its query slots from;
+- workers publish catalog and performance updates on broker channels, so
+  model lists, ETags and scheduler cost estimates agree across the fleet;
+- the front end pins clients to workers (Engine.IO's polling transport needs
+  every request of a session on the same server): new WebSocket connections
+  go to the least busy worker, everything else is routed by client-IP hash.
+
+Workers find the broker through ``OLLAMA_CLUSTER_BROKER`` (set by the
+launcher). A ``message_queue`` URL in the config (e.g. ``redis://``) is
+handed to Flask-SocketIO as-is for deployments with an external queue.
+"""
+
+import asyncio
+import base64
+import concurrent.futures
+import itertools
+import json
+import os
+import queue
+import socket
+import struct
+import threading
+import zlib
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import socketio
+
+from scheduler import FairScheduler, job_context, set_job_context
+
+BROKER_ENV = 'OLLAMA_CLUSTER_BROKER'
+WORKER_ENV = 'OLLAMA_CLUSTER_WORKER'
+SIZE_ENV = 'OLLAMA_CLUSTER_SIZE'
+
+_HEADER = struct.Struct('!I')
+
+
+def _encode_default(value):
+    # Bytes payloads (e.g. deflated compact-wire events) travel base64-encoded
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return {'__bytes__': base64.b64encode(bytes(value)).decode('ascii')}
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Cannot send {type(value).__name__} through the cluster broker")
+
+
+def _decode_object(obj: Dict):
+    if len(obj) == 1 and '__bytes__' in obj:
+        return base64.b64decode(obj['__bytes__'])
+    return obj
+
+
+def _pack(message: Dict) -> bytes:
+    body = json.dumps(message, default=_encode_default, separators=(',', ':')).encode('utf-8')
+    return _HEADER.pack(len(body)) + body
+
+
+def _unpack(body: bytes) -> Dict:
+    return json.loads(body, object_hook=_decode_object)
+
+
+async def _read_message(reader: asyncio.StreamReader) -> Dict:
+    header = await reader.readexactly(_HEADER.size)
+    return _unpack(await reader.readexactly(_HEADER.unpack(header)[0]))
+
+
+def parse_broker_url(url: str) -> Tuple[str, int]:
+    """``tcp://host:port`` -> (host, port)."""
+    parts = urlsplit(url)
+    if parts.scheme != 'tcp' or not parts.port:
+        raise ValueError(f"Broker URL must look like tcp://host:port, got {url!r}")
+    return parts.hostname or '127.0.0.1', parts.port
+
+
+class _Peer:
+    """One worker connection as seen by the broker."""
+
+    def __init__(self, writer: asyncio.StreamWriter):
+        self.writer = writer
+        self.channels: set = set()
+        self.pending: Dict[int, asyncio.Task] = {}
+        self.granted = 0
+
+    def send(self, message: Dict):
+        if not self.writer.is_closing():
+            self.writer.write(_pack(message))
+
+
+class Broker:
+    """Pub/sub channels, a small key/value store and the fleet-wide scheduler.
+
+    Messages are length-prefixed JSON over local TCP (bytes values are
+    base64-encoded), so a peer can only send data, never code; the broker
+    listens on loopback by default. Slots held by a worker that disconnects
+    are released.
+    """
+
+    def __init__(self, limit: int = 5, quantum: float = 5.0, lane_weights: Optional[Dict[str, float]] = None):
+        self.scheduler = FairScheduler(limit, quantum=quantum, lane_weights=lane_weights)
+        self.channels: Dict[str, set] = {}
+        self.values: Dict[str, Any] = {}
+        self.peers: set = set()
+        self.server: Optional[asyncio.AbstractServer] = None
+        self.url = ""
+
+    @classmethod
+    def from_config(cls, config) -> "Broker":
+        return cls(
+            limit=config.get("max_concurrent_requests", 5),
+            quantum=config.get("scheduler_quantum", 5.0),
+            lane_weights=config.get("scheduler_lane_weights")
+        )
+
+    async def start(self, host: str = '127.0.0.1', port: int = 0) -> str:
+        """Start listening; returns the ``tcp://`` URL workers connect to."""
+        self.server = await asyncio.start_server(self._serve, host, port)
+        self.url = f"tcp://{host}:{self.server.sockets[0].getsockname()[1]}"
+        return self.url
+
+    async def stop(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        peer = _Peer(writer)
+        self.peers.add(peer)
+        writer.get_extra_info('socket').setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        try:
+            while True:
+                self._dispatch(peer, await _read_message(reader))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except ValueError:
+            print("⚠️  Dropping cluster peer that sent a malformed frame")
+        finally:
+            self.peers.discard(peer)
+            for channel in peer.channels:
+                self.channels.get(channel, set()).discard(peer)
+            for task in peer.pending.values():
+                task.cancel()
+            for _ in range(peer.granted):
+                self.scheduler.release()
+            writer.close()
+
+    def _dispatch(self, peer: _Peer, message: Dict):
+        op = message['op']
+        if op == 'publish':
+            for subscriber in self.channels.get(message['channel'], ()):
+                if subscriber is not peer:
+                    subscriber.send(message)
+        elif op == 'subscribe':
+            self.channels.setdefault(message['channel'], set()).add(peer)
+            peer.channels.add(message['channel'])
+        elif op == 'set':
+            self.values[message['key']] = message['value']
+        elif op == 'get':
+            peer.send({'op': 'reply', 'id': message['id'], 'value': self.values.get(message['key'])})
+        elif op == 'acquire':
+            peer.pending[message['id']] = asyncio.get_running_loop().create_task(self._acquire(peer, message))
+        elif op == 'cancel':
+            task = peer.pending.pop(message['id'], None)
+            if task is not None:
+                task.cancel()
+                peer.send({'op': 'cancelled', 'id': message['id']})
+        elif op == 'release':
+            peer.granted = max(0, peer.granted - 1)
+            self.scheduler.release()
+        elif op == 'resize':
+            self.scheduler.resize(message['limit'])
+        elif op == 'status':
+            status = self.scheduler.status()
+            status['workers'] = len(self.peers)
+            peer.send({'op': 'reply', 'id': message['id'], 'value': status})
+
+    async def _acquire(self, peer: _Peer, message: Dict):
+        # The waiter's lane and session come from the context of this task
+        set_job_context(message['session'], message['lane'])
+        await self.scheduler.acquire(message['cost'])
+        peer.pending.pop(message['id'], None)
+        peer.granted += 1
+        peer.send({'op': 'granted', 'id': message['id'], 'state': self.state()})
+
+    def state(self) -> Dict:
+        return {'limit': self.scheduler.limit, 'in_use': self.scheduler.in_use, 'waiting': self.scheduler.waiting}
+
+
+class BrokerClient:
+    """A worker's connection to the broker.
+
+    Sends are serialized by a lock; a reader thread dispatches channel
+    messages to subscribers and replies to the callbacks of their requests.
+    """
+
+    def __init__(self, url: str, timeout: float = 5.0):
+        self.url = url
+        self.timeout = timeout
+        self._sock = socket.create_connection(parse_broker_url(url), timeout=timeout)
+        self._sock.settimeout(None)
+        self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._stream = self._sock.makefile('rb')
+        self._send_lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._callbacks: Dict[int, Callable[[Dict], None]] = {}
+        self._handlers: Dict[str, List[Callable[[Any], None]]] = {}
+        self._reader = threading.Thread(target=self._read_loop, name="broker-client", daemon=True)
+        self._reader.start()
+
+    @property
+    def connected(self) -> bool:
+        return self._reader.is_alive()
+
+    def send(self, message: Dict):
+        data = _pack(message)
+        with self._send_lock:
+            self._sock.sendall(data)
+
+    def publish(self, channel: str, data: Any):
+        """Deliver ``data`` to every other subscriber of ``channel``."""
+        self.send({'op': 'publish', 'channel': channel, 'data': data})
+
+    def subscribe(self, channel: str, handler: Callable[[Any], None]):
+        """Call ``handler(data)`` (on the reader thread) for messages on ``channel``."""
+        first = channel not in self._handlers
+        self._handlers.setdefault(channel, []).append(handler)
+        if first:
+            self.send({'op': 'subscribe', 'channel': channel})
+
+    def call(self, op: str, on_reply: Callable[[Dict], None], **fields) -> int:
+        """Send a request; ``on_reply`` gets the broker's one reply to it."""
+        request_id = next(self._ids)
+        self._callbacks[request_id] = on_reply
+        self.send(dict(fields, op=op, id=request_id))
+        return request_id
+
+    def request(self, op: str, **fields) -> Any:
+        """Blocking request/reply; returns the reply's ``value``."""
+        future = concurrent.futures.Future()
+        self.call(op, future.set_result, **fields)
+        return future.result(self.timeout)['value']
+
+    def get(self, key: str) -> Any:
+        return self.request('get', key=key)
+
+    def set(self, key: str, value: Any):
+        self.send({'op': 'set', 'key': key, 'value': value})
+
+    def close(self):
+        try:
+            self._sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self._sock.close()
+
+    def _read_loop(self):
+        while True:
+            header = self._stream.read(_HEADER.size)
+            if len(header) < _HEADER.size:
+                break
+            message = _unpack(self._stream.read(_HEADER.unpack(header)[0]))
+            if message['op'] == 'publish':
+                for handler in list(self._handlers.get(message['channel'], ())):
+                    try:
+                        handler(message['data'])
+                    except Exception as e:
+                        print(f"⚠️  Broker channel handler failed: {e}")
+            else:
+                callback = self._callbacks.pop(message.get('id'), None)
+                if callback is not None:
+                    callback(message)
+        print("⚠️  Lost connection to the cluster broker")
+
+
+class BrokerManager(socketio.PubSubManager):
+    """python-socketio client manager that uses the broker as its message queue."""
+    name = 'broker'
+
+    def __init__(self, client: BrokerClient, channel: str = 'socketio', write_only: bool = False, logger=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        self.client = client
+        self._inbox: "queue.Queue[Dict]" = queue.Queue()
+        if not write_only:
+            client.subscribe(channel, self._inbox.put)
+
+    def _publish(self, data):
+        self.client.publish(self.channel, data)
+
+    def _listen(self):
+        while True:
+            yield self._inbox.get()
+
+
+class RemoteScheduler:
+    """The query-slot interface of ``FairScheduler``, served by the broker.
+
+    Requests carry the caller's scheduler session and lane, so deficit round
+    robin runs over every session in the fleet. Grants arrive on the client's
+    reader thread and are handed to the acquiring loop. Only a ``resizable``
+    instance (the leader worker's) forwards ``resize`` calls, so one AIMD
+    controller sizes the shared limit.
+    """
+
+    def __init__(self, client: BrokerClient, resizable: bool = True):
+        self.client = client
+        self.resizable = resizable
+        self._state = {'limit': 1, 'in_use': 0, 'waiting': 0}
+
+    @property
+    def limit(self) -> int:
+        return self._state['limit']
+
+    @property
+    def in_use(self) -> int:
+        return self._state['in_use']
+
+    @property
+    def waiting(self) -> int:
+        return self._state['waiting']
+
+    def resize(self, limit: int):
+        if self.resizable:
+            self._state['limit'] = max(1, int(limit))
+            self.client.send({'op': 'resize', 'limit': self._state['limit']})
+
+    async def acquire(self, cost: float = 1.0):
+        """Take a fleet-wide slot; ``cost`` is the expected run time (seconds)."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        session, lane = job_context()
+
+        def on_reply(message: Dict):
+            if message['op'] != 'granted':
+                return
+            self._state.update(message['state'])
+            if loop.is_closed():
+                self.release()
+            else:
+                loop.call_soon_threadsafe(self._grant, future)
+
+        request_id = self.client.call('acquire', on_reply, session=session, lane=lane, cost=max(0.1, cost))
+        try:
+            await future
+        except asyncio.CancelledError:
+            # Withdraw the request; a grant already in flight is handed back by _grant
+            self.client.send({'op': 'cancel', 'id': request_id})
+            raise
+
+    def _grant(self, future: asyncio.Future):
+        if future.done():
+            self.release()
+        else:
+            future.set_result(True)
+
+    def release(self):
+        self._state['in_use'] = max(0, self._state['in_use'] - 1)
+        self.client.send({'op': 'release'})
+
+    @asynccontextmanager
+    async def slot(self, cost: float = 1.0):
+        """``async with scheduler.slot(cost):`` holds one fleet-wide slot for the block."""
+        await self.acquire(cost)
+        try:
+            yield self
+        finally:
+            self.release()
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.release()
+
+    def status(self) -> Dict:
+        """The broker scheduler's lane and session status (plus connected workers)."""
+        return self.client.request('status')
+
+
+class CatalogSync:
+    """Keep every worker's model catalog on the same snapshot.
+
+    When a worker's refresher sees a change it publishes the raw tags
+    payload; the other workers ingest it through their own refresher, so
+    their listeners (payload cache, ``models_changed`` pushes) run as if
+    they had polled Ollama themselves.
+    """
+
+    channel = 'catalog'
+
+    def __init__(self, client: BrokerClient, catalog, refresher):
+        self.client = client
+        self.catalog = catalog
+        self.refresher = refresher
+        self._applying = threading.local()
+        refresher.add_listener(self._on_local_change)
+        client.subscribe(self.channel, self._on_remote_change)
+
+    def _on_local_change(self, diff: Dict):
+        if not getattr(self._applying, 'active', False):
+            self.client.publish(self.channel, self.catalog.export())
+
+    def _on_remote_change(self, payload: Dict):
+        self._applying.active = True
+        try:
+            self.refresher.revalidate(
+                fetch=lambda: self.catalog.ingest(payload, source="cluster", persist=False))
+        finally:
+            self._applying.active = False
+
+
+class ClusterNode:
+    """This process's place in a worker fleet (or a standalone server).
+
+    ``worker_id`` 0 is the leader: its concurrency controller sizes the
+    shared scheduler limit.
+    """
+
+    def __init__(self, broker_url: Optional[str] = None, worker_id: int = 0, size: int = 1,
+                 message_queue: Optional[str] = None):
+        self.broker_url = broker_url
+        self.worker_id = worker_id
+        self.size = size
+        self.message_queue = message_queue
+        self.client: Optional[BrokerClient] = None
+        if broker_url:
+            self.client = BrokerClient(broker_url)
+            print(f"🔗 Worker {worker_id + 1}/{size} joined the cluster broker at {broker_url}")
+
+    @classmethod
+    def from_env(cls, config) -> "ClusterNode":
+        return cls(
+            broker_url=os.environ.get(BROKER_ENV),
+            worker_id=int(os.environ.get(WORKER_ENV, 0)),
+            size=int(os.environ.get(SIZE_ENV, 1)),
+            message_queue=config.get("message_queue")
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.client is not None
+
+    @property
+    def leader(self) -> bool:
+        return self.worker_id == 0
+
+    def socketio_options(self) -> Dict:
+        """Extra ``SocketIO`` arguments: the broker's client manager or an external queue URL."""
+        if self.client is not None:
+            return {'client_manager': BrokerManager(self.client)}
+        if self.message_queue:
+            return {'message_queue': self.message_queue}
+        return {}
+
+    def attach(self, model_manager):
+        """Share the scheduler, catalog and performance averages of ``model_manager`` with the fleet."""
+        if self.client is None:
+            return
+        slots = RemoteScheduler(self.client, resizable=self.leader)
+        model_manager.query_slots = slots
+        model_manager.concurrency.semaphore = slots
+        CatalogSync(self.client, model_manager.catalog, model_manager.get_refresher())
+
+        performance = model_manager.performance
+        performance.add_listener(lambda *record: self.client.publish('performance', record))
+        self.client.subscribe('performance', lambda record: performance.record(*record, notify=False))
+
+    def status(self) -> Dict:
+        return {
+            'enabled': self.enabled,
+            'worker_id': self.worker_id,
+            'workers': self.size,
+            'leader': self.leader,
+            'broker': self.broker_url or self.message_queue
+        }
+
+
+class StickyProxy:
+    """TCP front end that pins each client to one worker.
+
+    Only the request line of a connection is inspected: a WebSocket
+    handshake without a ``sid`` opens a new Socket.IO session and goes to the
+    worker with the fewest open connections; everything else (pages, API
+    calls, polling requests and transport upgrades of existing sessions) is
+    routed by a hash of the client IP, the same scheme as nginx's ``ip_hash``.
+    The connection is then piped through unchanged.
+    """
+
+    def __init__(self, backends: List[Tuple[str, int]]):
+        self.backends = list(backends)
+        self.connections = [0] * len(self.backends)
+        self.server: Optional[asyncio.AbstractServer] = None
+
+    def route(self, request_line: bytes, client_ip: str) -> int:
+        parts = request_line.split()
+        query = parse_qs(urlsplit(parts[1].decode('latin-1')).query) if len(parts) > 1 else {}
+        if query.get('transport') == ['websocket'] and 'sid' not in query:
+            return min(range(len(self.backends)), key=lambda i: self.connections[i])
+        return zlib.crc32(client_ip.encode('utf-8')) % len(self.backends)
+
+    async def start(self, host: str = '0.0.0.0', port: int = 5000):
+        self.server = await asyncio.start_server(self._handle, host, port)
+        return self.server
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request_line = await reader.readline()
+        except (ConnectionError, ValueError):
+            writer.close()
+            return
+        if not request_line:
+            writer.close()
+            return
+        index = self.route(request_line, (writer.get_extra_info('peername') or ('',))[0])
+        try:
+            upstream_reader, upstream_writer = await asyncio.open_connection(*self.backends[index])
+        except OSError:
+            writer.write(b"HTTP/1.1 502 Bad Gateway\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+            writer.close()
+            return
+        self.connections[index] += 1
+        try:
+            upstream_writer.write(request_line)
+            await asyncio.gather(self._pipe(reader, upstream_writer), self._pipe(upstream_reader, writer))
+        finally:
+            self.connections[index] -= 1
+
+    @staticmethod
+    async def _pipe(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                data = await reader.read(65536)
+                if not data:
+                    break
+                writer.write(data)
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
@@ -0,0 +1,182 @@
+"""
+Chunk coalescing module for the multi-model query application.
+
+Ollama streams roughly one token per chunk, often a single character, and
+emitting each one as its own Socket.IO frame spends most of the server's CPU
+on framing. A ``ChunkCoalescer`` buffers chunks per model and emits them as
+one frame when the buffer reaches ``max_bytes`` or its flush window expires,
+with a final flush when the model completes. The window follows the client's
+round-trip time (a client can't render faster than it acknowledges) and grows
+with the number of models streaming at once.
+"""
+
+import asyncio
+import bisect
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional, Set, Union
+
+
+class FrameStats:
+    """Process-wide counts of streamed chunks (tokens) in and frames out."""
+
+    def __init__(self, history: int = 20000):
+        self.chunks = 0
+        self.frames = 0
+        self.frame_bytes = 0
+        self._chunk_times = deque(maxlen=history)
+        self._frame_times = deque(maxlen=history)
+        self._streams = set()
+        self._lock = threading.Lock()
+
+    @property
+    def active_streams(self) -> int:
+        return len(self._streams)
+
+    def stream_started(self, key):
+        with self._lock:
+            self._streams.add(key)
+
+    def stream_finished(self, key):
+        with self._lock:
+            self._streams.discard(key)
+
+    def record_chunk(self):
+        with self._lock:
+            self.chunks += 1
+            self._chunk_times.append(time.time())
+
+    def record_frame(self, size: int):
+        with self._lock:
+            self.frames += 1
+            self.frame_bytes += size
+            self._frame_times.append(time.time())
+
+    @staticmethod
+    def _rate(times: deque, window: float, now: float) -> float:
+        recent = len(times) - bisect.bisect_left(times, now - window)
+        return recent / window
+
+    def snapshot(self, window: float = 10.0) -> Dict:
+        """Totals plus tokens/s and frames/s over the last ``window`` seconds."""
+        now = time.time()
+        with self._lock:
+            tokens_per_sec = self._rate(self._chunk_times, window, now)
+            frames_per_sec = self._rate(self._frame_times, window, now)
+            return {
+                'chunks': self.chunks,
+                'frames': self.frames,
+                'avg_frame_bytes': round(self.frame_bytes / self.frames, 1) if self.frames else 0.0,
+                'active_streams': len(self._streams),
+                'tokens_per_sec': round(tokens_per_sec, 2),
+                'frames_per_sec': round(frames_per_sec, 2),
+                'tokens_per_frame': round(tokens_per_sec / frames_per_sec, 2) if frames_per_sec else None
+            }
+
+
+class ChunkCoalescer:
+    """Per-model chunk buffers flushed on a time window, a size threshold or completion.
+
+    ``emit(model, text)`` sends one frame. ``rtt`` is the client's round-trip
+    time in seconds (or a callable returning it, or None when unknown). The
+    flush window is ``max(min_window, rtt / 2)``, scaled by the number of
+    streams active across the process and capped at ``max_window``.
+    """
+
+    def __init__(self, emit: Callable[[str, str], None], min_window: float = 0.02,
+                 max_window: float = 0.25, max_bytes: int = 512,
+                 rtt: Union[None, float, Callable[[], Optional[float]]] = None,
+                 enabled: bool = True, stats: Optional[FrameStats] = None):
+        self.emit = emit
+        self.min_window = min_window
+        self.max_window = max(min_window, max_window)
+        self.max_bytes = max_bytes
+        self.rtt = rtt
+        self.enabled = enabled
+        self.stats = stats or frame_stats
+        self._buffers: Dict[str, List[str]] = {}
+        self._sizes: Dict[str, int] = {}
+        self._timers: Dict[str, asyncio.TimerHandle] = {}
+        self._open: Set[str] = set()
+
+    @classmethod
+    def from_config(cls, config, emit, rtt=None) -> "ChunkCoalescer":
+        """Build a coalescer from the ``stream_*`` settings of a ConfigManager."""
+        return cls(
+            emit,
+            min_window=config.get("stream_flush_min_ms", 20) / 1000,
+            max_window=config.get("stream_flush_max_ms", 250) / 1000,
+            max_bytes=config.get("stream_flush_bytes", 512),
+            rtt=rtt,
+            enabled=config.get("stream_coalesce", True)
+        )
+
+    @property
+    def window(self) -> float:
+        rtt = self.rtt() if callable(self.rtt) else self.rtt
+        window = max(self.min_window, (rtt or 0.0) / 2)
+        window *= max(1.0, self.stats.active_streams / 2)
+        return min(self.max_window, window)
+
+    def add(self, model: str, chunk: str):
+        """Buffer one chunk; flushes at once if the buffer is full."""
+        self.stats.record_chunk()
+        if model not in self._open:
+            self._open.add(model)
+            self.stats.stream_started((id(self), model))
+        if not self.enabled:
+            self._send(model, chunk)
+            return
+        self._buffers.setdefault(model, []).append(chunk)
+        self._sizes[model] = self._sizes.get(model, 0) + len(chunk)
+        if self._sizes[model] >= self.max_bytes:
+            self.flush(model)
+        elif model not in self._timers:
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                self.flush(model)
+                return
+            self._timers[model] = loop.call_later(self.window, self.flush, model)
+
+    def flush(self, model: Optional[str] = None):
+        """Emit buffered text for ``model`` (or every model) as one frame each."""
+        for name in ([model] if model is not None else list(self._buffers)):
+            timer = self._timers.pop(name, None)
+            if timer:
+                timer.cancel()
+            buffer = self._buffers.pop(name, None)
+            self._sizes.pop(name, None)
+            if buffer:
+                self._send(name, "".join(buffer))
+
+    def finish(self, model: str):
+        """Final flush when ``model`` completes."""
+        self.flush(model)
+        self._open.discard(model)
+        self.stats.stream_finished((id(self), model))
+
+    def close(self):
+        """Drop pending timers and buffers and end every stream not yet finished.
+
+        Call when the query ends however it ends: a cancelled or failed
+        stream never reaches ``finish`` and would otherwise keep counting
+        as active (widening every other stream's window).
+        """
+        for timer in self._timers.values():
+            timer.cancel()
+        self._timers.clear()
+        self._buffers.clear()
+        self._sizes.clear()
+        for model in self._open:
+            self.stats.stream_finished((id(self), model))
+        self._open.clear()
+
+    def _send(self, model: str, text: str):
+        self.stats.record_frame(len(text))
+        self.emit(model, text)
+
+
+# Global instance
+frame_stats = FrameStats()
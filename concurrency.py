@@ -0,0 +1,374 @@
+"""
+Concurrency control module for the multi-model query application.
+
+Every query path acquires a slot from one process-wide ``ResizableSemaphore``.
+An ``AIMDController`` fed by the resource sampler adjusts the number of slots
+from what actually happens under load: it adds one slot while aggregate
+throughput keeps improving and halves the limit when time-to-first-token
+spikes, memory headroom runs out or the system starts swapping.
+"""
+
+import asyncio
+import statistics
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Callable, List, Dict, Any, Optional
+
+
+class _Waiter:
+    """One pending (or just granted) slot request."""
+    __slots__ = ('loop', 'future', 'cost', 'session', 'lane', 'enqueued_at')
+
+    def __init__(self, loop, cost: float = 1.0, session: str = "", lane: str = ""):
+        self.loop = loop
+        self.future = loop.create_future()
+        self.cost = cost
+        self.session = session
+        self.lane = lane
+        self.enqueued_at = time.time()
+
+
+class ResizableSemaphore:
+    """Counting semaphore whose limit can change at runtime.
+
+    Waiters are futures bound to their own loop and are woken with
+    ``call_soon_threadsafe``, so holders on different event loops (the async
+    worker, the console app, tests) can share one limit. Shrinking the limit
+    never interrupts running holders; new acquirers simply wait until enough
+    slots have been released. Waiters are served FIFO; subclasses change the
+    order by overriding the ``_*_locked`` queue hooks.
+    """
+
+    def __init__(self, limit: int):
+        self._lock = threading.Lock()
+        self._limit = max(1, int(limit))
+        self._in_use = 0
+        self._waiters = deque()
+
+    @property
+    def limit(self) -> int:
+        return self._limit
+
+    @property
+    def in_use(self) -> int:
+        return self._in_use
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    def resize(self, limit: int):
+        """Change the number of slots, waking waiters if the limit grew."""
+        with self._lock:
+            self._limit = max(1, int(limit))
+            self._wake_locked()
+
+    async def acquire(self, cost: float = 1.0):
+        """Take a slot; ``cost`` is the expected size of the work (seconds)."""
+        waiter = self._make_waiter(asyncio.get_running_loop(), cost)
+        with self._lock:
+            if self._in_use < self._limit and not self.waiting:
+                self._in_use += 1
+                self._granted_locked(waiter)
+                return
+            self._enqueue_locked(waiter)
+        future = waiter.future
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                if self._discard_locked(waiter):
+                    raise
+            # Granted concurrently with the cancellation: hand the slot back
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+
+    def release(self):
+        with self._lock:
+            self._in_use = max(0, self._in_use - 1)
+            self._wake_locked()
+
+    @asynccontextmanager
+    async def slot(self, cost: float = 1.0):
+        """``async with semaphore.slot(cost):`` holds one slot for the block."""
+        await self.acquire(cost)
+        try:
+            yield self
+        finally:
+            self.release()
+
+    def _make_waiter(self, loop, cost: float) -> _Waiter:
+        return _Waiter(loop, cost)
+
+    def _enqueue_locked(self, waiter: _Waiter):
+        self._waiters.append(waiter)
+
+    def _dequeue_locked(self) -> Optional[_Waiter]:
+        return self._waiters.popleft() if self._waiters else None
+
+    def _discard_locked(self, waiter: _Waiter) -> bool:
+        """Remove a still-queued waiter; False if it was already dequeued."""
+        if waiter in self._waiters:
+            self._waiters.remove(waiter)
+            return True
+        return False
+
+    def _granted_locked(self, waiter: _Waiter):
+        """Called whenever a waiter gets a slot (immediately or after queueing)."""
+
+    def _wake_locked(self):
+        while self._in_use < self._limit:
+            waiter = self._dequeue_locked()
+            if waiter is None:
+                return
+            if waiter.loop.is_closed():
+                continue
+            self._in_use += 1
+            self._granted_locked(waiter)
+            waiter.loop.call_soon_threadsafe(self._grant, waiter.future)
+
+    def _grant(self, future):
+        if future.done():
+            # The waiter was cancelled after being granted a slot
+            self.release()
+        else:
+            future.set_result(True)
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.release()
+
+
+class AIMDController:
+    """Additive-increase / multiplicative-decrease control of query concurrency.
+
+    Completed requests report tokens generated and time-to-first-token; usage
+    samples supply memory headroom and swap rates. Once per ``window`` seconds
+    the controller compares the window against the previous one:
+
+    - congestion (TTFT above ``ttft_factor`` x its baseline, timeouts, less than
+      ``min_headroom_gb`` available, swap traffic, or memory PSI above
+      ``pressure_threshold``) multiplies the limit by ``decrease``;
+    - otherwise, if the slots were saturated and tokens/s improved by at least
+      ``gain_threshold``, the limit grows by ``increase``;
+    - otherwise the limit holds.
+    """
+
+    def __init__(self, semaphore: ResizableSemaphore, min_limit: int = 1, max_limit: int = 5,
+                 increase: int = 1, decrease: float = 0.5, window: float = 10.0,
+                 ttft_factor: float = 2.0, min_headroom_gb: float = 1.0,
+                 swap_threshold_mb: float = 1.0, pressure_threshold: float = 10.0,
+                 gain_threshold: float = 0.05, timeline=None):
+        self.semaphore = semaphore
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.increase = increase
+        self.decrease = decrease
+        self.window = window
+        self.ttft_factor = ttft_factor
+        self.min_headroom_gb = min_headroom_gb
+        self.swap_threshold_mb = swap_threshold_mb
+        self.pressure_threshold = pressure_threshold
+        self.gain_threshold = gain_threshold
+        self.timeline = timeline
+        self.baseline_ttft: Optional[float] = None
+        self.last_tokens_per_sec: Optional[float] = None
+        self.decisions = deque(maxlen=200)
+        self._completions = deque()
+        self._saturated = False
+        self._usage: Dict[str, Any] = {}
+        self._window_start = time.time()
+        self._lock = threading.Lock()
+
+    @property
+    def limit(self) -> int:
+        return self.semaphore.limit
+
+    def seed(self, limit: int, reason: str = "static estimate"):
+        """Set the starting limit (clamped to the configured bounds)."""
+        self._apply(min(self.max_limit, max(self.min_limit, limit)), 'seed', reason, {})
+
+    def record(self, tokens: int, ttft: Optional[float], duration: float, timed_out: bool = False):
+        """Record one completed request."""
+        with self._lock:
+            self._completions.append((time.time(), tokens, ttft, duration, timed_out))
+            self._note_saturation()
+
+    def note_acquire(self):
+        """Called when a slot is taken; remembers whether demand filled every slot."""
+        with self._lock:
+            self._note_saturation()
+
+    def _note_saturation(self):
+        if self.semaphore.waiting or self.semaphore.in_use >= self.semaphore.limit:
+            self._saturated = True
+
+    def on_usage(self, usage: Dict):
+        """Usage sampler listener; evaluates once per window."""
+        self._usage = usage
+        now = usage.get('timestamp', time.time())
+        if now - self._window_start >= self.window:
+            self.evaluate(now)
+
+    def evaluate(self, now: Optional[float] = None) -> Optional[Dict]:
+        """Close the current window and apply one AIMD step."""
+        now = now or time.time()
+        with self._lock:
+            elapsed = max(1e-6, now - self._window_start)
+            completions = [c for c in self._completions if c[0] <= now]
+            self._completions.clear()
+            saturated = self._saturated
+            self._saturated = bool(self.semaphore.waiting)
+            self._window_start = now
+
+        memory = self._usage.get('memory', {})
+        swap = self._usage.get('swap', {})
+        ttfts = [c[2] for c in completions if c[2] is not None]
+        metrics = {
+            'completed': len(completions),
+            'tokens_per_sec': round(sum(c[1] for c in completions) / elapsed, 2),
+            'ttft': round(statistics.median(ttfts), 3) if ttfts else None,
+            'baseline_ttft': round(self.baseline_ttft, 3) if self.baseline_ttft else None,
+            'timeouts': sum(1 for c in completions if c[4]),
+            'headroom_gb': memory.get('available_gb'),
+            'memory_pressure': self._usage.get('pressure', {}).get('memory', {}).get('some', {}).get('avg10'),
+            'swap_mb_per_sec': round((swap.get('in_per_sec', 0.0) + swap.get('out_per_sec', 0.0)) / (1024**2), 2),
+            'saturated': saturated,
+            'in_use': self.semaphore.in_use,
+            'waiting': self.semaphore.waiting
+        }
+
+        reasons = []
+        if metrics['ttft'] is not None and self.baseline_ttft and metrics['ttft'] > self.baseline_ttft * self.ttft_factor:
+            reasons.append(f"TTFT {metrics['ttft']:.2f}s > {self.ttft_factor:g}x baseline {self.baseline_ttft:.2f}s")
+        if metrics['timeouts']:
+            reasons.append(f"{metrics['timeouts']} timeout(s)")
+        if metrics['headroom_gb'] is not None and metrics['headroom_gb'] < self.min_headroom_gb:
+            reasons.append(f"only {metrics['headroom_gb']}GB available")
+        if metrics['swap_mb_per_sec'] > self.swap_threshold_mb:
+            reasons.append(f"swapping {metrics['swap_mb_per_sec']}MB/s")
+        if metrics['memory_pressure'] is not None and metrics['memory_pressure'] > self.pressure_threshold:
+            reasons.append(f"memory pressure {metrics['memory_pressure']:.1f}%")
+
+        if reasons:
+            decision = self._apply(max(self.min_limit, int(self.limit * self.decrease)), 'decrease', "; ".join(reasons), metrics)
+            # Throughput at the old limit is no longer a fair comparison
+            self.last_tokens_per_sec = None
+        elif not completions:
+            decision = self._apply(self.limit, 'hold', "idle", metrics)
+        else:
+            if metrics['ttft'] is not None:
+                # Baseline follows improvements immediately and degradations slowly
+                if self.baseline_ttft is None or metrics['ttft'] < self.baseline_ttft:
+                    self.baseline_ttft = metrics['ttft']
+                else:
+                    self.baseline_ttft += 0.1 * (metrics['ttft'] - self.baseline_ttft)
+
+            previous = self.last_tokens_per_sec
+            improving = previous is None or metrics['tokens_per_sec'] > previous * (1 + self.gain_threshold)
+            if saturated and improving and self.limit < self.max_limit:
+                decision = self._apply(min(self.max_limit, self.limit + self.increase), 'increase',
+                                       "throughput improving", metrics)
+            else:
+                reason = "not saturated" if not saturated else "at ceiling" if self.limit >= self.max_limit else "throughput plateau"
+                decision = self._apply(self.limit, 'hold', reason, metrics)
+            self.last_tokens_per_sec = metrics['tokens_per_sec']
+        return decision
+
+    def _apply(self, new_limit: int, action: str, reason: str, metrics: Dict) -> Dict:
+        previous = self.limit
+        self.semaphore.resize(new_limit)
+        decision = {'timestamp': time.time(), 'action': action, 'previous': previous,
+                    'limit': self.limit, 'reason': reason, **metrics}
+        self.decisions.append(decision)
+        if previous != self.limit:
+            print(f"🎚️  Concurrency {previous} → {self.limit} ({action}: {reason})")
+            if self.timeline is not None:
+                self.timeline.mark('concurrency', f"{previous} → {self.limit}", action=action, reason=reason)
+        return decision
+
+    def status(self, limit: int = 50) -> Dict:
+        """Current limit, slot usage and the most recent decisions."""
+        return {
+            'limit': self.limit,
+            'min_limit': self.min_limit,
+            'max_limit': self.max_limit,
+            'in_use': self.semaphore.in_use,
+            'waiting': self.semaphore.waiting,
+            'baseline_ttft': self.baseline_ttft,
+            'decisions': list(self.decisions)[-limit:]
+        }
+
+
+class PerformanceRegistry:
+    """Per-model running averages of response time, TTFT and tokens/s.
+    
+    Fed by every completed query; used to estimate how long queued work will
+    take before it starts.
+    """
+
+    def __init__(self, alpha: float = 0.3, default_seconds: float = 30.0):
+        self.alpha = alpha
+        self.default_seconds = default_seconds
+        self.models: Dict[str, Dict[str, float]] = {}
+        self.listeners: List[Callable[..., None]] = []
+        self._lock = threading.Lock()
+
+    def add_listener(self, listener: Callable[..., None]):
+        """Register a callback receiving each recorded ``(model, response_time, tokens, ttft, ok)``."""
+        self.listeners.append(listener)
+
+    def record(self, model: str, response_time: float, tokens: int = 0,
+               ttft: Optional[float] = None, ok: bool = True, notify: bool = True):
+        """Fold one completed request into the model's averages (failures count toward errors only)."""
+        with self._lock:
+            stats = self.models.setdefault(model, {'requests': 0, 'errors': 0})
+            stats['requests'] += 1
+            if not ok:
+                stats['errors'] += 1
+            else:
+                observed = {'response_time': response_time, 'ttft': ttft,
+                            'tokens_per_sec': tokens / response_time if tokens and response_time > 0 else None}
+                for key, value in observed.items():
+                    if value is None:
+                        continue
+                    previous = stats.get(key)
+                    stats[key] = value if previous is None else previous + self.alpha * (value - previous)
+        if notify:
+            for listener in list(self.listeners):
+                try:
+                    listener(model, response_time, tokens, ttft, ok)
+                except Exception as e:
+                    print(f"⚠️  Performance listener failed: {e}")
+
+    def expected_time(self, model: str) -> float:
+        """Expected response time for ``model``: its own average, else the mean of all models."""
+        with self._lock:
+            stats = self.models.get(model, {})
+            if 'response_time' in stats:
+                return stats['response_time']
+            known = [s['response_time'] for s in self.models.values() if 'response_time' in s]
+        return sum(known) / len(known) if known else self.default_seconds
+
+    def estimate_parallel(self, models: List[str], concurrency: int = 1) -> float:
+        """Wall time for querying ``models`` with up to ``concurrency`` running at once."""
+        times = [self.expected_time(model) for model in models]
+        if not times:
+            return 0.0
+        return max(max(times), sum(times) / max(1, min(concurrency, len(times))))
+
+    def estimate_sequential(self, models: List[str], repeats: int = 1) -> float:
+        """Wall time for querying ``models`` one after another, ``repeats`` times."""
+        return sum(self.expected_time(model) for model in models) * repeats
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {model: {key: round(value, 3) if isinstance(value, float) else value
+                            for key, value in stats.items()}
+                    for model, stats in self.models.items()}
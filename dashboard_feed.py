@@ -0,0 +1,324 @@
+"""
+Dashboard feed module for the unified application.
+
+The dashboard used to receive a full snapshot of every widget every five
+seconds, whether or not anyone had /dashboard open. Here every widget is a
+Socket.IO topic (``dashboard:<widget>``) with its own refresh cadence:
+
+- a widget is recomputed only while a client is subscribed to it, and the
+  updater sleeps while there are no subscribers at all;
+- each change gets a new version, and a client receives only the fields that
+  changed since the version it last saw (a full snapshot when it is new or
+  too far behind);
+- subscribing to ``dashboard`` subscribes to every widget;
+- ``bundle`` serves the same cached state for a one-request first paint.
+"""
+
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Seconds between recomputations of each widget while it has subscribers
+WIDGET_INTERVALS = {
+    'time': 1.0,
+    'system': 2.0,
+    'stocks': 5.0,
+    'weather': 600.0,
+    'calendar': 3600.0,
+    'quote': 3600.0,
+    'vocabulary': 3600.0,
+    'puzzle': 3600.0
+}
+
+_MISSING = object()
+
+
+def widget_topic(widget: str) -> str:
+    return f"dashboard:{widget}"
+
+
+DASHBOARD_TOPICS = tuple(widget_topic(widget) for widget in WIDGET_INTERVALS)
+
+
+def diff_fields(old: Dict, new: Dict) -> Optional[Dict]:
+    """Fields of ``new`` that differ from ``old``, recursing into nested dicts.
+
+    Returns None when a key was removed (deltas only add or replace fields).
+    """
+    if any(key not in new for key in old):
+        return None
+    changes = {}
+    for key, value in new.items():
+        previous = old.get(key, _MISSING)
+        if isinstance(value, dict) and isinstance(previous, dict):
+            nested = diff_fields(previous, value)
+            if nested is None:
+                return None
+            if nested:
+                changes[key] = nested
+        elif value != previous:
+            changes[key] = value
+    return changes
+
+
+@dataclass
+class Widget:
+    """One dashboard widget: how to compute it, how often, and its recent versions."""
+    name: str
+    compute: Callable[[], Dict]
+    interval: float
+    version: str = ""
+    value: Optional[Dict] = None
+    next_due: float = 0.0
+    history: deque = field(default_factory=lambda: deque(maxlen=8))
+    computes: int = 0
+    deltas: int = 0
+    snapshots: int = 0
+
+
+class DashboardFeed:
+    """Versioned, per-widget dashboard updates for subscribed clients only.
+
+    ``to_topic(event, data, topic)`` and ``to_session(event, data, sid)`` send
+    the ``dashboard_delta`` events (normally a ``RoomEmitter``'s methods).
+    Clients that are all on the same version share one topic emit; others
+    get their own delta.
+    """
+
+    def __init__(self, computes: Dict[str, Callable[[], Dict]], to_topic: Callable, to_session: Callable,
+                 intervals: Optional[Dict[str, float]] = None, history: int = 8):
+        intervals = dict(WIDGET_INTERVALS, **(intervals or {}))
+        self.widgets = {
+            name: Widget(name, compute, intervals.get(name, 60.0), history=deque(maxlen=history))
+            for name, compute in computes.items()
+        }
+        self.to_topic = to_topic
+        self.to_session = to_session
+        # Per session: widget -> version the client has
+        self.clients: Dict[str, Dict[str, str]] = {}
+        self._epoch = uuid.uuid4().hex[:6]  # versions from another process never match ours
+        self._counter = 0
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @classmethod
+    def from_config(cls, config, computes: Dict[str, Callable[[], Dict]], to_topic: Callable,
+                    to_session: Callable) -> "DashboardFeed":
+        return cls(computes, to_topic, to_session, intervals=config.get("dashboard_intervals"))
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def expand(self, topics: Iterable[str]) -> List[str]:
+        """Replace ``dashboard`` with every widget topic."""
+        expanded = []
+        for topic in topics:
+            for item in ([widget_topic(name) for name in self.widgets] if topic == 'dashboard' else [topic]):
+                if item not in expanded:
+                    expanded.append(item)
+        return expanded
+
+    def _widget_names(self, topics: Iterable[str]) -> List[str]:
+        return [topic.split(":", 1)[1] for topic in topics
+                if topic.startswith("dashboard:") and topic.split(":", 1)[1] in self.widgets]
+
+    def subscribe(self, session_id: str, topics: Iterable[str], versions: Optional[Dict[str, str]] = None):
+        """Start sending the widgets in ``topics`` to a session, beginning with what it is missing.
+
+        ``versions`` are the widget versions the client already has (e.g. from
+        before a reconnect); the first update is a delta from those if possible.
+        """
+        versions = versions or {}
+        sends = []
+        with self._lock:
+            client = self.clients.setdefault(session_id, {})
+            for name in self._widget_names(topics):
+                widget = self.widgets[name]
+                if time.time() >= widget.next_due:
+                    # Stale (nobody was watching): refresh now, and update any other subscribers too.
+                    # They get their own emits, since the topic room already includes this session.
+                    previous = widget.version
+                    self._refresh_locked(widget)
+                    others = [sid for sid in self.subscribers(name) if sid != session_id]
+                    if widget.version != previous and others:
+                        sends.extend(self._push_locked(widget, others, shared=False))
+                if widget.value is None:
+                    continue
+                base = versions.get(name)
+                if base != widget.version:
+                    sends.append((self.to_session, self._payload_locked(widget, base), session_id))
+                client[name] = widget.version
+        for send in sends:
+            send[0]('dashboard_delta', *send[1:])
+        self._wakeup.set()
+
+    def unsubscribe(self, session_id: str, topics: Optional[Iterable[str]] = None):
+        with self._lock:
+            client = self.clients.get(session_id)
+            if client is None:
+                return
+            for name in (list(client) if topics is None else self._widget_names(topics)):
+                client.pop(name, None)
+            if not client:
+                del self.clients[session_id]
+
+    def forget_session(self, session_id: str):
+        with self._lock:
+            self.clients.pop(session_id, None)
+
+    def subscribers(self, name: str) -> List[str]:
+        return [sid for sid, versions in self.clients.items() if name in versions]
+
+    def tick(self, now: Optional[float] = None) -> Optional[float]:
+        """Recompute due widgets that have subscribers and push their changes.
+
+        Returns seconds until the next widget is due, or None when nobody is subscribed.
+        """
+        now = time.time() if now is None else now
+        sends: List[Tuple] = []
+        next_due = None
+        with self._lock:
+            for widget in self.widgets.values():
+                subscribers = self.subscribers(widget.name)
+                if not subscribers:
+                    continue
+                if now >= widget.next_due:
+                    previous = widget.version
+                    self._refresh_locked(widget, now)
+                    if widget.version != previous:
+                        sends.extend(self._push_locked(widget, subscribers))
+                next_due = widget.next_due if next_due is None else min(next_due, widget.next_due)
+        for send in sends:
+            send[0]('dashboard_delta', *send[1:])
+        return None if next_due is None else max(0.0, next_due - now)
+
+    def _refresh_locked(self, widget: Widget, now: Optional[float] = None):
+        widget.next_due = (time.time() if now is None else now) + widget.interval
+        self._apply_locked(widget, self._compute(widget))
+
+    def _compute(self, widget: Widget):
+        try:
+            return widget.compute()
+        except Exception as e:
+            print(f"Dashboard widget '{widget.name}' failed: {e}")
+            return _MISSING
+
+    def _apply_locked(self, widget: Widget, value):
+        if value is _MISSING:
+            return
+        widget.computes += 1
+        if value != widget.value:
+            self._counter += 1
+            widget.version = f"{self._epoch}.{self._counter}"
+            widget.value = value
+            widget.history.append((widget.version, value))
+
+    def bundle(self, names: Optional[Iterable[str]] = None, have: Optional[Dict[str, str]] = None,
+               now: Optional[float] = None) -> Dict:
+        """Current state of the widgets in ``names`` (all by default) in one payload.
+
+        Stale widgets are recomputed concurrently first (and any subscribers
+        sent the change). Widgets the caller already has at their current
+        version (``have``: widget -> version) are listed under 'unchanged'
+        instead of 'widgets'. 'max_age' is how long until any of them can change.
+        """
+        now = time.time() if now is None else now
+        have = have or {}
+        widgets = [self.widgets[name] for name in (self.widgets if names is None else names) if name in self.widgets]
+        stale = [widget for widget in widgets if now >= widget.next_due]
+        if stale and self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="dashboard-bundle")
+        values = list(self._executor.map(self._compute, stale)) if stale else []
+        sends: List[Tuple] = []
+        with self._lock:
+            for widget, value in zip(stale, values):
+                if now < widget.next_due:
+                    continue  # refreshed by someone else meanwhile
+                previous = widget.version
+                widget.next_due = now + widget.interval
+                self._apply_locked(widget, value)
+                subscribers = self.subscribers(widget.name)
+                if widget.version != previous and subscribers:
+                    sends.extend(self._push_locked(widget, subscribers))
+            bundle = {'widgets': {}, 'unchanged': [], 'versions': {}, 'max_age': None}
+            for widget in widgets:
+                if widget.value is None:
+                    continue
+                max_age = max(0, int(widget.next_due - now))
+                bundle['versions'][widget.name] = widget.version
+                bundle['max_age'] = max_age if bundle['max_age'] is None else min(bundle['max_age'], max_age)
+                if have.get(widget.name) == widget.version:
+                    bundle['unchanged'].append(widget.name)
+                else:
+                    bundle['widgets'][widget.name] = {'version': widget.version, 'fields': widget.value,
+                                                      'max_age': max_age}
+        for send in sends:
+            send[0]('dashboard_delta', *send[1:])
+        bundle['max_age'] = bundle['max_age'] or 0
+        return bundle
+
+    def _payload_locked(self, widget: Widget, base: Optional[str]) -> Dict:
+        """Delta from ``base`` when it is still in the widget's history, else a full snapshot."""
+        base_value = next((value for version, value in widget.history if version == base), None)
+        fields = diff_fields(base_value, widget.value) if base_value is not None else None
+        if fields is None:
+            widget.snapshots += 1
+            return {'widget': widget.name, 'version': widget.version, 'base': None, 'full': True,
+                    'fields': widget.value}
+        widget.deltas += 1
+        return {'widget': widget.name, 'version': widget.version, 'base': base, 'full': False, 'fields': fields}
+
+    def _push_locked(self, widget: Widget, subscribers: List[str], shared: bool = True) -> List[Tuple]:
+        groups: Dict[Optional[str], List[str]] = {}
+        for sid in subscribers:
+            groups.setdefault(self.clients[sid][widget.name], []).append(sid)
+            self.clients[sid][widget.name] = widget.version
+        sends = []
+        for base, sids in groups.items():
+            payload = self._payload_locked(widget, base)
+            if shared and len(sids) == len(subscribers):
+                sends.append((self.to_topic, payload, widget_topic(widget.name)))
+            else:
+                sends.extend((self.to_session, payload, sid) for sid in sids)
+        return sends
+
+    def start(self):
+        """Run ``tick`` in a background thread that sleeps while nobody is subscribed (idempotent)."""
+        if self.running:
+            return
+        self._thread = threading.Thread(target=self._run, name="dashboard-feed", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.clear()
+            try:
+                delay = self.tick()
+            except Exception as e:
+                print(f"Dashboard update error: {e}")
+                delay = 10.0
+            self._wakeup.wait(delay)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'sessions': len(self.clients),
+                'widgets': {
+                    name: {
+                        'interval': widget.interval,
+                        'subscribers': len(self.subscribers(name)),
+                        'version': widget.version,
+                        'computes': widget.computes,
+                        'deltas': widget.deltas,
+                        'snapshots': widget.snapshots
+                    }
+                    for name, widget in self.widgets.items()
+                }
+            }
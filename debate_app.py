@@ -7,9 +7,8 @@ Flask-based web interface for multi-round model debates with streaming responses
 import asyncio
 import json
 from datetime import datetime
-from flask import Flask, render_template, request, jsonify, Response
+from flask import Flask, request, jsonify, Response
 from flask_socketio import SocketIO, emit
-import threading
 import queue
 import time
 import random
@@ -21,44 +20,43 @@ from models import (
     PromptEnhancer,
     ModelResponse
 )
+from admission import AdmissionQueue, AdmissionRejected
+from async_worker import async_worker
+from scheduler import set_job_context
+from socket_rooms import RoomEmitter
+from coalescing import ChunkCoalescer, frame_stats
+from asset_pipeline import AssetPipeline
+from session_state import SessionRegistry
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'debate-secret-key-here'
 socketio = SocketIO(app, cors_allowed_origins="*")
 
+# Events go to the asking session's room (or a subscribed topic), never to everyone
+emitter = RoomEmitter(socketio)
+
 # Global instances
 config_manager = ConfigManager()
 model_manager = OllamaModelManager(config_manager)
+assets = AssetPipeline.from_config(config_manager)
 available_models = []
 
+# Bounded admission in front of the query/debate workers
+admission = AdmissionQueue.from_config(config_manager, on_queued=emitter.queued)
+
+# Per-session byte accounting and caps; state is released on disconnect or when idle
+sessions = SessionRegistry.from_config(config_manager, on_expire=lambda session_id: expire_session(session_id))
+
 # Debate configuration
 DEBATE_ROUNDS = 3
 MAX_DEBATE_MODELS = 4
 
 def filter_large_models(models):
     """Filter out ultra-large models (70B+ parameters) that may be too resource intensive."""
-    filtered_models = []
-    excluded_models = []
+    filtered_models, excluded_models = model_manager.catalog.snapshot.split_large(models)
     
-    for model in models:
-        model_lower = model.lower()
-        
-        # Check for ultra-large model indicators
-        is_ultra_large = any([
-            '70b' in model_lower,
-            '72b' in model_lower,
-            '405b' in model_lower,
-            'llama3.1:70b' in model_lower,
-            'llama3.2:70b' in model_lower,
-            'qwen2.5:72b' in model_lower,
-            'codellama:70b' in model_lower
-        ])
-        
-        if is_ultra_large:
-            excluded_models.append(model)
-            print(f"⚠️  Excluding ultra-large model: {model} (likely 70B+ parameters)")
-        else:
-            filtered_models.append(model)
+    for model in excluded_models:
+        print(f"⚠️  Excluding ultra-large model: {model} (likely 70B+ parameters)")
     
     if excluded_models:
         print(f"📊 Filtered {len(excluded_models)} ultra-large models, {len(filtered_models)} models available")
@@ -111,41 +109,50 @@ def initialize_models_on_startup():
 class DebateStreamingHandler:
     """Handles streaming responses for debate interface."""
     
-    def __init__(self, session_id):
+    def __init__(self, session_id, job=None):
         self.session_id = session_id
-        self.responses = {}
+        # Streamed text is not kept here: the model query builds it, charged to the session's job
+        self.job = job
         self.start_times = {}
+        self.coalescer = ChunkCoalescer.from_config(
+            config_manager, self._emit_chunk, rtt=lambda: emitter.rtt(session_id))
+        emitter.probe_rtt(session_id)
+    
+    def _emit_chunk(self, model_name: str, text: str):
+        """Send one coalesced frame of streamed text to the client."""
+        emitter.to_session('debate_chunk_received', {
+            'model': model_name,
+            'chunk': text,
+            'session_id': self.session_id
+        }, self.session_id)
     
     async def streaming_callback(self, model_name: str, chunk: str, is_done: bool):
         """Callback for streaming model responses during debate."""
         if chunk and not is_done:
             # Initialize model tracking if first chunk
-            if model_name not in self.responses:
-                self.responses[model_name] = ""
+            if model_name not in self.start_times:
                 self.start_times[model_name] = time.time()
-                socketio.emit('debate_model_started', {
+                emitter.to_session('debate_model_started', {
                     'model': model_name,
                     'session_id': self.session_id
-                })
+                }, self.session_id)
             
-            # Add chunk to response
-            self.responses[model_name] += chunk
-            
-            # Emit chunk to client
-            socketio.emit('debate_chunk_received', {
-                'model': model_name,
-                'chunk': chunk,
-                'session_id': self.session_id
-            })
+            # Count the chunk against the session's cap; the coalescer batches chunks into frames
+            if self.job:
+                self.job.charge(chunk)
+            self.coalescer.add(model_name, chunk)
             
         elif is_done:
+            # Final flush before announcing completion
+            self.coalescer.finish(model_name)
+            
             # Model completed
             elapsed_time = time.time() - self.start_times.get(model_name, 0)
-            socketio.emit('debate_model_completed', {
+            emitter.to_session('debate_model_completed', {
                 'model': model_name,
                 'elapsed_time': elapsed_time,
                 'session_id': self.session_id
-            })
+            }, self.session_id)
 
 class DebateManager:
     """Manages the debate flow and rounds."""
@@ -240,7 +247,12 @@ FINAL ANALYSIS:"""
 @app.route('/')
 def index():
     """Main page."""
-    return render_template('debate.html')
+    return assets.page('debate.html')
+
+@app.route('/assets/<name>')
+def asset(name):
+    """Serve a hashed CSS/JS asset extracted from the page template."""
+    return assets.asset(name)
 
 @app.route('/api/models')
 def get_models():
@@ -309,16 +321,54 @@ def get_system_usage():
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@app.route('/api/system-usage/history')
+def get_system_usage_history():
+    """Get resource usage history (CPU, memory, network, in-flight models) for a time window."""
+    try:
+        window = request.args.get('window', 300, type=float)
+        return jsonify({
+            'success': True,
+            'history': model_manager.resource_manager.timeseries.history(window)
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/admin/sessions')
+def get_session_stats():
+    """Get per-session held bytes, caps and cleanup counters."""
+    return jsonify({'success': True, 'sessions': sessions.stats()})
+
+@app.route('/api/admin/emits')
+def get_emit_stats():
+    """Get per-room Socket.IO emit counters, deliveries saved versus broadcasting, and frames/s vs tokens/s."""
+    return jsonify({'success': True, 'emits': emitter.stats(), 'streaming': frame_stats.snapshot()})
+
 @socketio.on('connect')
 def handle_connect():
     """Handle client connection."""
     print(f"Debate client connected: {request.sid}")
     emit('connected', {'session_id': request.sid})
+    sessions.touch(request.sid)
+    emitter.probe_rtt(request.sid)
 
 @socketio.on('disconnect')
 def handle_disconnect():
     """Handle client disconnection."""
     print(f"Debate client disconnected: {request.sid}")
+    end_session(request.sid)
+
+def end_session(session_id):
+    """Drop a disconnected session's queued and running jobs and per-session state."""
+    admission.cancel(session_id)
+    sessions.release(session_id)
+    emitter.forget_session(session_id)
+
+def expire_session(session_id):
+    """Release an idle session; one that is no longer connected is ended entirely."""
+    if emitter.members(session_id):
+        sessions.release(session_id)
+    else:
+        end_session(session_id)
 
 @socketio.on('start_debate')
 def handle_start_debate(data):
@@ -335,43 +385,38 @@ def handle_start_debate(data):
         emit('error', {'message': f'Participant count must be between 2 and {MAX_DEBATE_MODELS}'})
         return
     
-    # Start processing in background
-    thread = threading.Thread(
-        target=process_debate_async,
-        args=(topic, participant_count, session_id)
-    )
-    thread.daemon = True
-    thread.start()
-
-def process_debate_async(topic: str, participant_count: int, session_id: str):
-    """Process debate asynchronously."""
+    # Start processing in background once admitted
     try:
-        # Run in new event loop for thread
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        
-        result = loop.run_until_complete(
-            process_debate(topic, participant_count, session_id)
+        admission.submit(
+            session_id, 'debate', process_debate_async,
+            args=(topic, participant_count, session_id),
+            estimate=model_manager.estimate_debate_time(available_models[:participant_count], DEBATE_ROUNDS)
         )
-        
-        loop.close()
-        
+    except AdmissionRejected as e:
+        emit('error', {'message': str(e), 'reason': e.reason, 'retry_after': e.retry_after})
+
+async def process_debate_async(topic: str, participant_count: int, session_id: str):
+    """Process the debate on the shared async worker loop."""
+    set_job_context(session_id, 'debate')
+    try:
+        with sessions.job(session_id) as job:
+            await process_debate(topic, participant_count, session_id, job)
     except Exception as e:
-        socketio.emit('error', {
+        emitter.to_session('error', {
             'message': f'Error processing debate: {str(e)}',
             'session_id': session_id
-        })
+        }, session_id)
 
-async def process_debate(topic: str, participant_count: int, session_id: str):
+async def process_debate(topic: str, participant_count: int, session_id: str, job=None):
     """Process the actual debate."""
     try:
         global available_models
         
         if not available_models:
-            socketio.emit('error', {
+            emitter.to_session('error', {
                 'message': 'No models available for debate',
                 'session_id': session_id
-            })
+            }, session_id)
             return
         
         # Initialize debate manager
@@ -382,22 +427,22 @@ async def process_debate(topic: str, participant_count: int, session_id: str):
         selected_models = debate_manager.select_debate_models(available_models, participant_count)
         
         # Emit debate start
-        socketio.emit('debate_started', {
+        emitter.to_session('debate_started', {
             'topic': topic,
             'participants': selected_models,
             'rounds': DEBATE_ROUNDS,
             'session_id': session_id
-        })
+        }, session_id)
         
         # Conduct debate rounds
         for round_num in range(1, DEBATE_ROUNDS + 1):
             debate_manager.current_round = round_num
             
-            socketio.emit('debate_round_started', {
+            emitter.to_session('debate_round_started', {
                 'round': round_num,
                 'total_rounds': DEBATE_ROUNDS,
                 'session_id': session_id
-            })
+            }, session_id)
             
             # Create prompt for this round
             prompt = debate_manager.create_debate_prompt(
@@ -407,16 +452,19 @@ async def process_debate(topic: str, participant_count: int, session_id: str):
             )
             
             # Setup streaming handler
-            streaming_handler = DebateStreamingHandler(session_id)
+            streaming_handler = DebateStreamingHandler(session_id, job)
             
             # Query all participants for this round
-            responses = await model_manager.query_multiple_models(
-                selected_models,
-                prompt,
-                max_concurrent=min(3, len(selected_models)),
-                stream=True,
-                callback=streaming_handler.streaming_callback
-            )
+            try:
+                responses = await model_manager.query_multiple_models(
+                    selected_models,
+                    prompt,
+                    max_concurrent=min(3, len(selected_models)),
+                    stream=True,
+                    callback=streaming_handler.streaming_callback
+                )
+            finally:
+                streaming_handler.coalescer.close()
             
             # Store round results
             for response in responses:
@@ -439,20 +487,20 @@ async def process_debate(topic: str, participant_count: int, session_id: str):
                 for r in responses
             ]
             
-            socketio.emit('debate_round_completed', {
+            emitter.to_session('debate_round_completed', {
                 'round': round_num,
                 'results': round_results,
                 'session_id': session_id
-            })
+            }, session_id)
             
             # Brief pause between rounds
             if round_num < DEBATE_ROUNDS:
                 await asyncio.sleep(2)
         
         # Generate final summary
-        socketio.emit('debate_summary_started', {
+        emitter.to_session('debate_summary_started', {
             'session_id': session_id
-        })
+        }, session_id)
         
         # Use one of the participants to generate summary (or select best model)
         summary_model = selected_models[0]  # Could be improved to select best model
@@ -461,7 +509,7 @@ async def process_debate(topic: str, participant_count: int, session_id: str):
         summary_response = await model_manager.query_model(summary_model, summary_prompt, stream=False)
         
         # Emit final results
-        socketio.emit('debate_completed', {
+        emitter.to_session('debate_completed', {
             'topic': topic,
             'participants': selected_models,
             'total_rounds': DEBATE_ROUNDS,
@@ -472,13 +520,13 @@ async def process_debate(topic: str, participant_count: int, session_id: str):
             },
             'debate_history': debate_manager.debate_history,
             'session_id': session_id
-        })
+        }, session_id)
         
     except Exception as e:
-        socketio.emit('error', {
+        emitter.to_session('error', {
             'message': f'Error during debate processing: {str(e)}',
             'session_id': session_id
-        })
+        }, session_id)
 
 if __name__ == '__main__':
     print("🗣️  Starting Model Debate Application...")
@@ -491,5 +539,11 @@ if __name__ == '__main__':
         print("⚠️  Warning: No models available. The application will start but functionality will be limited.")
         print("   Please ensure Ollama is running and models are installed.")
     
+    # Sample system usage in the background so usage endpoints never block
+    model_manager.resource_manager.start_usage_sampler(config_manager.get("usage_sample_interval", 1.0))
+    # Expire state of sessions that have gone idle (or whose disconnect was missed)
+    sessions.start_sweeper()
+    async_worker.start(config_manager.get("use_uvloop", True))
+    
     print("\n🌐 Starting debate web server...")
     socketio.run(app, debug=True, host='0.0.0.0', port=5001)
@@ -0,0 +1,107 @@
+"""
+Degradation policy module for the multi-model query application.
+
+When the host is under memory pressure, running the models a user selected
+either makes everyone wait or pushes the machine into swap. The policy swaps
+each selected model for a smaller installed variant of the same model line
+(a smaller parameter count or a lower quantization under the same base name) and
+defers models that have no smaller variant, so they run last and one at a time.
+"""
+
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+
+@dataclass
+class DegradationDecision:
+    """How a set of requested models will actually be served."""
+    models: List[str]  # requested models, in order
+    substitutions: Dict[str, str] = field(default_factory=dict)  # requested -> smaller variant
+    deferred: List[str] = field(default_factory=list)  # no smaller variant: run last, alone
+    reason: Optional[str] = None  # the pressure that triggered degradation
+
+    @property
+    def degraded(self) -> bool:
+        return bool(self.substitutions or self.deferred)
+
+    def served_by(self, model: str) -> str:
+        return self.substitutions.get(model, model)
+
+    def to_dict(self) -> Dict:
+        return {
+            'substitutions': dict(self.substitutions),
+            'deferred': list(self.deferred),
+            'reason': self.reason
+        }
+
+
+class DegradationPolicy:
+    """Substitute smaller variants for selected models while memory is under pressure.
+
+    Pressure means any of: memory PSI "some" avg10 above the resource manager's
+    threshold, less than ``min_free_gb`` available, or swap traffic above
+    ``swap_threshold_mb`` per second in the latest usage sample.
+    """
+
+    def __init__(self, resource_manager, catalog, min_free_gb: float = 1.5,
+                 swap_threshold_mb: float = 1.0, enabled: bool = True):
+        self.resource_manager = resource_manager
+        self.catalog = catalog
+        self.min_free_gb = min_free_gb
+        self.swap_threshold_mb = swap_threshold_mb
+        self.enabled = enabled
+
+    def pressure_reason(self) -> Optional[str]:
+        """Why the host counts as under memory pressure right now, or None."""
+        sampler = self.resource_manager.usage_sampler
+        usage = sampler.latest() if sampler else {}
+        pressure = usage.get('pressure') if 'pressure' in usage else self.resource_manager.read_pressure()
+        reason = self.resource_manager.launch_pressure(pressure)
+        if reason and reason.startswith("memory"):
+            return reason
+
+        available = usage.get('memory', {}).get('available_gb')
+        if available is None:
+            available = self.resource_manager.get_live_available_ram_gb()
+        if available < self.min_free_gb:
+            return f"only {available:.1f}GB available"
+
+        swap = usage.get('swap', {})
+        swap_mb = (swap.get('in_per_sec', 0.0) + swap.get('out_per_sec', 0.0)) / (1024**2)
+        if swap_mb > self.swap_threshold_mb:
+            return f"swapping {swap_mb:.1f}MB/s"
+        return None
+
+    def evaluate(self, models: List[str], reason: Optional[str] = None) -> DegradationDecision:
+        """Decide substitutions/deferrals for ``models`` (no-op without pressure)."""
+        decision = DegradationDecision(models=list(models))
+        if not self.enabled:
+            return decision
+        decision.reason = reason or self.pressure_reason()
+        if not decision.reason:
+            return decision
+
+        snapshot = self.catalog.snapshot
+        estimate = self.resource_manager.estimate_model_requirements
+        budget = self.resource_manager.get_live_available_ram_gb() * 0.7
+        for model in models:
+            entry = snapshot.get(model)
+            needed = estimate(model).min_ram_gb
+            family = entry.family.lower() if entry else ""
+            smaller = [
+                (variant.name, estimate(variant.name).min_ram_gb, variant.family.lower() == family)
+                for variant in snapshot.variants_of(model)
+                if not entry or variant.is_coding == entry.is_coding
+            ]
+            smaller = [candidate for candidate in smaller if candidate[1] < needed]
+            if not smaller:
+                decision.deferred.append(model)
+                continue
+            # Prefer the same family, then the largest variant that still fits
+            fitting = [candidate for candidate in smaller if candidate[1] <= budget]
+            if fitting:
+                choice = max(fitting, key=lambda c: (c[2], c[1]))
+            else:
+                choice = min(smaller, key=lambda c: c[1])
+            decision.substitutions[model] = choice[0]
+        return decision
@@ -0,0 +1,508 @@
+"""
+Model catalog module for the multi-model query application.
+
+Ingests the full Ollama ``/api/tags`` payload once per refresh, precomputes the
+facts every caller needs (coding flag, specialty, category, real size, large
+model flag) and publishes them as an immutable snapshot. Readers grab the
+current snapshot reference and never need a lock; writers build a new snapshot
+and swap the reference in a single assignment.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass, field, asdict
+from types import MappingProxyType
+from typing import List, Dict, Any, Optional, Tuple, Mapping, Callable
+
+
+# Models at or above this parameter count are considered ultra-large
+LARGE_MODEL_PARAMS_B = 65.0
+
+# Next to this module, whatever directory the app is launched from
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "model_catalog.json")
+
+# Parameter counts embedded in tags, e.g. "llama3.1:70b", "phi3:3.8b-mini",
+# "mixtral:8x7b". Anchored on separators so "llama3.1-..." never matches.
+_PARAM_PATTERN = re.compile(r'(?:^|[:\-_/])(?:(\d+)x)?(\d+(?:\.\d+)?)([bm])(?=$|[:\-_.])')
+
+MODEL_SPECIALTIES = {
+    # Llama models
+    "llama3.2": {
+        "specialty": "General Reasoning",
+        "description": "Balanced performance across tasks, good reasoning",
+        "strengths": ["reasoning", "analysis", "general knowledge"]
+    },
+    "llama3.1": {
+        "specialty": "Advanced Reasoning",
+        "description": "Enhanced reasoning and complex problem solving",
+        "strengths": ["complex reasoning", "logic", "analysis"]
+    },
+    "llama3": {
+        "specialty": "Conversational AI",
+        "description": "Natural conversation and general assistance",
+        "strengths": ["conversation", "helpfulness", "general tasks"]
+    },
+    "llama2": {
+        "specialty": "Stable Performance",
+        "description": "Reliable and consistent responses",
+        "strengths": ["stability", "consistency", "general use"]
+    },
+
+    # Coding models
+    "codellama": {
+        "specialty": "Code Generation",
+        "description": "Specialized for programming and code tasks",
+        "strengths": ["coding", "debugging", "programming"]
+    },
+    "deepseek-coder": {
+        "specialty": "Advanced Coding",
+        "description": "Superior code understanding and generation",
+        "strengths": ["complex coding", "algorithms", "code review"]
+    },
+    "codegemma": {
+        "specialty": "Code Analysis",
+        "description": "Code comprehension and explanation",
+        "strengths": ["code analysis", "explanation", "debugging"]
+    },
+    "starcoder": {
+        "specialty": "Multi-language Coding",
+        "description": "Supports many programming languages",
+        "strengths": ["multi-language", "code completion", "syntax"]
+    },
+    "magicoder": {
+        "specialty": "Code Generation",
+        "description": "Efficient code generation and problem solving",
+        "strengths": ["quick coding", "algorithms", "optimization"]
+    },
+    "phind-codellama": {
+        "specialty": "Code Explanation",
+        "description": "Explains code and programming concepts",
+        "strengths": ["code explanation", "teaching", "documentation"]
+    },
+    "wizardcoder": {
+        "specialty": "Code Wizardry",
+        "description": "Advanced coding capabilities and problem solving",
+        "strengths": ["complex problems", "optimization", "best practices"]
+    },
+
+    # Specialized models
+    "qwen2.5": {
+        "specialty": "Multilingual Intelligence",
+        "description": "Strong multilingual and reasoning capabilities",
+        "strengths": ["multilingual", "reasoning", "diverse knowledge"]
+    },
+    "mistral": {
+        "specialty": "Efficient Reasoning",
+        "description": "Fast and efficient reasoning and analysis",
+        "strengths": ["efficiency", "reasoning", "concise answers"]
+    },
+    "mixtral": {
+        "specialty": "Expert Mixture",
+        "description": "Mixture of experts for diverse capabilities",
+        "strengths": ["versatility", "expertise", "specialized knowledge"]
+    },
+    "phi3": {
+        "specialty": "Compact Intelligence",
+        "description": "Small but capable model with good performance",
+        "strengths": ["efficiency", "speed", "resource-friendly"]
+    },
+    "gemma": {
+        "specialty": "Research & Analysis",
+        "description": "Strong analytical and research capabilities",
+        "strengths": ["research", "analysis", "factual accuracy"]
+    },
+    "neural-chat": {
+        "specialty": "Conversational Expert",
+        "description": "Optimized for natural conversation",
+        "strengths": ["conversation", "empathy", "natural responses"]
+    },
+    "orca-mini": {
+        "specialty": "Quick Responses",
+        "description": "Fast and efficient for quick questions",
+        "strengths": ["speed", "efficiency", "quick answers"]
+    },
+    "tinyllama": {
+        "specialty": "Lightweight Assistant",
+        "description": "Compact model for basic tasks",
+        "strengths": ["speed", "low resource", "basic tasks"]
+    },
+    "vicuna": {
+        "specialty": "Open Assistant",
+        "description": "Open-source conversational assistant",
+        "strengths": ["helpfulness", "conversation", "general assistance"]
+    },
+    "alpaca": {
+        "specialty": "Instruction Following",
+        "description": "Good at following instructions and tasks",
+        "strengths": ["instruction following", "task completion", "helpfulness"]
+    }
+}
+
+DEFAULT_SPECIALTY = {
+    "specialty": "General Purpose",
+    "description": "Multi-purpose language model",
+    "strengths": ["general tasks", "conversation", "assistance"]
+}
+
+
+def parse_parameter_size(value: str) -> float:
+    """Parse an Ollama ``parameter_size`` string ("8.0B", "137M") into billions."""
+    if not value:
+        return 0.0
+    match = re.match(r'^\s*(\d+(?:\.\d+)?)\s*([KMBT])?', value.upper())
+    if not match:
+        return 0.0
+    number = float(match.group(1))
+    unit = match.group(2) or "B"
+    scale = {"K": 1e-6, "M": 1e-3, "B": 1.0, "T": 1e3}[unit]
+    return number * scale
+
+
+def parameters_from_name(model_name: str) -> float:
+    """Extract a parameter count in billions from a model tag, or 0 if absent."""
+    match = _PARAM_PATTERN.search(model_name.lower())
+    if not match:
+        return 0.0
+    experts, count, unit = match.groups()
+    params = float(count) if unit == "b" else float(count) / 1000
+    if experts:
+        params *= int(experts)
+    return params
+
+
+def categorize_specialty(specialty: str) -> str:
+    """Map a specific specialty to one of the broader UI categories."""
+    specialty_lower = specialty.lower()
+    if any(keyword in specialty_lower for keyword in ["code", "coding", "programming", "development"]):
+        return "💻 Coding & Development"
+    if any(keyword in specialty_lower for keyword in ["creative", "writing", "literature", "storytelling"]):
+        return "✍️ Creative & Writing"
+    if any(keyword in specialty_lower for keyword in ["science", "research", "analysis", "mathematical", "reasoning"]):
+        return "🔬 Research & Analysis"
+    if any(keyword in specialty_lower for keyword in ["conversation", "chat", "assistant", "helpful"]):
+        return "💬 Conversational AI"
+    if any(keyword in specialty_lower for keyword in ["compact", "lightweight", "efficient", "quick", "fast"]):
+        return "⚡ Efficient & Lightweight"
+    return "🤖 General Purpose"
+
+
+def lookup_specialty(model_name: str) -> Dict[str, Any]:
+    """Find the specialty table entry for a model name (exact, then partial match)."""
+    if model_name in MODEL_SPECIALTIES:
+        return MODEL_SPECIALTIES[model_name]
+    name_lower = model_name.lower()
+    for key, spec_info in MODEL_SPECIALTIES.items():
+        if key in name_lower or name_lower.startswith(key):
+            return spec_info
+    return DEFAULT_SPECIALTY
+
+
+@dataclass(frozen=True)
+class CatalogEntry:
+    """Precomputed facts about one installed model tag."""
+    name: str
+    digest: str
+    size_bytes: int
+    family: str
+    parameter_size: str
+    parameters_b: float
+    quantization_level: str
+    is_coding: bool
+    is_large: bool
+    specialty: str
+    description: str
+    strengths: Tuple[str, ...]
+    category: str
+
+    @property
+    def size_gb(self) -> float:
+        return self.size_bytes / (1024**3)
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data["strengths"] = list(self.strengths)
+        data["size_gb"] = round(self.size_gb, 2)
+        return data
+
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    """Immutable, indexed view of the installed models at one point in time."""
+    entries: Tuple[CatalogEntry, ...] = ()
+    fetched_at: float = 0.0
+    source: str = "empty"  # "ollama", "cache", "cluster" or "empty"
+    version: str = ""
+    by_name: Mapping[str, CatalogEntry] = field(default_factory=lambda: MappingProxyType({}))
+    by_digest: Mapping[str, Tuple[str, ...]] = field(default_factory=lambda: MappingProxyType({}))
+
+    @classmethod
+    def build(cls, entries: Tuple[CatalogEntry, ...], fetched_at: float, source: str) -> "CatalogSnapshot":
+        fingerprint = hashlib.sha1(
+            "|".join(f"{e.name}@{e.digest}" for e in sorted(entries, key=lambda e: e.name)).encode("utf-8")
+        ).hexdigest()[:16]
+        digest_groups: Dict[str, List[str]] = {}
+        for entry in entries:
+            if entry.digest:
+                digest_groups.setdefault(entry.digest, []).append(entry.name)
+        return cls(
+            entries=entries,
+            fetched_at=fetched_at,
+            source=source,
+            version=fingerprint,
+            by_name=MappingProxyType({entry.name: entry for entry in entries}),
+            by_digest=MappingProxyType({digest: tuple(names) for digest, names in digest_groups.items()})
+        )
+
+    def names(self, include_large: bool = True) -> List[str]:
+        """Model names in Ollama's listing order."""
+        return [e.name for e in self.entries if include_large or not e.is_large]
+
+    def get(self, model_name: str) -> Optional[CatalogEntry]:
+        return self.by_name.get(model_name)
+
+    def split_large(self, models: List[str]) -> Tuple[List[str], List[str]]:
+        """Split model names into (kept, ultra-large) using the precomputed flag."""
+        kept, excluded = [], []
+        for model in models:
+            entry = self.by_name.get(model)
+            is_large = entry.is_large if entry else parameters_from_name(model) >= LARGE_MODEL_PARAMS_B
+            (excluded if is_large else kept).append(model)
+        return kept, excluded
+
+    def aliases_of(self, model_name: str) -> List[str]:
+        """Other installed tags that point at the same weights (same digest)."""
+        entry = self.by_name.get(model_name)
+        if not entry or not entry.digest:
+            return []
+        return [name for name in self.by_digest.get(entry.digest, ()) if name != model_name]
+
+    def dedupe(self, models: List[str]) -> Tuple[List[str], Dict[str, List[str]]]:
+        """Collapse tags sharing a digest to one representative each.
+
+        Returns the representatives (first occurrence wins, order preserved) and a
+        map from each representative to the other requested tags it stands in for.
+        """
+        representatives: List[str] = []
+        aliases: Dict[str, List[str]] = {}
+        seen: Dict[str, str] = {}
+        for model in models:
+            entry = self.by_name.get(model)
+            digest = entry.digest if entry else ""
+            if digest and digest in seen:
+                if model != seen[digest]:
+                    aliases.setdefault(seen[digest], []).append(model)
+                continue
+            if digest:
+                seen[digest] = model
+            elif model in representatives:
+                continue
+            representatives.append(model)
+        return representatives, aliases
+
+    def variants_of(self, model_name: str) -> List[CatalogEntry]:
+        """Other installed weights of the same model: same base name (the part before ``:``).
+
+        The family reported by Ollama is the architecture ("llama" covers
+        mistral, vicuna, codellama...), so it only orders the variants: tags
+        of the same family come first. Aliases of ``model_name`` (same digest)
+        are excluded.
+        """
+        entry = self.by_name.get(model_name)
+        base = model_name.split(":")[0].lower()
+        family = entry.family.lower() if entry else ""
+        digest = entry.digest if entry else ""
+        variants = [
+            e for e in self.entries
+            if e.name != model_name and not (digest and e.digest == digest)
+            and e.name.split(":")[0].lower() == base
+        ]
+        return sorted(variants, key=lambda e: bool(family) and e.family.lower() != family)
+
+    def coding_names(self, models: Optional[List[str]] = None) -> List[str]:
+        """Coding-capable models, restricted to ``models`` when given."""
+        if models is None:
+            return [e.name for e in self.entries if e.is_coding]
+        return [m for m in models if m in self.by_name and self.by_name[m].is_coding]
+
+
+class ModelCatalog:
+    """Builds catalog snapshots from Ollama tags and persists them for offline startup."""
+
+    def __init__(self, coding_models: List[str], cache_path: Optional[str] = DEFAULT_CACHE_PATH):
+        self.coding_models = [m.lower() for m in coding_models]
+        self.cache_path = cache_path
+        self._write_lock = threading.Lock()
+        self._snapshot = CatalogSnapshot()
+        self._payload: Dict[str, Any] = {"fetched_at": 0.0, "models": []}
+        self._load_persisted()
+
+    @property
+    def snapshot(self) -> CatalogSnapshot:
+        """Current snapshot; safe to read from any thread without locking."""
+        return self._snapshot
+
+    def build_entry(self, model: Dict[str, Any]) -> CatalogEntry:
+        """Build a catalog entry from one ``/api/tags`` model record."""
+        name = model["name"]
+        name_lower = name.lower()
+        details = model.get("details") or {}
+
+        parameter_size = details.get("parameter_size", "") or ""
+        parameters_b = parse_parameter_size(parameter_size) or parameters_from_name(name)
+
+        spec_info = lookup_specialty(name)
+
+        return CatalogEntry(
+            name=name,
+            digest=model.get("digest", "") or "",
+            size_bytes=int(model.get("size", 0) or 0),
+            family=details.get("family", "") or "",
+            parameter_size=parameter_size,
+            parameters_b=parameters_b,
+            quantization_level=details.get("quantization_level", "") or "",
+            is_coding=any(coding_model in name_lower for coding_model in self.coding_models),
+            is_large=parameters_b >= LARGE_MODEL_PARAMS_B,
+            specialty=spec_info["specialty"],
+            description=spec_info["description"],
+            strengths=tuple(spec_info["strengths"]),
+            category=categorize_specialty(spec_info["specialty"])
+        )
+
+    def describe(self, model_name: str) -> CatalogEntry:
+        """Entry for a model, falling back to name-only facts for unknown tags."""
+        entry = self._snapshot.get(model_name)
+        return entry if entry else self.build_entry({"name": model_name})
+
+    def ingest(self, payload: Dict[str, Any], source: str = "ollama", persist: bool = True) -> CatalogSnapshot:
+        """Build a new snapshot from a ``/api/tags`` payload and publish it atomically."""
+        entries = tuple(self.build_entry(m) for m in payload.get("models", []) if m.get("name"))
+        fetched_at = time.time() if source == "ollama" else payload.get("fetched_at", time.time())
+        snapshot = CatalogSnapshot.build(entries, fetched_at=fetched_at, source=source)
+
+        with self._write_lock:
+            self._snapshot = snapshot
+            self._payload = {"fetched_at": fetched_at, "models": list(payload.get("models", []))}
+            if persist:
+                self._persist(payload, fetched_at)
+
+        return snapshot
+
+    def export(self) -> Dict[str, Any]:
+        """The tags payload behind the current snapshot (what ``ingest`` accepts)."""
+        return self._payload
+
+    def _persist(self, payload: Dict[str, Any], fetched_at: float):
+        """Write the raw tags payload to disk so startup works without Ollama."""
+        if not self.cache_path:
+            return
+        try:
+            data = {"fetched_at": fetched_at, "models": payload.get("models", [])}
+            # Per-process temp file: cluster workers may persist at the same time
+            tmp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            print(f"⚠️  Could not persist model catalog: {e}")
+
+    def _load_persisted(self):
+        """Load the last persisted payload, if any, as the initial snapshot."""
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path, 'r') as f:
+                data = json.load(f)
+            self.ingest(data, source="cache", persist=False)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"⚠️  Ignoring unreadable model catalog cache: {e}")
+
+
+def diff_snapshots(old: CatalogSnapshot, new: CatalogSnapshot) -> Dict[str, List[str]]:
+    """Describe what changed between two snapshots (added, removed, re-pulled)."""
+    old_names, new_names = set(old.by_name), set(new.by_name)
+    changed = [
+        name for name in sorted(old_names & new_names)
+        if old.by_name[name].digest != new.by_name[name].digest
+    ]
+    return {
+        "added": sorted(new_names - old_names),
+        "removed": sorted(old_names - new_names),
+        "changed": changed
+    }
+
+
+class CatalogRefresher:
+    """Single background task that revalidates the catalog against Ollama.
+
+    Request handlers keep serving the current snapshot (stale-while-revalidate);
+    this thread refreshes it on a schedule or when ``request_refresh`` is called
+    and notifies listeners with the diff whenever the installed set changes.
+    """
+
+    def __init__(self, catalog: ModelCatalog, fetch: Callable[[], Any], interval: float = 30.0):
+        self.catalog = catalog
+        self.fetch = fetch
+        self.interval = interval
+        self.listeners: List[Callable[[Dict[str, Any]], None]] = []
+        self.last_revalidated = 0.0
+        self.last_error: Optional[str] = None
+        self._wakeup = threading.Event()
+        self._revalidate_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def add_listener(self, listener: Callable[[Dict[str, Any]], None]):
+        """Register a callback receiving ``{"version", "added", "removed", "changed"}``."""
+        self.listeners.append(listener)
+
+    def start(self):
+        """Start the background revalidation thread (idempotent)."""
+        if self.running:
+            return
+        self._thread = threading.Thread(target=self._run, name="catalog-refresher", daemon=True)
+        self._thread.start()
+        print(f"🔁 Model catalog refresher started (every {self.interval:.0f}s)")
+
+    def request_refresh(self):
+        """Ask the background thread to revalidate as soon as possible."""
+        self._wakeup.set()
+
+    def revalidate(self, fetch: Optional[Callable[[], Any]] = None) -> Dict[str, Any]:
+        """Revalidate now in the calling thread and return the diff.
+
+        ``fetch`` overrides where the new payload comes from (e.g. a snapshot
+        published by another worker).
+        """
+        with self._revalidate_lock:
+            before = self.catalog.snapshot
+            try:
+                (fetch or self.fetch)()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"❌ Model catalog revalidation failed: {e}")
+            self.last_revalidated = time.time()
+            after = self.catalog.snapshot
+
+        diff = diff_snapshots(before, after)
+        diff["version"] = after.version
+        if after.version != before.version and (diff["added"] or diff["removed"] or diff["changed"]):
+            for listener in list(self.listeners):
+                try:
+                    listener(diff)
+                except Exception as e:
+                    print(f"⚠️  Model catalog listener failed: {e}")
+        return diff
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            self.revalidate()
@@ -7,10 +7,16 @@ import requests
 import time
 import asyncio
 import aiohttp
+from contextlib import asynccontextmanager
 from typing import List, Dict, Any, Optional
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 from enum import Enum
 from system_resources import SystemResourceManager, resource_manager
+from model_catalog import DEFAULT_CACHE_PATH, ModelCatalog, CatalogSnapshot, CatalogRefresher
+from concurrency import AIMDController, PerformanceRegistry
+from scheduler import FairScheduler
+from degradation import DegradationPolicy
+from async_worker import async_worker
 
 
 class QuestionType(Enum):
@@ -24,6 +30,10 @@ class ModelResponse:
     response: str
     response_time: float
     error: Optional[str] = None
+    tokens: int = 0
+    ttft: Optional[float] = None
+    substituted_by: Optional[str] = None  # smaller variant that answered under memory pressure
+    timed_out: bool = False  # hit request_timeout (the concurrency controller backs off on these)
     
     def is_successful(self) -> bool:
         return self.error is None
@@ -71,37 +81,70 @@ class OllamaModelManager:
         self.resource_manager = resource_manager
         self.last_model_refresh = 0
         self.model_refresh_interval = 30  # Refresh every 30 seconds
+        self.catalog = ModelCatalog(
+            self.coding_models,
+            cache_path=self.config.get("catalog_cache_path", DEFAULT_CACHE_PATH)
+        )
+        self.refresher: Optional[CatalogRefresher] = None
+        self.num_ctx = self.config.get("num_ctx")
+        self.resource_manager.attach_catalog(self.catalog, self.num_ctx)
+        
+        # Every query path shares these slots; the scheduler decides whose request
+        # gets the next one and the controller resizes them under load
+        max_concurrent = self.config.get("max_concurrent_requests", 5)
+        self.query_slots = FairScheduler(
+            max_concurrent,
+            quantum=self.config.get("scheduler_quantum", 5.0),
+            lane_weights=self.config.get("scheduler_lane_weights")
+        )
+        self.concurrency = AIMDController(
+            self.query_slots,
+            min_limit=min(max_concurrent, self.config.get("min_concurrent_requests", 1)),
+            max_limit=max_concurrent,
+            window=self.config.get("concurrency_window", 10.0),
+            min_headroom_gb=self.config.get("min_memory_headroom_gb", 1.0),
+            timeline=self.resource_manager.timeseries
+        )
+        self.resource_manager.add_usage_listener(self.concurrency.on_usage)
+        self.performance = PerformanceRegistry()
+        self._session: Optional[aiohttp.ClientSession] = None
+        async_worker.add_shutdown_hook(self.close_session)
+        self.degradation = DegradationPolicy(
+            self.resource_manager,
+            self.catalog,
+            min_free_gb=self.config.get("degrade_min_free_gb", 1.5),
+            enabled=self.config.get("degrade_under_pressure", True)
+        )
         
         # Initialize system resources
         self.resource_manager.detect_system_resources()
     
     def should_refresh_models(self) -> bool:
         """Check if models should be refreshed."""
+        if self.refresher and self.refresher.running:
+            # The background refresher keeps the catalog fresh; serve the cached list
+            return False
         return (time.time() - self.last_model_refresh) > self.model_refresh_interval
     
+    def get_refresher(self) -> CatalogRefresher:
+        """Get the catalog refresher for this manager, creating it if needed."""
+        if self.refresher is None:
+            self.refresher = CatalogRefresher(
+                self.catalog,
+                fetch=self.fetch_models,
+                interval=self.config.get("model_refresh_interval", self.model_refresh_interval)
+            )
+        return self.refresher
+    
+    def start_background_refresh(self) -> CatalogRefresher:
+        """Revalidate the model list in a background thread instead of on request paths."""
+        refresher = self.get_refresher()
+        refresher.start()
+        return refresher
+    
     def _filter_large_models(self, models: List[str]) -> List[str]:
         """Filter out ultra-large models (70B+ parameters) for better performance."""
-        filtered_models = []
-        excluded_models = []
-        
-        for model in models:
-            model_lower = model.lower()
-            
-            # Check for ultra-large model indicators
-            is_ultra_large = any([
-                '70b' in model_lower,
-                '72b' in model_lower,
-                '405b' in model_lower,
-                'llama3.1:70b' in model_lower,
-                'llama3.2:70b' in model_lower,
-                'qwen2.5:72b' in model_lower,
-                'codellama:70b' in model_lower
-            ])
-            
-            if is_ultra_large:
-                excluded_models.append(model)
-            else:
-                filtered_models.append(model)
+        filtered_models, excluded_models = self.catalog.snapshot.split_large(models)
         
         if excluded_models:
             print(f"⚠️  Filtered out {len(excluded_models)} ultra-large models for optimal performance")
@@ -114,46 +157,57 @@ class OllamaModelManager:
         """Fetch available models from Ollama with automatic refresh and optional filtering."""
         if force_refresh or self.should_refresh_models() or not self.available_models:
             try:
-                print("🔄 Refreshing model list from Ollama...")
-                response = requests.get(f"{self.base_url}/api/tags", timeout=10)
-                response.raise_for_status()
-                data = response.json()
-                
-                raw_models = [model["name"] for model in data.get("models", [])]
-                
-                # Apply filtering if requested
-                if filter_large:
-                    new_models = self._filter_large_models(raw_models)
-                else:
-                    new_models = raw_models
-                
-                # Check for changes
-                if set(new_models) != set(self.available_models):
-                    print(f"📊 Model list updated: {len(new_models)} models available")
-                    if filter_large and len(raw_models) != len(new_models):
-                        print(f"   (Filtered from {len(raw_models)} total models)")
-                    
-                    if new_models != self.available_models:
-                        added = set(new_models) - set(self.available_models)
-                        removed = set(self.available_models) - set(new_models)
-                        if added:
-                            print(f"   ➕ Added: {', '.join(added)}")
-                        if removed:
-                            print(f"   ➖ Removed: {', '.join(removed)}")
-                
-                self.available_models = new_models
-                self.last_model_refresh = time.time()
-                
-                # Optimize for current system
-                self._optimize_for_system()
-                
+                self.fetch_models(filter_large)
             except requests.exceptions.RequestException as e:
                 print(f"❌ Error fetching models: {e}")
                 if not self.available_models:
-                    return []
+                    snapshot = self.catalog.snapshot
+                    if snapshot.entries:
+                        print(f"📦 Using cached model catalog ({len(snapshot.entries)} models, offline)")
+                        self._apply_snapshot(snapshot, filter_large)
+                    else:
+                        return []
         
         return self.available_models
     
+    def fetch_models(self, filter_large: bool = True) -> List[str]:
+        """Fetch the model list from Ollama's tags endpoint; request errors are raised."""
+        print("🔄 Refreshing model list from Ollama...")
+        response = requests.get(f"{self.base_url}/api/tags", timeout=10)
+        response.raise_for_status()
+        self._apply_snapshot(self.catalog.ingest(response.json()), filter_large)
+        return self.available_models
+    
+    def _apply_snapshot(self, snapshot: CatalogSnapshot, filter_large: bool = True):
+        """Make a catalog snapshot the current model list."""
+        raw_models = snapshot.names()
+        
+        # Apply filtering if requested
+        if filter_large:
+            new_models = self._filter_large_models(raw_models)
+        else:
+            new_models = raw_models
+        
+        # Check for changes
+        if set(new_models) != set(self.available_models):
+            print(f"📊 Model list updated: {len(new_models)} models available")
+            if filter_large and len(raw_models) != len(new_models):
+                print(f"   (Filtered from {len(raw_models)} total models)")
+            
+            if new_models != self.available_models:
+                added = set(new_models) - set(self.available_models)
+                removed = set(self.available_models) - set(new_models)
+                if added:
+                    print(f"   ➕ Added: {', '.join(added)}")
+                if removed:
+                    print(f"   ➖ Removed: {', '.join(removed)}")
+        
+        self.available_models = new_models
+        self.last_model_refresh = time.time()
+        
+        # Optimize for current system
+        self._optimize_for_system()
+    
     def _optimize_for_system(self):
         """Optimize settings based on current system resources and available models."""
         if not self.available_models:
@@ -162,11 +216,11 @@ class OllamaModelManager:
         # Get system optimization recommendations
         optimal_concurrent, _ = self.resource_manager.optimize_concurrent_models(self.available_models)
         
-        # Update configuration based on system capabilities
-        current_concurrent = self.config.get("max_concurrent_requests", 3)
-        if optimal_concurrent != current_concurrent:
+        # Start the feedback controller from the static estimate; it adapts from there
+        current_concurrent = self.concurrency.limit
+        if optimal_concurrent != current_concurrent and not self.concurrency.decisions:
             print(f"🎯 Optimizing concurrency: {current_concurrent} → {optimal_concurrent} (based on system resources)")
-            self.config.config["max_concurrent_requests"] = optimal_concurrent
+            self.concurrency.seed(optimal_concurrent)
         
         # Check if we should warn about large models
         large_models = []
@@ -182,16 +236,12 @@ class OllamaModelManager:
     
     def get_models_for_question_type(self, question_type: QuestionType) -> List[str]:
         """Get appropriate models based on question type and system capabilities."""
-        # Always refresh model list
-        available = self.get_available_models()
+        # Cached catalog snapshot (revalidated in the background, or when it is older than the refresh interval), one tag per set of weights
+        available, _ = self.catalog.snapshot.dedupe(self.get_available_models())
         
         if question_type == QuestionType.CODING:
             # Filter for coding-capable models
-            coding_capable = []
-            for model in available:
-                model_lower = model.lower()
-                if any(coding_model in model_lower for coding_model in self.coding_models):
-                    coding_capable.append(model)
+            coding_capable = self.catalog.snapshot.coding_names(available)
             
             # Optimize based on system resources
             if coding_capable:
@@ -256,8 +306,63 @@ class OllamaModelManager:
         else:
             print("✅ Memory usage looks good for parallel execution")
     
+    @asynccontextmanager
+    async def _client_session(self, timeout: aiohttp.ClientTimeout):
+        """HTTP session for talking to Ollama.
+        
+        On the shared async worker loop every request reuses one session (one
+        keep-alive connection pool); elsewhere, e.g. the console app's own
+        loop, a short-lived session is used.
+        """
+        if async_worker.owns_current_loop():
+            if self._session is None or self._session.closed:
+                self._session = aiohttp.ClientSession(timeout=timeout)
+            yield self._session
+        else:
+            async with aiohttp.ClientSession(timeout=timeout) as session:
+                yield session
+    
+    async def close_session(self):
+        """Close the shared HTTP session (run on the worker loop at shutdown)."""
+        if self._session and not self._session.closed:
+            await self._session.close()
+    
     async def query_model(self, model_name: str, prompt: str, stream: bool = False) -> ModelResponse:
         """Query a specific model and return the response."""
+        await self._wait_for_launch_window(model_name)
+        async with self.query_slots.slot(self.performance.expected_time(model_name)):
+            self.concurrency.note_acquire()
+            with self.resource_manager.timeseries.track_model(model_name):
+                result = await self._query_model(model_name, prompt, stream)
+        self._record_completion(result)
+        return result
+    
+    async def _wait_for_launch_window(self, model_name: str):
+        """Hold back new model launches while PSI shows memory or CPU stalls (bounded wait)."""
+        reason = self.resource_manager.launch_pressure()
+        if not reason:
+            return
+        print(f"⏸️  Delaying {model_name}: {reason}")
+        deadline = time.time() + self.config.get("pressure_max_wait", 30)
+        while reason and time.time() < deadline:
+            await asyncio.sleep(1)
+            reason = self.resource_manager.launch_pressure()
+    
+    def _record_completion(self, result: ModelResponse):
+        """Feed a finished request into the concurrency controller."""
+        self.concurrency.record(result.tokens, result.ttft, result.response_time, result.timed_out)
+        self.performance.record(result.model_name, result.response_time, result.tokens,
+                                result.ttft, result.is_successful())
+    
+    def estimate_query_time(self, models: List[str]) -> float:
+        """Expected seconds to query ``models`` at the current concurrency limit."""
+        return self.performance.estimate_parallel(models, self.concurrency.limit)
+    
+    def estimate_debate_time(self, models: List[str], rounds: int) -> float:
+        """Expected seconds for a debate (models answer in turn each round, plus a summary)."""
+        return self.performance.estimate_sequential(models, rounds) + self.performance.estimate_sequential(models[:1])
+    
+    async def _query_model(self, model_name: str, prompt: str, stream: bool = False) -> ModelResponse:
         start_time = time.time()
         
         try:
@@ -266,14 +371,18 @@ class OllamaModelManager:
                 "prompt": prompt,
                 "stream": stream
             }
+            if self.num_ctx:
+                payload["options"] = {"num_ctx": self.num_ctx}
             
             timeout = aiohttp.ClientTimeout(total=self.request_timeout, connect=10, sock_read=30)
             
             if stream:
-                # For streaming, we'll collect all chunks
-                full_response = ""
-                async with aiohttp.ClientSession(timeout=timeout) as session:
-                    async with session.post(f"{self.base_url}/api/generate", json=payload) as response:
+                # For streaming, we'll collect all chunks (joined once at the end)
+                parts = []
+                ttft = None
+                tokens = 0
+                async with self._client_session(timeout) as session:
+                    async with session.post(f"{self.base_url}/api/generate", json=payload, timeout=timeout) as response:
                         if response.status == 404:
                             return ModelResponse(model_name=model_name, response="", response_time=time.time() - start_time, 
                                                error=f"Model '{model_name}' not found")
@@ -295,17 +404,21 @@ class OllamaModelManager:
                                         return ModelResponse(model_name=model_name, response="", response_time=time.time() - start_time,
                                                            error=chunk_data['error'])
                                     if 'response' in chunk_data:
-                                        full_response += chunk_data['response']
+                                        if ttft is None:
+                                            ttft = time.time() - start_time
+                                        parts.append(chunk_data['response'])
                                     if chunk_data.get('done', False):
+                                        tokens = chunk_data.get('eval_count', 0)
                                         break
                                 except (json.JSONDecodeError, UnicodeDecodeError):
                                     continue
                 
-                return ModelResponse(model_name=model_name, response=full_response, response_time=time.time() - start_time)
+                return ModelResponse(model_name=model_name, response="".join(parts), response_time=time.time() - start_time,
+                                     tokens=tokens, ttft=ttft)
             else:
                 # Non-streaming (original behavior)
-                async with aiohttp.ClientSession(timeout=timeout) as session:
-                    async with session.post(f"{self.base_url}/api/generate", json=payload) as response:
+                async with self._client_session(timeout) as session:
+                    async with session.post(f"{self.base_url}/api/generate", json=payload, timeout=timeout) as response:
                         if response.status == 404:
                             return ModelResponse(model_name=model_name, response="", response_time=time.time() - start_time,
                                                error=f"Model '{model_name}' not found")
@@ -322,11 +435,14 @@ class OllamaModelManager:
                             return ModelResponse(model_name=model_name, response="", response_time=time.time() - start_time,
                                                error=data['error'])
                 
-                return ModelResponse(model_name=model_name, response=data.get("response", ""), response_time=time.time() - start_time)
+                # Ollama reports durations in nanoseconds; load + prompt eval precede the first token
+                ttft = (data.get("load_duration", 0) + data.get("prompt_eval_duration", 0)) / 1e9 or None
+                return ModelResponse(model_name=model_name, response=data.get("response", ""), response_time=time.time() - start_time,
+                                     tokens=data.get("eval_count", 0), ttft=ttft)
             
         except asyncio.TimeoutError:
             return ModelResponse(model_name=model_name, response="", response_time=time.time() - start_time,
-                               error=f"Timeout after {self.request_timeout}s")
+                               error=f"Timeout after {self.request_timeout}s", timed_out=True)
         except aiohttp.ClientConnectorError:
             return ModelResponse(model_name=model_name, response="", response_time=time.time() - start_time,
                                error="Cannot connect to Ollama server")
@@ -336,6 +452,15 @@ class OllamaModelManager:
 
     async def query_model_streaming(self, model_name: str, prompt: str, callback=None):
         """Query a model with streaming response and optional callback for each chunk."""
+        await self._wait_for_launch_window(model_name)
+        async with self.query_slots.slot(self.performance.expected_time(model_name)):
+            self.concurrency.note_acquire()
+            with self.resource_manager.timeseries.track_model(model_name):
+                result = await self._query_model_streaming(model_name, prompt, callback)
+        self._record_completion(result)
+        return result
+    
+    async def _query_model_streaming(self, model_name: str, prompt: str, callback=None):
         start_time = time.time()
         
         try:
@@ -344,13 +469,18 @@ class OllamaModelManager:
                 "prompt": prompt,
                 "stream": True
             }
+            if self.num_ctx:
+                payload["options"] = {"num_ctx": self.num_ctx}
             
-            full_response = ""
+            # Chunks are kept in a list and joined once, not concatenated per token
+            parts = []
+            ttft = None
+            tokens = 0
             timeout = aiohttp.ClientTimeout(total=self.request_timeout, connect=10, sock_read=30)
             
-            async with aiohttp.ClientSession(timeout=timeout) as session:
+            async with self._client_session(timeout) as session:
                 try:
-                    async with session.post(f"{self.base_url}/api/generate", json=payload) as response:
+                    async with session.post(f"{self.base_url}/api/generate", json=payload, timeout=timeout) as response:
                         if response.status == 404:
                             error_msg = f"Model '{model_name}' not found"
                             if callback:
@@ -384,13 +514,16 @@ class OllamaModelManager:
                                     
                                     if 'response' in chunk_data:
                                         chunk_text = chunk_data['response']
-                                        full_response += chunk_text
+                                        if ttft is None:
+                                            ttft = time.time() - start_time
+                                        parts.append(chunk_text)
                                         
                                         # Call callback with streaming chunk if provided
                                         if callback:
                                             await callback(model_name, chunk_text, False)
                                     
                                     if chunk_data.get('done', False):
+                                        tokens = chunk_data.get('eval_count', 0)
                                         break
                                         
                                 except json.JSONDecodeError as je:
@@ -400,7 +533,7 @@ class OllamaModelManager:
                                     print(f"Unicode decode error for {model_name}: {ue}")
                                     continue
                         
-                        if not full_response:
+                        if not any(parts):
                             error_msg = "No response received from model"
                             if callback:
                                 await callback(model_name, f"Error: {error_msg}", True)
@@ -410,7 +543,8 @@ class OllamaModelManager:
                     error_msg = f"Timeout after {self.request_timeout}s"
                     if callback:
                         await callback(model_name, f"Error: {error_msg}", True)
-                    return ModelResponse(model_name=model_name, response="", response_time=time.time() - start_time, error=error_msg)
+                    return ModelResponse(model_name=model_name, response="", response_time=time.time() - start_time,
+                                         error=error_msg, timed_out=True)
                 
                 except aiohttp.ClientConnectorError:
                     error_msg = "Cannot connect to Ollama server"
@@ -426,8 +560,10 @@ class OllamaModelManager:
             
             return ModelResponse(
                 model_name=model_name,
-                response=full_response,
-                response_time=response_time
+                response="".join(parts),
+                response_time=response_time,
+                tokens=tokens,
+                ttft=ttft
             )
             
         except Exception as e:
@@ -445,28 +581,85 @@ class OllamaModelManager:
                 error=error_msg
             )
     
-    async def query_multiple_models(self, models: List[str], prompt: str, max_concurrent: int = 3, stream: bool = True, callback=None) -> List[ModelResponse]:
-        """Query multiple models concurrently with rate limiting and optional streaming."""
-        # Use the configured max concurrent or the provided one
+    async def query_multiple_models(self, models: List[str], prompt: str, max_concurrent: int = 3, stream: bool = True,
+                                    callback=None, on_degraded=None) -> List[ModelResponse]:
+        """Query multiple models concurrently with rate limiting and optional streaming.
+        
+        Tags that share a digest (same weights) are queried once and the result is
+        fanned out to every requested alias, in the original order. Under memory
+        pressure, models may be served by a smaller variant or deferred to the end;
+        ``on_degraded`` (async) receives the DegradationDecision when that happens.
+        """
+        representatives, aliases = self.catalog.snapshot.dedupe(models)
+        if aliases:
+            shared = ", ".join(f"{rep} = {', '.join(names)}" for rep, names in aliases.items())
+            print(f"🔗 Querying {len(representatives)} of {len(models)} models once (same weights: {shared})")
+        
+        decision = self.degradation.evaluate(representatives)
+        if decision.degraded:
+            swaps = ", ".join(f"{model} → {sub}" for model, sub in decision.substitutions.items())
+            print(f"🪶 Memory pressure ({decision.reason}): "
+                  + "; ".join(part for part in (swaps, f"deferred {', '.join(decision.deferred)}" if decision.deferred else "") if part))
+            self.resource_manager.timeseries.mark('degraded', swaps or ", ".join(decision.deferred), reason=decision.reason)
+            if on_degraded:
+                await on_degraded(decision)
+        
+        # Which requested models each model we actually run stands in for
+        served: Dict[str, List[str]] = {}
+        for rep in representatives:
+            served.setdefault(decision.served_by(rep), []).append(rep)
+        
+        stream_callback = callback
+        if callback and (aliases or decision.substitutions):
+            async def stream_callback(model_name: str, chunk: str, is_done: bool):
+                for rep in served.get(model_name, [model_name]):
+                    for name in [rep] + aliases.get(rep, []):
+                        await callback(name, chunk, is_done)
+        
+        # Use the configured max concurrent or the provided one; the shared query
+        # slots further limit how many requests actually run at once
         max_concurrent = min(max_concurrent, self.config.get("max_concurrent_requests", 5))
-        semaphore = asyncio.Semaphore(max_concurrent)
         
         async def limited_query(model):
-            async with semaphore:
-                if stream and callback:
-                    return await self.query_model_streaming(model, prompt, callback)
-                else:
-                    return await self.query_model(model, prompt, stream=False)
+            if stream and stream_callback:
+                return await self.query_model_streaming(model, prompt, stream_callback)
+            else:
+                return await self.query_model(model, prompt, stream=False)
+        
+        run_now = [model for model in served if model not in decision.deferred]
+        run_later = [model for model in decision.deferred if model not in run_now]
+        
+        timeline = self.resource_manager.timeseries
+        timeline.mark('query_start', ", ".join(served), models=len(served))
+        
+        # Run the planner's memory-fitting waves (concurrency capped at max_concurrent),
+        # then any deferred models one at a time
+        plan = self.resource_manager.plan_concurrent_waves(run_now, cpu_budget=max_concurrent)
+        waves = [wave for wave in plan.waves if wave] + [[model] for model in run_later]
+        if len(waves) > 1:
+            print(f"📦 Running {len(served)} models in {len(waves)} waves: "
+                  + " | ".join(", ".join(wave) for wave in waves))
         
-        # Process models in batches of max_concurrent
         results = []
-        for i in range(0, len(models), max_concurrent):
-            batch = models[i:i + max_concurrent]
-            batch_tasks = [limited_query(model) for model in batch]
-            batch_results = await asyncio.gather(*batch_tasks)
-            results.extend(batch_results)
+        for wave in waves:
+            wave_tasks = [limited_query(model) for model in wave]
+            wave_results = await asyncio.gather(*wave_tasks)
+            results.extend(wave_results)
+        
+        timeline.mark('query_end', ", ".join(served),
+                      failed=len([r for r in results if not r.is_successful()]))
         
-        return results
+        # Map results back to the requested models, then fan shared results out to
+        # every requested tag, in the requested order
+        by_model = {}
+        for result in results:
+            for rep in served.get(result.model_name, [result.model_name]):
+                substitute = result.model_name if rep != result.model_name else None
+                by_model[rep] = replace(result, model_name=rep, substituted_by=substitute)
+        for rep, names in aliases.items():
+            for name in names:
+                by_model[name] = replace(by_model[rep], model_name=name)
+        return [by_model[model] for model in models if model in by_model]
     
     def get_model_info(self, model_name: str) -> Dict[str, Any]:
         """Get detailed information about a specific model."""
@@ -18,8 +18,8 @@ if errorlevel 1 (
 )
 
 REM Check if we're in the right directory
-if not exist "web_app.py" (
-    echo ERROR: web_app.py not found
+if not exist "unified_app.py" (
+    echo ERROR: unified_app.py not found
     echo Please run this script from the project directory
     pause
     exit /b 1
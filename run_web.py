@@ -1,25 +1,39 @@
 #!/usr/bin/env python3
 """
-Simple launcher for the Multi-Model Query Web Application
+Launcher for the Unified Multi-Model Application worker fleet.
+
+Starts the cluster broker, N unified-app worker processes and a sticky front
+end on one public port (see cluster.py). With a single worker the app runs
+in this process as before.
+
+Usage: python run_web.py [--workers N] [--host 0.0.0.0] [--port 5000] [--no-browser]
 """
 
+import argparse
+import asyncio
+import os
+import signal
+import socket
 import subprocess
 import sys
-import webbrowser
+import threading
 import time
-from pathlib import Path
+import webbrowser
+
+REPO = os.path.dirname(os.path.abspath(__file__))
+
 
 def check_dependencies():
     """Check if required packages are installed."""
     required = ['flask', 'flask_socketio']
     missing = []
-    
+
     for package in required:
         try:
             __import__(package)
         except ImportError:
             missing.append(package)
-    
+
     return missing
 
 def install_dependencies():
@@ -33,11 +47,82 @@ def install_dependencies():
         print(f"❌ Failed to install dependencies: {e}")
         return False
 
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def start_worker(worker_id: int, size: int, broker_url: str, port: int) -> subprocess.Popen:
+    """Start one unified-app worker on a loopback port, joined to the broker."""
+    from cluster import BROKER_ENV, SIZE_ENV, WORKER_ENV
+    env = dict(os.environ, **{BROKER_ENV: broker_url, WORKER_ENV: str(worker_id), SIZE_ENV: str(size)})
+    # Workers read config.json from the launcher's working directory
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [REPO, os.environ.get('PYTHONPATH')]))
+    code = f"import unified_app; unified_app.run_flask(host='127.0.0.1', port={port}, debug=False)"
+    return subprocess.Popen([sys.executable, "-c", code], env=env)
+
+async def wait_for_port(port: int, timeout: float = 60.0) -> bool:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            _, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.close()
+            return True
+        except OSError:
+            await asyncio.sleep(0.25)
+    return False
+
+async def run_fleet(workers: int, host: str, port: int, config, on_ready=None):
+    """Run the broker and sticky front end here and keep ``workers`` workers alive."""
+    from cluster import Broker, StickyProxy
+
+    # Stop the workers on SIGTERM too, not only on Ctrl+C
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+    except (NotImplementedError, AttributeError):
+        pass
+    broker = Broker.from_config(config)
+    broker_url = await broker.start()
+    ports = [_free_port() for _ in range(workers)]
+    processes = [start_worker(i, workers, broker_url, worker_port) for i, worker_port in enumerate(ports)]
+    proxy = StickyProxy([('127.0.0.1', worker_port) for worker_port in ports])
+    await proxy.start(host, port)
+    print(f"🧩 Broker at {broker_url}; {workers} workers on ports {', '.join(map(str, ports))}")
+
+    try:
+        if await wait_for_port(ports[0]):
+            print(f"✅ Worker fleet serving on http://localhost:{port}")
+            if on_ready:
+                on_ready()
+        while True:
+            await asyncio.sleep(1.0)
+            for i, process in enumerate(processes):
+                if process.poll() is not None:
+                    print(f"⚠️  Worker {i + 1} exited with code {process.returncode}; restarting it")
+                    processes[i] = start_worker(i, workers, broker_url, ports[i])
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            try:
+                process.wait(10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        await broker.stop()
+
 def main():
     """Main launcher function."""
-    print("🚀 Multi-Model Query Web UI Launcher")
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--workers", type=int, default=None,
+                        help="worker processes (default: the 'workers' config key, else up to 4 cores)")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--no-browser", action="store_true")
+    args = parser.parse_args()
+
+    print("🚀 Unified Multi-Model Application Launcher")
     print("=" * 50)
-    
+
     # Check dependencies
     missing = check_dependencies()
     if missing:
@@ -50,31 +135,32 @@ def main():
         else:
             print("❌ Cannot start without required dependencies")
             return
-    
+
+    from models import ConfigManager
+    config = ConfigManager()
+    workers = max(1, args.workers or config.get("workers", min(4, os.cpu_count() or 1)))
+
     print("✅ All dependencies available")
-    print("🌐 Starting web server...")
-    print("📱 The web interface will open automatically")
-    print("🔗 Manual URL: http://localhost:5000")
+    print(f"🌐 Starting {workers} worker process{'es' if workers > 1 else ''}...")
+    print(f"🔗 URL: http://localhost:{args.port}")
     print("\n⚠️  Make sure Ollama is running before using the application!")
     print("   Run: ollama serve")
     print("\n📋 Press Ctrl+C to stop the server")
     print("=" * 50)
-    
-    # Wait a moment then open browser
+
     def open_browser():
-        time.sleep(2)
-        webbrowser.open('http://localhost:5000')
-    
-    import threading
-    browser_thread = threading.Thread(target=open_browser)
-    browser_thread.daemon = True
-    browser_thread.start()
-    
-    # Start the web application
+        if not args.no_browser:
+            webbrowser.open(f'http://localhost:{args.port}')
+
     try:
-        from web_app import app, socketio
-        socketio.run(app, debug=False, host='0.0.0.0', port=5000)
-    except KeyboardInterrupt:
+        if workers == 1:
+            # Wait a moment then open browser
+            threading.Timer(2.0, open_browser).start()
+            import unified_app
+            unified_app.run_flask(host=args.host, port=args.port, debug=False)
+        else:
+            asyncio.run(run_fleet(workers, args.host, args.port, config, on_ready=open_browser))
+    except (KeyboardInterrupt, asyncio.CancelledError):
         print("\n👋 Web server stopped")
     except Exception as e:
         print(f"\n❌ Error starting web server: {e}")
@@ -0,0 +1,152 @@
+"""
+Fair scheduling module for the multi-model query application.
+
+Every Ollama request from every session waits for a slot in one
+``FairScheduler`` instead of a plain FIFO semaphore. Each (lane, session) pair
+gets its own queue and slots are handed out by deficit round robin: on each
+visit a queue earns ``quantum`` x its lane weight seconds of credit and spends
+it on the expected run time of its requests. A session that fans a question
+out to six models therefore can't starve another session's single quick
+question, and interactive lanes earn credit faster than debates or batch work.
+
+Request handlers tag their job with ``set_job_context(session_id, lane)``;
+the tag follows the coroutine (and any tasks it gathers) via contextvars.
+"""
+
+import contextvars
+import time
+from collections import OrderedDict, deque
+from typing import Dict, Optional, Tuple
+
+from concurrency import ResizableSemaphore, _Waiter
+
+# Lanes in priority order with their default deficit-round-robin weights
+LANES = ('interactive', 'dashboard', 'debate', 'batch')
+LANE_WEIGHTS = {'interactive': 8, 'dashboard': 4, 'debate': 2, 'batch': 1}
+
+_session_var = contextvars.ContextVar('scheduler_session', default='local')
+_lane_var = contextvars.ContextVar('scheduler_lane', default='batch')
+
+
+def set_job_context(session_id: str, lane: str):
+    """Tag the running task (and tasks it spawns) with a session and lane."""
+    if lane not in LANES:
+        raise ValueError(f"Unknown scheduler lane: {lane}")
+    _session_var.set(session_id)
+    _lane_var.set(lane)
+
+
+def job_context() -> Tuple[str, str]:
+    """The (session, lane) the running task is scheduled under."""
+    return _session_var.get(), _lane_var.get()
+
+
+class FairScheduler(ResizableSemaphore):
+    """Resizable query slots granted by weighted deficit round robin.
+
+    ``cost`` passed to ``acquire`` is the request's expected run time in
+    seconds. Untagged work (the console app, background jobs) runs in the
+    ``batch`` lane under the ``local`` session.
+    """
+
+    def __init__(self, limit: int, quantum: float = 5.0,
+                 lane_weights: Optional[Dict[str, float]] = None, history: int = 200):
+        super().__init__(limit)
+        self.quantum = quantum
+        self.lane_weights = dict(LANE_WEIGHTS, **(lane_weights or {}))
+        self._queues: "OrderedDict[Tuple[str, str], deque]" = OrderedDict()
+        self._deficits: Dict[Tuple[str, str], float] = {}
+        self._credited = False  # whether the head queue got its quantum this visit
+        self._count = 0
+        self._waits = {lane: deque(maxlen=history) for lane in LANES}
+        self._granted = {lane: 0 for lane in LANES}
+        self._max_wait = {lane: 0.0 for lane in LANES}
+
+    @property
+    def waiting(self) -> int:
+        return self._count
+
+    def _make_waiter(self, loop, cost: float) -> _Waiter:
+        session, lane = job_context()
+        return _Waiter(loop, max(0.1, cost), session, lane)
+
+    def _enqueue_locked(self, waiter: _Waiter):
+        self._queues.setdefault((waiter.lane, waiter.session), deque()).append(waiter)
+        self._count += 1
+
+    def _dequeue_locked(self) -> Optional[_Waiter]:
+        while self._queues:
+            key, queue = next(iter(self._queues.items()))
+            if not self._credited:
+                self._deficits[key] = self._deficits.get(key, 0.0) + self.quantum * self.lane_weights.get(key[0], 1)
+                self._credited = True
+            waiter = queue[0]
+            if waiter.cost <= self._deficits[key]:
+                queue.popleft()
+                self._count -= 1
+                self._deficits[key] -= waiter.cost
+                if not queue:
+                    self._drop_locked(key)
+                return waiter
+            # Out of credit: move on to the next queue in the round
+            self._queues.move_to_end(key)
+            self._credited = False
+        return None
+
+    def _discard_locked(self, waiter: _Waiter) -> bool:
+        key = (waiter.lane, waiter.session)
+        queue = self._queues.get(key)
+        if queue is None or waiter not in queue:
+            return False
+        queue.remove(waiter)
+        self._count -= 1
+        if not queue:
+            self._drop_locked(key)
+        return True
+
+    def _drop_locked(self, key: Tuple[str, str]):
+        """Forget an emptied queue; idle queues don't bank credit."""
+        if next(iter(self._queues)) == key:
+            self._credited = False
+        del self._queues[key]
+        self._deficits.pop(key, None)
+
+    def _granted_locked(self, waiter: _Waiter):
+        lane = waiter.lane if waiter.lane in self._waits else 'batch'
+        wait = time.time() - waiter.enqueued_at
+        self._waits[lane].append(wait)
+        self._granted[lane] += 1
+        self._max_wait[lane] = max(self._max_wait[lane], wait)
+
+    def status(self) -> Dict:
+        """Queue depths per lane and session, and recent per-lane wait times."""
+        now = time.time()
+        with self._lock:
+            lanes = {}
+            for lane in LANES:
+                queues = [q for (queue_lane, _), q in self._queues.items() if queue_lane == lane]
+                waits = sorted(self._waits[lane])
+                lanes[lane] = {
+                    'weight': self.lane_weights.get(lane, 1),
+                    'depth': sum(len(q) for q in queues),
+                    'sessions': len(queues),
+                    'oldest_wait': round(max((now - q[0].enqueued_at for q in queues), default=0.0), 2),
+                    'granted': self._granted[lane],
+                    'avg_wait': round(sum(waits) / len(waits), 3) if waits else 0.0,
+                    'p95_wait': round(waits[int(0.95 * (len(waits) - 1))], 3) if waits else 0.0,
+                    'max_wait': round(self._max_wait[lane], 3)
+                }
+            sessions = [
+                {'session_id': session, 'lane': lane, 'depth': len(queue),
+                 'deficit': round(self._deficits.get((lane, session), 0.0), 2),
+                 'oldest_wait': round(now - queue[0].enqueued_at, 2)}
+                for (lane, session), queue in self._queues.items()
+            ]
+            return {
+                'limit': self.limit,
+                'in_use': self.in_use,
+                'waiting': self._count,
+                'quantum': self.quantum,
+                'lanes': lanes,
+                'sessions': sessions
+            }
@@ -0,0 +1,195 @@
+"""
+Per-session state module for the web apps.
+
+While a query or debate runs, its session holds model output: the text each
+stream accumulates and, for debates, the history later prompts are built
+from. Nothing bounded that, and a job kept running (and holding it) after its
+client had gone. ``SessionRegistry`` accounts for it per session:
+
+- a running job charges every streamed chunk to its session, and a chunk that
+  would take the session over ``max_bytes`` raises ``SessionBudgetExceeded``
+  (which ends that model's stream with an error) instead of growing further;
+- a job's charges are returned when it finishes;
+- on disconnect, or after ``idle_timeout`` without activity, a session's
+  running jobs are cancelled and its state is dropped;
+- held and peak bytes per session are reported by ``stats``.
+"""
+
+import asyncio
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+
+class SessionBudgetExceeded(Exception):
+    """Raised when a session's held model output would exceed its byte cap."""
+
+    def __init__(self, session_id: str, limit: int):
+        self.session_id = session_id
+        self.limit = limit
+        super().__init__(f"Session output exceeds its {limit // 1024} KB limit")
+
+
+@dataclass
+class SessionState:
+    """What one session currently holds."""
+    session_id: str
+    created_at: float = field(default_factory=time.time)
+    last_active: float = field(default_factory=time.time)
+    held_bytes: int = 0
+    peak_bytes: int = 0
+    jobs: Dict[int, "SessionJob"] = field(default_factory=dict)
+
+    def to_dict(self, now: float) -> Dict:
+        return {
+            'session_id': self.session_id,
+            'held_bytes': self.held_bytes,
+            'peak_bytes': self.peak_bytes,
+            'jobs': len(self.jobs),
+            'idle': round(now - self.last_active, 1),
+            'age': round(now - self.created_at, 1)
+        }
+
+
+class SessionJob:
+    """One running job's charges against its session (use as a context manager)."""
+
+    def __init__(self, registry: "SessionRegistry", state: SessionState):
+        self.registry = registry
+        self.state = state
+        self.charged = 0
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.task: Optional[asyncio.Task] = None
+
+    def charge(self, text: str):
+        """Account for ``text`` now held on the session's behalf; raises SessionBudgetExceeded."""
+        self.registry._charge(self, len(text.encode('utf-8')))
+
+    def __enter__(self) -> "SessionJob":
+        try:
+            self.loop = asyncio.get_running_loop()
+            self.task = asyncio.current_task()
+        except RuntimeError:
+            pass
+        self.registry._start(self)
+        return self
+
+    def __exit__(self, *exc):
+        self.registry._finish(self)
+        return False
+
+
+class SessionRegistry:
+    """Byte accounting, caps and cleanup for every connected session."""
+
+    def __init__(self, max_bytes: int = 8 << 20, idle_timeout: float = 1800.0,
+                 on_expire: Optional[Callable[[str], None]] = None):
+        self.max_bytes = max_bytes
+        self.idle_timeout = idle_timeout
+        # Called with each idle session's id (default: release it)
+        self.on_expire = on_expire
+        self.sessions: Dict[str, SessionState] = {}
+        self.counters = {'released': 0, 'expired': 0, 'capped': 0, 'cancelled_jobs': 0}
+        self._lock = threading.Lock()
+        self._sweeper: Optional[threading.Thread] = None
+
+    @classmethod
+    def from_config(cls, config, on_expire: Optional[Callable[[str], None]] = None) -> "SessionRegistry":
+        return cls(max_bytes=int(config.get("session_max_mb", 8) * (1 << 20)),
+                   idle_timeout=config.get("session_idle_timeout", 1800),
+                   on_expire=on_expire)
+
+    def touch(self, session_id: str) -> SessionState:
+        """Record activity for a session (registering it if new)."""
+        with self._lock:
+            state = self.sessions.get(session_id)
+            if state is None:
+                state = self.sessions[session_id] = SessionState(session_id)
+            state.last_active = time.time()
+            return state
+
+    def job(self, session_id: str) -> SessionJob:
+        return SessionJob(self, self.touch(session_id))
+
+    def _start(self, job: SessionJob):
+        with self._lock:
+            job.state.jobs[id(job)] = job
+
+    def _charge(self, job: SessionJob, size: int):
+        state = job.state
+        with self._lock:
+            if state.held_bytes + size > self.max_bytes:
+                self.counters['capped'] += 1
+                raise SessionBudgetExceeded(state.session_id, self.max_bytes)
+            state.held_bytes += size
+            state.peak_bytes = max(state.peak_bytes, state.held_bytes)
+            state.last_active = time.time()
+            job.charged += size
+
+    def _finish(self, job: SessionJob):
+        state = job.state
+        with self._lock:
+            state.jobs.pop(id(job), None)
+            state.held_bytes = max(0, state.held_bytes - job.charged)
+            state.last_active = time.time()
+            job.charged = 0
+
+    def release(self, session_id: str) -> int:
+        """Cancel a session's running jobs and drop its state; returns the bytes it held."""
+        with self._lock:
+            state = self.sessions.pop(session_id, None)
+            if state is None:
+                return 0
+            self.counters['released'] += 1
+            jobs = list(state.jobs.values())
+            self.counters['cancelled_jobs'] += sum(1 for job in jobs if job.task is not None)
+        for job in jobs:
+            if job.task is not None and not job.loop.is_closed():
+                job.loop.call_soon_threadsafe(job.task.cancel)
+        return state.held_bytes
+
+    def sweep(self, now: Optional[float] = None) -> List[str]:
+        """Expire sessions idle for longer than ``idle_timeout`` with no job running."""
+        now = time.time() if now is None else now
+        with self._lock:
+            idle = [sid for sid, state in self.sessions.items()
+                    if not state.jobs and now - state.last_active > self.idle_timeout]
+            self.counters['expired'] += len(idle)
+        for session_id in idle:
+            (self.on_expire or self.release)(session_id)
+        return idle
+
+    def start_sweeper(self, interval: float = 60.0):
+        """Run ``sweep`` every ``interval`` seconds in a background thread (idempotent)."""
+        if self._sweeper is not None and self._sweeper.is_alive():
+            return
+
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.sweep()
+                except Exception as e:
+                    print(f"Session sweep error: {e}")
+
+        self._sweeper = threading.Thread(target=run, name="session-sweeper", daemon=True)
+        self._sweeper.start()
+
+    def stats(self) -> Dict:
+        now = time.time()
+        with self._lock:
+            sessions = [state.to_dict(now) for state in self.sessions.values()]
+            counters = dict(self.counters)
+        held = sum(s['held_bytes'] for s in sessions)
+        active = [s for s in sessions if s['jobs']]
+        return {
+            'max_bytes': self.max_bytes,
+            'idle_timeout': self.idle_timeout,
+            'sessions': len(sessions),
+            'active_sessions': len(active),
+            'held_bytes': held,
+            'bytes_per_active_session': round(held / len(active)) if active else 0,
+            'counters': counters,
+            'per_session': sorted(sessions, key=lambda s: -s['held_bytes'])
+        }
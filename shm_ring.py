@@ -0,0 +1,254 @@
+"""
+Shared-memory ring buffer module for streaming token chunks between processes.
+
+When Ollama stream reading and Socket.IO fan-out run in different processes,
+a ``multiprocessing.Queue`` pickles every token, pushes it through a pipe and
+unpickles it again, once per consuming process. ``ChunkRing`` instead lays
+length-prefixed records out in one ``multiprocessing.shared_memory`` block:
+
+- one producer (the reader of the Ollama streams) appends records by writing
+  into a memoryview of the block and then publishing the new write position
+  with a single aligned 8-byte store; it never locks and never waits;
+- any number of consumers (the Socket.IO server processes) poll the write
+  position and read records with their own cursor, so one write feeds every
+  consumer;
+- records carry a stream id and a per-stream sequence number; each consumer
+  keeps a cursor per stream, so a consumer that falls too far behind the
+  producer (more than ``safe_lag`` bytes) sees which streams lost chunks.
+
+Payload bytes are copied once out of the block (after which the record is
+checked for having been overwritten), never pickled.
+"""
+
+import struct
+import time
+from multiprocessing import resource_tracker, shared_memory
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional
+
+MAGIC = b"RNG1"
+# magic, reserved, capacity, write position (offset 16: 8-byte aligned)
+_HEADER = struct.Struct('<4sIQQ')
+_WRITE_POS = 16
+_DATA = 64
+# stream id, per-stream sequence number, payload length, flags
+_RECORD = struct.Struct('<IIII')
+_POS = struct.Struct('<Q')
+
+FLAG_DONE = 1
+FLAG_PAD = 2
+
+
+def _aligned(size: int) -> int:
+    return (size + 7) & ~7
+
+
+class Chunk(NamedTuple):
+    """One record read from the ring."""
+    stream_id: int
+    seq: int
+    data: bytes
+    done: bool
+
+    @property
+    def text(self) -> str:
+        return self.data.decode('utf-8', errors='replace')
+
+
+class ChunkRing:
+    """A shared-memory block holding the ring header and record area.
+
+    ``ChunkRing.create`` allocates a new ring (the producer side owns and
+    unlinks it); ``ChunkRing.attach`` opens an existing one by name.
+    """
+
+    def __init__(self, memory: shared_memory.SharedMemory, owner: bool):
+        self.memory = memory
+        self.owner = owner
+        self.buffer = memory.buf
+        magic, _, self.capacity, _ = _HEADER.unpack_from(self.buffer, 0)
+        if magic != MAGIC:
+            raise ValueError(f"Shared memory block {memory.name!r} is not a chunk ring")
+        self.max_payload = self.capacity // 8
+        # How far behind the write position a record is still safe to read: the
+        # producer may be writing up to two records (padding + record) past it
+        self.safe_lag = self.capacity - 2 * _aligned(_RECORD.size + self.max_payload)
+
+    @classmethod
+    def create(cls, capacity: int = 1 << 20, name: Optional[str] = None) -> "ChunkRing":
+        capacity = _aligned(max(4096, capacity))
+        memory = shared_memory.SharedMemory(name=name, create=True, size=_DATA + capacity)
+        _HEADER.pack_into(memory.buf, 0, MAGIC, 0, capacity, 0)
+        return cls(memory, owner=True)
+
+    @classmethod
+    def attach(cls, name: str) -> "ChunkRing":
+        # Children started by multiprocessing share their parent's resource
+        # tracker; any other process gets its own, which would unlink the block
+        # when that process exits. Only the creating process may unlink it.
+        shares_tracker = getattr(resource_tracker._resource_tracker, '_fd', None) is not None
+        memory = shared_memory.SharedMemory(name=name)
+        if not shares_tracker:
+            resource_tracker.unregister(memory._name, 'shared_memory')
+        return cls(memory, owner=False)
+
+    @property
+    def name(self) -> str:
+        return self.memory.name
+
+    @property
+    def write_pos(self) -> int:
+        return _POS.unpack_from(self.buffer, _WRITE_POS)[0]
+
+    def writer(self) -> "RingWriter":
+        return RingWriter(self)
+
+    def reader(self, streams: Optional[Iterable[int]] = None, from_start: bool = False) -> "RingReader":
+        return RingReader(self, streams, from_start)
+
+    def close(self):
+        """Detach from the block (and remove it, on the creating side)."""
+        self.buffer = None
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
+
+
+class RingWriter:
+    """The ring's single producer.
+
+    Records never wrap: when one doesn't fit before the end of the ring, the
+    tail is skipped with a padding record (or implicitly, if even a record
+    header doesn't fit) and the record starts at offset 0.
+    """
+
+    def __init__(self, ring: ChunkRing):
+        self.ring = ring
+        self.max_payload = ring.max_payload
+        self.position = ring.write_pos
+        self.sequences: Dict[int, int] = {}
+        self.records = 0
+        self.bytes = 0
+
+    def write(self, stream_id: int, data, done: bool = False) -> int:
+        """Append one chunk (``str`` or bytes-like) to ``stream_id``; returns its sequence number."""
+        payload = data.encode('utf-8') if isinstance(data, str) else data
+        size = len(payload)
+        if size > self.max_payload:
+            raise ValueError(f"Chunk of {size} bytes exceeds the ring's {self.max_payload}-byte record limit")
+
+        ring, buffer = self.ring, self.ring.buffer
+        offset = self.position % ring.capacity
+        room = ring.capacity - offset
+        record_size = _aligned(_RECORD.size + size)
+        if room < record_size:
+            if room >= _RECORD.size:
+                _RECORD.pack_into(buffer, _DATA + offset, 0, 0, room - _RECORD.size, FLAG_PAD)
+            self.position += room
+            offset = 0
+
+        seq = self.sequences.get(stream_id, 0)
+        start = _DATA + offset
+        _RECORD.pack_into(buffer, start, stream_id, seq, size, FLAG_DONE if done else 0)
+        buffer[start + _RECORD.size:start + _RECORD.size + size] = payload
+        self.position += record_size
+        # Publish: readers only look at bytes before the write position
+        _POS.pack_into(buffer, _WRITE_POS, self.position)
+
+        if done:
+            self.sequences.pop(stream_id, None)
+        else:
+            self.sequences[stream_id] = seq + 1
+        self.records += 1
+        self.bytes += size
+        return seq
+
+
+class RingReader:
+    """One consumer's view of the ring.
+
+    ``cursor`` is this reader's position in the ring; ``cursors`` holds the
+    next expected sequence number of every open stream. When the producer
+    laps the reader, the reader skips to the producer's position and counts
+    the loss in ``overruns``; chunks missing from a stream already being
+    followed show up in ``gaps[stream_id]`` when its next chunk arrives.
+    """
+
+    def __init__(self, ring: ChunkRing, streams: Optional[Iterable[int]] = None, from_start: bool = False):
+        self.ring = ring
+        self.streams = set(streams) if streams is not None else None
+        self.cursor = 0 if from_start else ring.write_pos
+        self.cursors: Dict[int, int] = {}
+        self.gaps: Dict[int, int] = {}
+        self.overruns = 0
+
+    def follow(self, stream_id: int):
+        """Also deliver ``stream_id`` (when constructed with a stream filter)."""
+        if self.streams is not None:
+            self.streams.add(stream_id)
+
+    def unfollow(self, stream_id: int):
+        if self.streams is not None:
+            self.streams.discard(stream_id)
+        self.cursors.pop(stream_id, None)
+
+    def poll(self, limit: int = 1024) -> List[Chunk]:
+        """Read up to ``limit`` records published since the last poll."""
+        ring, buffer = self.ring, self.ring.buffer
+        capacity, safe_lag = ring.capacity, ring.safe_lag
+        chunks: List[Chunk] = []
+        head = ring.write_pos
+        while self.cursor < head and len(chunks) < limit:
+            if head - self.cursor > safe_lag:
+                self._overrun(head)
+                continue
+            offset = self.cursor % capacity
+            if capacity - offset < _RECORD.size:
+                self.cursor += capacity - offset
+                continue
+            stream_id, seq, size, flags = _RECORD.unpack_from(buffer, _DATA + offset)
+            wanted = not flags & FLAG_PAD and self._wanted(stream_id)
+            start = _DATA + offset + _RECORD.size
+            data = bytes(buffer[start:start + size]) if wanted else b""
+            # The producer may have lapped us while we read: trust nothing read
+            head = ring.write_pos
+            if head - self.cursor > safe_lag:
+                self._overrun(head)
+                continue
+            if flags & FLAG_PAD:
+                self.cursor += _RECORD.size + size
+                continue
+            self.cursor += _aligned(_RECORD.size + size)
+            if wanted:
+                chunks.append(self._deliver(stream_id, seq, data, bool(flags & FLAG_DONE)))
+        return chunks
+
+    def _wanted(self, stream_id: int) -> bool:
+        return self.streams is None or stream_id in self.streams
+
+    def _deliver(self, stream_id: int, seq: int, data: bytes, done: bool) -> Chunk:
+        expected = self.cursors.get(stream_id, seq)
+        if seq > expected:
+            self.gaps[stream_id] = self.gaps.get(stream_id, 0) + seq - expected
+        if done:
+            self.cursors.pop(stream_id, None)
+        else:
+            self.cursors[stream_id] = seq + 1
+        return Chunk(stream_id, seq, data, done)
+
+    def _overrun(self, head: int):
+        self.overruns += 1
+        self.cursor = head
+
+    def pump(self, handler: Callable[[Chunk], None], stop: Callable[[], bool],
+             idle_sleep: float = 0.0005, max_sleep: float = 0.005):
+        """Call ``handler`` for every chunk until ``stop()``; backs off while the ring is idle."""
+        sleep = idle_sleep
+        while not stop():
+            chunks = self.poll()
+            for chunk in chunks:
+                handler(chunk)
+            if chunks:
+                sleep = idle_sleep
+            else:
+                time.sleep(sleep)
+                sleep = min(max_sleep, sleep * 2)
@@ -0,0 +1,122 @@
+"""
+Socket.IO room routing module for the multi-model query application.
+
+Query, debate and dashboard events used to be broadcast to every connected
+client, with the browser filtering on ``session_id``: with N clients every
+token was serialized and sent N times, and other users' answers leaked. The
+``RoomEmitter`` sends session events only to the asking client's room
+(Flask-SocketIO puts each client in a room named after its sid) and shared
+views to topic rooms that clients join with a ``subscribe`` event. Per-room
+counters show how many deliveries a broadcast would have cost, and
+acknowledged ``rtt_probe`` events measure each client's round-trip time.
+
+In a worker fleet (see cluster.py) events for a session connected to this
+process, and topic events (every worker serves its own subscribers), skip
+the message queue; only sessions living on another worker go through it.
+"""
+
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+# Shared views clients may subscribe to
+TOPICS = ('dashboard', 'models')
+
+
+class RoomEmitter:
+    """Emit to session or topic rooms and count events and deliveries per room."""
+
+    def __init__(self, socketio, topics: Iterable[str] = TOPICS, namespace: str = '/'):
+        self.socketio = socketio
+        self.topics = tuple(topics)
+        self.namespace = namespace
+        self.rooms: Dict[str, Dict] = {}
+        self.totals = {'events': 0, 'deliveries': 0, 'broadcast_deliveries': 0}
+        self.rtts: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def to_session(self, event: str, data: Dict, session_id: str):
+        """Send ``event`` only to the client whose sid is ``session_id``."""
+        self._emit(event, data, session_id, f"session:{session_id}", local=False)
+
+    def to_topic(self, event: str, data: Dict, topic: str):
+        """Send ``event`` to every subscriber of ``topic`` connected to this process."""
+        self._emit(event, data, topic, f"topic:{topic}", local=True)
+
+    def queued(self, ticket, position: int, eta: float):
+        """Tell a waiting client its place in the admission queue (an ``on_queued`` callback)."""
+        self.to_session('queued', {
+            'kind': ticket.kind,
+            'position': position,
+            'eta': round(eta, 1),
+            'session_id': ticket.session_id
+        }, ticket.session_id)
+
+    def _emit(self, event: str, data: Dict, room: str, label: str, local: bool):
+        members = self.members(room)
+        connected = self.members(None)
+        self.socketio.emit(event, data, room=room, namespace=self.namespace, ignore_queue=local or members > 0)
+        with self._lock:
+            counters = self.rooms.setdefault(label, {'events': 0, 'deliveries': 0, 'by_event': {}})
+            counters['events'] += 1
+            counters['deliveries'] += members
+            counters['by_event'][event] = counters['by_event'].get(event, 0) + 1
+            self.totals['events'] += 1
+            self.totals['deliveries'] += members
+            self.totals['broadcast_deliveries'] += connected
+
+    def members(self, room: Optional[str]) -> int:
+        """Clients currently in ``room`` (``None`` = every connected client)."""
+        try:
+            return len(self.socketio.server.manager.rooms.get(self.namespace, {}).get(room, {}))
+        except AttributeError:
+            return 0
+
+    def has_subscribers(self, topic: str) -> bool:
+        return self.members(topic) > 0
+
+    def subscribe(self, sid: str, topics: Iterable[str]) -> List[str]:
+        """Join ``sid`` to the known topics among ``topics``; returns the ones joined."""
+        joined = [topic for topic in topics if topic in self.topics]
+        for topic in joined:
+            self.socketio.server.enter_room(sid, topic, namespace=self.namespace)
+        return joined
+
+    def unsubscribe(self, sid: str, topics: Optional[Iterable[str]] = None):
+        for topic in (self.topics if topics is None else topics):
+            if topic in self.topics:
+                self.socketio.server.leave_room(sid, topic, namespace=self.namespace)
+
+    def probe_rtt(self, session_id: str):
+        """Send an acknowledged 'rtt_probe'; the ack updates the session's round-trip time."""
+        sent = time.time()
+
+        def on_ack(*args):
+            elapsed = time.time() - sent
+            with self._lock:
+                previous = self.rtts.get(session_id)
+                self.rtts[session_id] = elapsed if previous is None else previous + 0.3 * (elapsed - previous)
+
+        self.socketio.emit('rtt_probe', {}, to=session_id, namespace=self.namespace, callback=on_ack,
+                           ignore_queue=self.members(session_id) > 0)
+
+    def rtt(self, session_id: str) -> Optional[float]:
+        """Smoothed round-trip time to ``session_id`` in seconds (None until measured)."""
+        return self.rtts.get(session_id)
+
+    def forget_session(self, session_id: str):
+        """Drop a disconnected session's counters and RTT (totals keep its history)."""
+        with self._lock:
+            self.rooms.pop(f"session:{session_id}", None)
+            self.rtts.pop(session_id, None)
+
+    def stats(self) -> Dict:
+        """Per-room counters plus totals versus broadcasting every event."""
+        with self._lock:
+            rooms = {label: dict(counters, by_event=dict(counters['by_event']), members=0)
+                     for label, counters in self.rooms.items()}
+            totals = dict(self.totals)
+        for label, counters in rooms.items():
+            counters['members'] = self.members(label.split(":", 1)[1])
+        totals['saved_deliveries'] = totals['broadcast_deliveries'] - totals['deliveries']
+        return {'connected': self.members(None), 'rooms': rooms, 'totals': totals}
@@ -6,10 +6,177 @@ import psutil
 import platform
 import subprocess
 import json
+import os
 import re
-from typing import Dict, List, Tuple, Optional
+import threading
+import time
+from array import array
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Set, Tuple
 from dataclasses import dataclass
 
+from model_catalog import parameters_from_name
+
+
+# Approximate bits per weight for the GGUF quantization levels Ollama reports
+QUANTIZATION_BITS = {
+    "F32": 32.0, "F16": 16.0, "BF16": 16.0,
+    "Q8_0": 8.5, "Q6_K": 6.56,
+    "Q5_K_M": 5.69, "Q5_K_S": 5.54, "Q5_1": 6.0, "Q5_0": 5.5,
+    "Q4_K_M": 4.85, "Q4_K_S": 4.58, "Q4_1": 5.0, "Q4_0": 4.5,
+    "Q3_K_L": 4.27, "Q3_K_M": 3.91, "Q3_K_S": 3.5, "Q2_K": 3.35,
+}
+DEFAULT_QUANTIZATION = "Q4_0"  # Ollama's default tags are 4-bit
+DEFAULT_NUM_CTX = 2048
+DEFAULT_FOOTPRINT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "model_footprints.json")
+RUNTIME_OVERHEAD_GB = 0.5  # runner process, compute buffers
+
+
+def quantization_bits(level: str) -> float:
+    """Bits per weight for a quantization level such as "Q4_K_M" or "F16"."""
+    level = (level or DEFAULT_QUANTIZATION).upper()
+    if level in QUANTIZATION_BITS:
+        return QUANTIZATION_BITS[level]
+    match = re.search(r'Q(\d)', level)
+    return float(match.group(1)) + 0.5 if match else QUANTIZATION_BITS[DEFAULT_QUANTIZATION]
+
+
+def _read_text(path: str) -> Optional[str]:
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except (OSError, ValueError):
+        return None
+
+
+def read_cgroup_limits(cgroup_root: str = "/sys/fs/cgroup", proc_root: str = "/proc") -> Dict:
+    """Memory and CPU limits of this process's cgroup v2 (``{}`` outside a limited cgroup).
+    
+    Walks from the process's own cgroup up to the root, since a parent's
+    ``memory.max``/``cpu.max`` also bounds its children. Returns any of
+    ``memory_max_bytes``, ``memory_current_bytes``, ``inactive_file_bytes``
+    and ``cpu_quota_cores``.
+    """
+    relative = "/"
+    for line in (_read_text(os.path.join(proc_root, "self", "cgroup")) or "").splitlines():
+        if line.startswith("0::"):
+            relative = line[3:] or "/"
+    
+    limits = {}
+    path = os.path.normpath(os.path.join(cgroup_root, relative.lstrip("/")))
+    root = os.path.normpath(cgroup_root)
+    while True:
+        memory_max = _read_text(os.path.join(path, "memory.max"))
+        if memory_max and memory_max != "max":
+            limits['memory_max_bytes'] = min(int(memory_max), limits.get('memory_max_bytes', int(memory_max)))
+            if 'memory_current_bytes' not in limits:
+                current = _read_text(os.path.join(path, "memory.current"))
+                if current:
+                    limits['memory_current_bytes'] = int(current)
+                for line in (_read_text(os.path.join(path, "memory.stat")) or "").splitlines():
+                    if line.startswith("inactive_file "):
+                        limits['inactive_file_bytes'] = int(line.split()[1])
+        cpu_max = _read_text(os.path.join(path, "cpu.max"))
+        if cpu_max and not cpu_max.startswith("max"):
+            quota, period = (cpu_max.split() + ["100000"])[:2]
+            cores = int(quota) / int(period)
+            limits['cpu_quota_cores'] = min(cores, limits.get('cpu_quota_cores', cores))
+        if path == root or not path.startswith(root):
+            break
+        path = os.path.dirname(path)
+    return limits
+
+
+def read_pressure(proc_root: str = "/proc") -> Dict:
+    """Pressure stall information from ``/proc/pressure/{memory,cpu}``.
+    
+    Returns e.g. ``{'memory': {'some': {'avg10': 1.2, ...}, 'full': {...}}}``;
+    resources the kernel doesn't report (no PSI support) are omitted.
+    """
+    pressure = {}
+    for resource in ('memory', 'cpu'):
+        text = _read_text(os.path.join(proc_root, "pressure", resource))
+        if not text:
+            continue
+        pressure[resource] = {}
+        for line in text.splitlines():
+            kind, _, fields = line.partition(" ")
+            pressure[resource][kind] = {
+                key: float(value) for key, value in (field.split("=") for field in fields.split())
+            }
+    return pressure
+
+
+# PCI vendor IDs as reported in /sys/class/drm/card*/device/vendor
+GPU_VENDORS = {"0x10de": "NVIDIA", "0x1002": "AMD", "0x8086": "Intel"}
+
+
+def _read_number(path: str) -> Optional[float]:
+    text = _read_text(path)
+    try:
+        return float(text) if text is not None else None
+    except ValueError:
+        return None
+
+
+def scan_drm_gpus(sys_root: str = "/sys") -> Optional[List[Dict]]:
+    """GPUs listed under ``/sys/class/drm``; None when the directory doesn't exist.
+    
+    VRAM totals come from ``mem_info_vram_total`` where the driver exposes it
+    (amdgpu). Each entry keeps its ``device`` directory for usage polling.
+    """
+    drm = os.path.join(sys_root, "class", "drm")
+    try:
+        cards = sorted(name for name in os.listdir(drm) if re.fullmatch(r'card\d+', name))
+    except OSError:
+        return None
+    
+    gpus = []
+    for card in cards:
+        device = os.path.join(drm, card, "device")
+        vendor = GPU_VENDORS.get((_read_text(os.path.join(device, "vendor")) or "").lower())
+        if not vendor:
+            continue
+        total = _read_number(os.path.join(device, "mem_info_vram_total")) or 0
+        used = _read_number(os.path.join(device, "mem_info_vram_used")) or 0
+        gpus.append({
+            'name': _read_text(os.path.join(device, "product_name")) or f"{vendor} GPU ({card})",
+            'total_memory_mb': total / (1024**2),
+            'free_memory_mb': (total - used) / (1024**2),
+            'type': vendor,
+            'device': device
+        })
+    return gpus
+
+
+def read_nvidia_proc_gpus(proc_root: str = "/proc") -> List[str]:
+    """Model names of GPUs bound to the NVIDIA driver (``/proc/driver/nvidia/gpus``)."""
+    root = os.path.join(proc_root, "driver", "nvidia", "gpus")
+    try:
+        buses = sorted(os.listdir(root))
+    except OSError:
+        return []
+    names = []
+    for bus in buses:
+        info = _read_text(os.path.join(root, bus, "information")) or ""
+        model = next((line.split(":", 1)[1].strip() for line in info.splitlines() if line.startswith("Model:")), "")
+        names.append(model or "NVIDIA GPU (detected)")
+    return names
+
+
+def kv_cache_gb(parameters_b: float, num_ctx: int) -> float:
+    """Rough FP16 KV-cache size for ``num_ctx`` tokens.
+    
+    Per-token KV size grows with layer count and width but much slower than
+    parameter count (and grouped-query attention shrinks it further), so a
+    square-root fit is used: ~0.28MB/token at 8B, ~0.85MB/token at 70B.
+    """
+    if parameters_b <= 0:
+        return 0.0
+    mb_per_token = 0.1 * parameters_b ** 0.5
+    return mb_per_token * num_ctx / 1024
+
 
 @dataclass
 class SystemResources:
@@ -20,6 +187,8 @@ class SystemResources:
     gpu_info: List[Dict]
     platform: str
     architecture: str
+    memory_limit_gb: Optional[float] = None  # cgroup memory.max, when set
+    cpu_quota: Optional[float] = None  # cgroup cpu.max in cores, when set
 
 
 @dataclass
@@ -32,26 +201,68 @@ class ModelInfo:
     min_ram_gb: float
     recommended_ram_gb: float
     supports_gpu: bool
+    quantization: str = ""
+    kv_cache_gb: float = 0.0
+    source: str = "name"  # "metadata" (Ollama's blob size) or "learned" (observed runner RSS)
+
+
+@dataclass
+class ConcurrencyPlan:
+    """Schedule of concurrent waves produced by the bin-packing planner."""
+    waves: List[List[str]]
+    wave_ram_gb: List[float]
+    ram_budget_gb: float
+    cpu_budget: int
+    max_concurrent: int
+    estimated_makespan: float  # sum of each wave's longest expected duration
+    oversized: List[str]  # models that exceed the budget alone (run solo)
+    
+    def to_dict(self) -> Dict:
+        return {
+            'waves': self.waves,
+            'wave_ram_gb': [round(ram, 1) for ram in self.wave_ram_gb],
+            'ram_budget_gb': round(self.ram_budget_gb, 1),
+            'cpu_budget': self.cpu_budget,
+            'max_concurrent': self.max_concurrent,
+            'estimated_makespan': round(self.estimated_makespan, 2),
+            'oversized': self.oversized
+        }
 
 
 class SystemResourceManager:
     """Manages system resources and model optimization."""
     
-    def __init__(self):
+    def __init__(self, footprint_path: Optional[str] = DEFAULT_FOOTPRINT_PATH):
         self.system_info = None
         self.gpu_available = False
         self.gpu_memory_gb = 0
         self.model_size_cache = {}
+        self.catalog = None
+        self.num_ctx = DEFAULT_NUM_CTX
+        self.usage_sampler = None
+        self.usage_sample_interval = 1.0
+        self.usage_listeners = []
+        self.cgroup_root = "/sys/fs/cgroup"
+        self.sys_root = "/sys"
+        self.gpu_cache_ttl = 300.0  # GPUs don't come and go; re-detect rarely
+        self._gpu_cache: Optional[Tuple[float, List[Dict]]] = None
+        self.proc_root = "/proc"
+        self.memory_pressure_threshold = 10.0  # PSI "some" avg10 (%) above which launches wait
+        self.cpu_pressure_threshold = 50.0
+        self.timeseries = ResourceTimeSeries()
+        self.footprints = FootprintLearner(footprint_path)
+        self.runner_tracker = RunnerFootprintTracker(self.footprints, self.timeseries)
         
     def detect_system_resources(self) -> SystemResources:
-        """Detect available system resources."""
-        # RAM information
-        memory = psutil.virtual_memory()
-        total_ram_gb = memory.total / (1024**3)
-        available_ram_gb = memory.available / (1024**3)
+        """Detect available system resources, honoring cgroup v2 limits."""
+        # RAM information (the container's limit, not the host's)
+        limits = read_cgroup_limits(self.cgroup_root, self.proc_root)
+        total_ram_gb, available_ram_gb = self._memory_gb(limits)
         
         # CPU information
-        cpu_cores = psutil.cpu_count(logical=False)
+        cpu_cores = psutil.cpu_count(logical=False) or psutil.cpu_count() or 1
+        if 'cpu_quota_cores' in limits:
+            cpu_cores = max(1, min(cpu_cores, int(limits['cpu_quota_cores'] + 0.5)))
         
         # GPU information
         gpu_info = self._detect_gpu()
@@ -66,17 +277,88 @@ class SystemResourceManager:
             cpu_cores=cpu_cores,
             gpu_info=gpu_info,
             platform=platform_name,
-            architecture=architecture
+            architecture=architecture,
+            memory_limit_gb=limits['memory_max_bytes'] / (1024**3) if 'memory_max_bytes' in limits else None,
+            cpu_quota=limits.get('cpu_quota_cores')
         )
         
         return self.system_info
     
-    def _detect_gpu(self) -> List[Dict]:
-        """Detect available GPU information."""
-        gpu_info = []
+    def _memory_gb(self, limits: Optional[Dict] = None) -> Tuple[float, float]:
+        """(total, available) RAM in GB, capped by the cgroup memory limit."""
+        if limits is None:
+            limits = read_cgroup_limits(self.cgroup_root, self.proc_root)
+        memory = psutil.virtual_memory()
+        total, available = memory.total, memory.available
+        if 'memory_max_bytes' in limits:
+            total = min(total, limits['memory_max_bytes'])
+            # Page cache counts toward memory.current but is reclaimable
+            used = limits.get('memory_current_bytes', 0) - limits.get('inactive_file_bytes', 0)
+            available = min(available, max(0, limits['memory_max_bytes'] - used))
+        return total / (1024**3), available / (1024**3)
+    
+    def refresh_available_memory(self, usage: Optional[Dict] = None) -> float:
+        """Update ``system_info.available_ram_gb`` from a live reading.
+        
+        Registered as a usage-sampler listener so the value stays current; the
+        sample argument is accepted but a fresh cgroup-aware reading is used.
+        """
+        if not self.system_info:
+            self.detect_system_resources()
+        _, available = self._memory_gb()
+        self.system_info.available_ram_gb = available
+        return available
+    
+    def read_pressure(self) -> Dict:
+        """Current PSI readings for memory and CPU (``{}`` without kernel support)."""
+        return read_pressure(self.proc_root)
+    
+    def launch_pressure(self, pressure: Optional[Dict] = None) -> Optional[str]:
+        """Why new model launches should wait, or None when pressure is acceptable."""
+        pressure = self.read_pressure() if pressure is None else pressure
+        memory = pressure.get('memory', {}).get('some', {}).get('avg10', 0.0)
+        cpu = pressure.get('cpu', {}).get('some', {}).get('avg10', 0.0)
+        if memory > self.memory_pressure_threshold:
+            return f"memory pressure {memory:.1f}%"
+        if cpu > self.cpu_pressure_threshold:
+            return f"CPU pressure {cpu:.1f}%"
+        return None
+    
+    def _detect_gpu(self, force: bool = False) -> List[Dict]:
+        """Detect available GPU information (cached for ``gpu_cache_ttl`` seconds).
         
+        Reads sysfs/procfs first; subprocess tools are only used for NVIDIA
+        memory totals or on systems without ``/sys/class/drm``.
+        """
+        now = time.time()
+        if not force and self._gpu_cache and now - self._gpu_cache[0] < self.gpu_cache_ttl:
+            return self._gpu_cache[1]
+        
+        drm_gpus = scan_drm_gpus(self.sys_root)
+        nvidia_names = read_nvidia_proc_gpus(self.proc_root)
+        
+        if drm_gpus is None and not nvidia_names:
+            gpu_info = self._detect_gpu_subprocess()
+        else:
+            gpu_info = [gpu for gpu in drm_gpus or [] if gpu['type'] != 'NVIDIA']
+            if nvidia_names or len(gpu_info) != len(drm_gpus or []):
+                # The driver doesn't expose VRAM in sysfs; one nvidia-smi call at detection time
+                nvidia = self._query_nvidia_smi() or [
+                    {'name': name, 'total_memory_mb': 0, 'free_memory_mb': 0, 'type': 'NVIDIA'}
+                    for name in nvidia_names or ['NVIDIA GPU (detected)']
+                ]
+                gpu_info = nvidia + gpu_info
+        
+        discrete = [gpu for gpu in gpu_info if gpu['type'] in ('NVIDIA', 'AMD')]
+        self.gpu_available = bool(discrete)
+        self.gpu_memory_gb = sum(gpu['total_memory_mb'] for gpu in discrete) / 1024
+        self._gpu_cache = (now, gpu_info)
+        return gpu_info
+    
+    def _query_nvidia_smi(self) -> List[Dict]:
+        """NVIDIA GPUs with memory totals from ``nvidia-smi`` ([] if unavailable)."""
+        gpu_info = []
         try:
-            # Try NVIDIA GPUs first
             result = subprocess.run(
                 ['nvidia-smi', '--query-gpu=name,memory.total,memory.free', '--format=csv,noheader,nounits'],
                 capture_output=True, text=True, timeout=10
@@ -93,11 +375,14 @@ class SystemResourceManager:
                                 'free_memory_mb': float(parts[2]),
                                 'type': 'NVIDIA'
                             })
-                            self.gpu_available = True
-                            self.gpu_memory_gb += float(parts[1]) / 1024
         
-        except (subprocess.TimeoutExpired, FileNotFoundError, subprocess.SubprocessError):
+        except (subprocess.TimeoutExpired, FileNotFoundError, subprocess.SubprocessError, ValueError):
             pass
+        return gpu_info
+    
+    def _detect_gpu_subprocess(self) -> List[Dict]:
+        """Fallback detection via external tools when sysfs is not available."""
+        gpu_info = self._query_nvidia_smi()
         
         try:
             # Try AMD GPUs (basic detection)
@@ -110,7 +395,6 @@ class SystemResourceManager:
                         'free_memory_mb': 0,
                         'type': 'AMD'
                     })
-                    self.gpu_available = True
         
         except (subprocess.TimeoutExpired, FileNotFoundError, subprocess.SubprocessError):
             pass
@@ -134,38 +418,48 @@ class SystemResourceManager:
         
         return gpu_info
     
-    def estimate_model_requirements(self, model_name: str) -> ModelInfo:
-        """Estimate model resource requirements based on name."""
-        # Parse model information from name
-        name_lower = model_name.lower()
+    def attach_catalog(self, catalog, num_ctx: Optional[int] = None):
+        """Use a model catalog's Ollama metadata (real sizes, quantization) for estimates."""
+        self.catalog = catalog
+        if num_ctx:
+            self.num_ctx = num_ctx
+        self.model_size_cache.clear()
+    
+    def estimate_model_requirements(self, model_name: str, num_ctx: Optional[int] = None) -> ModelInfo:
+        """Estimate model resource requirements.
         
-        # Extract parameter count
-        parameters = "unknown"
-        size_gb = 2.0  # Default small model size
-        min_ram_gb = 4.0
-        recommended_ram_gb = 8.0
-        
-        # Pattern matching for parameter counts and sizes
-        patterns = [
-            (r'(\d+\.?\d*)b', lambda x: float(x)),  # e.g., "7b", "13b", "70b"
-            (r'(\d+)b', lambda x: float(x)),        # e.g., "7b", "13b"
-            (r'(\d+\.?\d*)m', lambda x: float(x) / 1000),  # e.g., "1.5m" -> 0.0015b
-        ]
+        Uses the blob size, quantization level and parameter count Ollama
+        reports (via the attached catalog) when available, and falls back to
+        parsing the tag. Adds a KV-cache term for ``num_ctx`` tokens. Results
+        are memoized per (model, digest, context size); an entry is rebuilt
+        when the learned footprint behind it changes.
+        """
+        num_ctx = num_ctx or self.num_ctx
+        entry = self.catalog.snapshot.get(model_name) if self.catalog else None
+        learned = self.footprints.lookup(model_name, num_ctx)
+        cache_key = (model_name, entry.digest if entry else "", num_ctx)
+        cached = self.model_size_cache.get(cache_key)
+        if cached and cached[0] == learned:
+            return cached[1]
         
-        param_count = 0
-        for pattern, converter in patterns:
-            match = re.search(pattern, name_lower)
-            if match:
-                param_count = converter(match.group(1))
-                parameters = f"{param_count}B" if param_count >= 1 else f"{param_count * 1000}M"
-                break
+        name_lower = model_name.lower()
         
-        # Estimate resource requirements based on parameter count
+        param_count = entry.parameters_b if entry else parameters_from_name(model_name)
+        quantization = (entry.quantization_level if entry else "") or DEFAULT_QUANTIZATION
+        parameters = "unknown"
         if param_count > 0:
-            # Rough estimates: ~2GB per billion parameters for FP16
-            size_gb = max(param_count * 2, 0.5)
-            min_ram_gb = max(size_gb * 1.5, 2.0)  # 1.5x model size minimum
-            recommended_ram_gb = max(size_gb * 2.5, 4.0)  # 2.5x for comfortable operation
+            parameters = f"{param_count:g}B" if param_count >= 1 else f"{param_count * 1000:g}M"
+        
+        # Weights: the real blob size when Ollama reports it, else params x bits/weight
+        if entry and entry.size_bytes > 0:
+            size_gb = entry.size_bytes / (1024**3)
+            source = "metadata"
+        elif param_count > 0:
+            size_gb = param_count * 1e9 * quantization_bits(quantization) / 8 / (1024**3)
+            source = "name"
+        else:
+            size_gb = 2.0  # Unknown size: assume a small model
+            source = "default"
         
         # Adjust for specific model types
         model_type = "text"
@@ -173,66 +467,127 @@ class SystemResourceManager:
         
         if any(keyword in name_lower for keyword in ['vision', 'llava', 'clip']):
             model_type = "vision"
-            recommended_ram_gb *= 1.3  # Vision models need more RAM
         elif any(keyword in name_lower for keyword in ['code', 'coder', 'coding']):
             model_type = "code"
         elif any(keyword in name_lower for keyword in ['embed', 'embedding']):
             model_type = "embedding"
-            size_gb *= 0.5  # Embedding models are typically smaller
             supports_gpu = False
         
-        return ModelInfo(
+        kv_gb = 0.0 if model_type == "embedding" else kv_cache_gb(param_count, num_ctx)
+        min_ram_gb = size_gb + kv_gb + RUNTIME_OVERHEAD_GB
+        recommended_ram_gb = min_ram_gb * 1.25
+        if model_type == "vision":
+            recommended_ram_gb *= 1.3  # Vision projector and image buffers
+        
+        # Prefer what the runner was actually observed to use on this host
+        if learned:
+            observed_gb, observed_ctx = learned
+            min_ram_gb = observed_gb + kv_cache_gb(param_count, num_ctx) - kv_cache_gb(param_count, observed_ctx)
+            recommended_ram_gb = min_ram_gb * 1.15
+            source = "learned"
+        
+        info = ModelInfo(
             name=model_name,
             size_gb=round(size_gb, 1),
             parameters=parameters,
             type=model_type,
             min_ram_gb=round(min_ram_gb, 1),
             recommended_ram_gb=round(recommended_ram_gb, 1),
-            supports_gpu=supports_gpu
+            supports_gpu=supports_gpu,
+            quantization=quantization,
+            kv_cache_gb=round(kv_gb, 2),
+            source=source
         )
+        self.model_size_cache[cache_key] = (learned, info)
+        return info
     
-    def optimize_concurrent_models(self, available_models: List[str]) -> Tuple[int, List[str]]:
-        """Determine optimal number of concurrent models and prioritize models."""
+    def get_live_available_ram_gb(self) -> float:
+        """Currently available RAM in GB (not the startup snapshot), within the cgroup limit."""
+        return self._memory_gb()[1]
+    
+    def plan_concurrent_waves(self, models: List[str], ram_budget_gb: Optional[float] = None,
+                              cpu_budget: Optional[int] = None,
+                              durations: Optional[Dict[str, float]] = None,
+                              cpu_weights: Optional[Dict[str, float]] = None) -> ConcurrencyPlan:
+        """Pack models into concurrent waves that fit the RAM budget.
+        
+        Each model is an item with a memory weight (its estimated footprint)
+        and a CPU weight (1 unless given). Items are placed longest-first into
+        the first wave with room for both weights, which keeps similarly slow
+        models together and so keeps the sum of per-wave maxima (the makespan)
+        low. ``durations`` defaults to memory weight, since larger models
+        generate more slowly. Models larger than the whole budget run alone.
+        """
         if not self.system_info:
             self.detect_system_resources()
         
-        # Get model information
-        model_infos = []
-        for model in available_models:
-            info = self.estimate_model_requirements(model)
-            model_infos.append(info)
+        if ram_budget_gb is None:
+            # Conservative approach: use 70% of currently available RAM
+            ram_budget_gb = self.get_live_available_ram_gb() * 0.7
+        if cpu_budget is None:
+            cpu_budget = min(max(1, self.system_info.cpu_cores // 2), 6)
+        cpu_budget = max(1, cpu_budget)
         
-        # Sort models by efficiency (smaller models first for better concurrency)
-        model_infos.sort(key=lambda x: (x.size_gb, x.name))
+        memory = {model: self.estimate_model_requirements(model).min_ram_gb for model in models}
+        durations = durations or {}
+        cpu_weights = cpu_weights or {}
+        duration = lambda model: durations.get(model, memory[model])
         
-        # Determine optimal concurrency based on available RAM
-        available_ram = self.system_info.available_ram_gb
+        waves: List[List[str]] = []
+        wave_ram: List[float] = []
+        wave_cpu: List[float] = []
+        oversized = []
         
-        # Conservative approach: use 70% of available RAM
-        usable_ram = available_ram * 0.7
+        for model in sorted(dict.fromkeys(models), key=lambda m: (-duration(m), m)):
+            ram, cpu = memory[model], cpu_weights.get(model, 1.0)
+            if ram > ram_budget_gb:
+                oversized.append(model)
+                continue
+            for i in range(len(waves)):
+                if wave_ram[i] + ram <= ram_budget_gb and wave_cpu[i] + cpu <= cpu_budget:
+                    waves[i].append(model)
+                    wave_ram[i] += ram
+                    wave_cpu[i] += cpu
+                    break
+            else:
+                waves.append([model])
+                wave_ram.append(ram)
+                wave_cpu.append(cpu)
         
-        # Calculate optimal concurrency
-        if not model_infos:
-            return 1, []
+        for model in oversized:
+            waves.append([model])
+            wave_ram.append(memory[model])
         
-        # Find how many of the smallest models we can run
-        smallest_model = model_infos[0]
-        max_concurrent_small = max(1, int(usable_ram / smallest_model.recommended_ram_gb))
+        return ConcurrencyPlan(
+            waves=waves,
+            wave_ram_gb=wave_ram,
+            ram_budget_gb=ram_budget_gb,
+            cpu_budget=cpu_budget,
+            max_concurrent=max((len(wave) for wave in waves), default=1),
+            estimated_makespan=sum(max(duration(m) for m in wave) for wave in waves),
+            oversized=oversized
+        )
+    
+    def optimize_concurrent_models(self, available_models: List[str]) -> Tuple[int, List[str]]:
+        """Determine optimal number of concurrent models and prioritize models."""
+        if not self.system_info:
+            self.detect_system_resources()
         
-        # Conservative limit based on CPU cores too
-        max_concurrent_cpu = max(1, self.system_info.cpu_cores // 2)
+        if not available_models:
+            return 1, []
         
-        # Final decision
-        optimal_concurrent = min(max_concurrent_small, max_concurrent_cpu, 6)  # Cap at 6
+        plan = self.plan_concurrent_waves(available_models)
         
-        # Prioritize models that fit well in memory
-        prioritized_models = []
-        for info in model_infos:
-            if info.recommended_ram_gb <= usable_ram / optimal_concurrent:
-                prioritized_models.append(info.name)
+        # Smaller models first; anything that fits the budget on its own can be scheduled
+        model_infos = sorted(
+            (self.estimate_model_requirements(model) for model in available_models),
+            key=lambda x: (x.size_gb, x.name)
+        )
+        prioritized_models = [info.name for info in model_infos if info.name not in plan.oversized]
+        optimal_concurrent = plan.max_concurrent
         
         # If no models fit comfortably, include at least a few smallest ones
-        if not prioritized_models and model_infos:
+        if not prioritized_models:
             prioritized_models = [info.name for info in model_infos[:3]]
             optimal_concurrent = 1  # Run one at a time for large models
         
@@ -249,7 +604,7 @@ class SystemResourceManager:
             total_estimated_ram += info.min_ram_gb
         
         # If total RAM requirement exceeds 80% of available RAM, run sequentially
-        return total_estimated_ram > (self.system_info.available_ram_gb * 0.8)
+        return total_estimated_ram > (self.refresh_available_memory() * 0.8)
     
     def get_resource_summary(self) -> Dict:
         """Get a summary of system resources and recommendations."""
@@ -301,19 +656,46 @@ class SystemResourceManager:
         print(f"   • Large models support: {'Yes' if summary['recommendations']['can_run_large_models'] else 'Limited'}")
         print(f"   • GPU acceleration: {'Available' if summary['recommendations']['use_gpu'] else 'CPU only'}")
     
+    def start_usage_sampler(self, interval: Optional[float] = None) -> "SystemUsageSampler":
+        """Start the background usage sampler (idempotent)."""
+        if interval:
+            self.usage_sample_interval = interval
+        if self.usage_sampler is None:
+            self.usage_sampler = SystemUsageSampler(self, self.usage_sample_interval)
+            self.usage_sampler.add_listener(self.timeseries.record)
+            self.usage_sampler.add_listener(self.runner_tracker.sample)
+            self.usage_sampler.add_listener(self.refresh_available_memory)
+            for listener in self.usage_listeners:
+                self.usage_sampler.add_listener(listener)
+        self.usage_sampler.start()
+        return self.usage_sampler
+    
+    def add_usage_listener(self, listener):
+        """Register a callback for every usage sample, whether or not the sampler runs yet."""
+        self.usage_listeners.append(listener)
+        if self.usage_sampler is not None:
+            self.usage_sampler.add_listener(listener)
+    
     def get_real_time_usage(self) -> Dict:
-        """Get real-time system resource usage."""
+        """Get the latest system resource usage sample without blocking.
+        
+        Samples are collected by a background thread; the returned dict carries
+        ``sample_age`` (seconds since the sample was taken).
+        """
+        sampler = self.usage_sampler or self.start_usage_sampler()
+        return sampler.latest()
+    
+    def collect_usage(self, include_gpu: bool = True, previous: Optional[Dict] = None) -> Dict:
+        """Collect one system usage sample (non-blocking CPU readings)."""
         try:
-            import time
+            # CPU usage since the previous call (interval=None never sleeps)
+            cpu_percent = psutil.cpu_percent(interval=None)
+            cpu_per_core = psutil.cpu_percent(interval=None, percpu=True)
             
-            # CPU usage
-            cpu_percent = psutil.cpu_percent(interval=1)
-            cpu_per_core = psutil.cpu_percent(interval=1, percpu=True)
-            
-            # Memory usage
-            memory = psutil.virtual_memory()
-            memory_used_gb = (memory.total - memory.available) / (1024**3)
-            memory_percent = memory.percent
+            # Memory usage (within the cgroup limit when containerized)
+            memory_total_gb, memory_available_gb = self._memory_gb()
+            memory_used_gb = memory_total_gb - memory_available_gb
+            memory_percent = memory_used_gb / memory_total_gb * 100 if memory_total_gb else 0.0
             
             # Disk usage (for the main drive)
             try:
@@ -328,40 +710,71 @@ class SystemResourceManager:
             except:
                 disk_info = {'error': 'Cannot access disk info'}
             
-            # Network stats
+            timestamp = time.time()
+            
+            # Network stats, with rates relative to the previous sample
             try:
                 network = psutil.net_io_counters()
                 network_info = {
                     'bytes_sent': network.bytes_sent,
                     'bytes_recv': network.bytes_recv,
                     'packets_sent': network.packets_sent,
-                    'packets_recv': network.packets_recv
+                    'packets_recv': network.packets_recv,
+                    'sent_per_sec': 0.0,
+                    'recv_per_sec': 0.0
                 }
+                prev_network = (previous or {}).get('network', {})
+                elapsed = timestamp - (previous or {}).get('timestamp', timestamp)
+                if elapsed > 0 and 'bytes_sent' in prev_network:
+                    network_info['sent_per_sec'] = round((network.bytes_sent - prev_network['bytes_sent']) / elapsed, 1)
+                    network_info['recv_per_sec'] = round((network.bytes_recv - prev_network['bytes_recv']) / elapsed, 1)
             except:
                 network_info = {'error': 'Cannot access network info'}
             
+            # Swap usage, with swap-in/out rates relative to the previous sample
+            try:
+                swap = psutil.swap_memory()
+                swap_info = {
+                    'total_gb': round(swap.total / (1024**3), 1),
+                    'used_gb': round(swap.used / (1024**3), 1),
+                    'percent': round(swap.percent, 1),
+                    'sin': swap.sin,
+                    'sout': swap.sout,
+                    'in_per_sec': 0.0,
+                    'out_per_sec': 0.0
+                }
+                prev_swap = (previous or {}).get('swap', {})
+                elapsed = timestamp - (previous or {}).get('timestamp', timestamp)
+                if elapsed > 0 and 'sin' in prev_swap:
+                    swap_info['in_per_sec'] = round(max(0, swap.sin - prev_swap['sin']) / elapsed, 1)
+                    swap_info['out_per_sec'] = round(max(0, swap.sout - prev_swap['sout']) / elapsed, 1)
+            except:
+                swap_info = {'error': 'Cannot access swap info'}
+            
             # Process count
             try:
                 process_count = len(psutil.pids())
             except:
                 process_count = 0
             
-            # GPU usage (if available)
-            gpu_usage = self._get_gpu_usage()
+            # GPU usage (if available); reuse the previous reading between GPU polls
+            gpu_usage = self._get_gpu_usage() if include_gpu else (previous or {}).get('gpu', [])
             
             return {
-                'timestamp': time.time(),
+                'timestamp': timestamp,
                 'cpu': {
                     'percent': round(cpu_percent, 1),
                     'per_core': [round(core, 1) for core in cpu_per_core],
                     'cores': len(cpu_per_core)
                 },
                 'memory': {
-                    'total_gb': round(memory.total / (1024**3), 1),
-                    'available_gb': round(memory.available / (1024**3), 1),
+                    'total_gb': round(memory_total_gb, 1),
+                    'available_gb': round(memory_available_gb, 1),
                     'used_gb': round(memory_used_gb, 1),
                     'percent': round(memory_percent, 1)
                 },
+                'pressure': self.read_pressure(),
+                'swap': swap_info,
                 'disk': disk_info,
                 'network': network_info,
                 'processes': process_count,
@@ -376,11 +789,54 @@ class SystemResourceManager:
             }
     
     def _get_gpu_usage(self) -> List[Dict]:
-        """Get GPU usage information."""
+        """Get GPU usage information (no polling at all when no GPU was detected)."""
+        gpus = self.system_info.gpu_info if self.system_info else self._detect_gpu()
+        if not gpus:
+            return []
+        
+        gpu_usage = self._nvidia_usage() if any(gpu['type'] == 'NVIDIA' for gpu in gpus) else []
+        nvidia_polled = bool(gpu_usage)
+        
+        for gpu in gpus:
+            if gpu['type'] == 'NVIDIA' and nvidia_polled:
+                continue
+            index = len(gpu_usage)
+            device = gpu.get('device')
+            if device:
+                # amdgpu/i915 expose utilization, VRAM and temperature as plain files
+                hwmon = os.path.join(device, "hwmon")
+                try:
+                    sensors = sorted(os.listdir(hwmon))
+                except OSError:
+                    sensors = []
+                temperature = next((t for t in (_read_number(os.path.join(hwmon, name, "temp1_input"))
+                                                 for name in sensors) if t is not None), 0)
+                gpu_usage.append({
+                    'index': index,
+                    'name': gpu['name'],
+                    'utilization_percent': _read_number(os.path.join(device, "gpu_busy_percent")) or 0,
+                    'memory_used_mb': (_read_number(os.path.join(device, "mem_info_vram_used")) or 0) / (1024**2),
+                    'memory_total_mb': gpu['total_memory_mb'],
+                    'temperature_c': temperature / 1000
+                })
+            else:
+                gpu_usage.append({
+                    'index': index,
+                    'name': gpu.get('name', 'Unknown GPU'),
+                    'utilization_percent': 0,  # Cannot get real-time usage without nvidia-smi
+                    'memory_used_mb': 0,
+                    'memory_total_mb': gpu.get('total_memory_mb', 0),
+                    'temperature_c': 0,
+                    'note': 'Real-time usage unavailable'
+                })
+        
+        return gpu_usage
+    
+    def _nvidia_usage(self) -> List[Dict]:
+        """Per-GPU utilization from ``nvidia-smi`` ([] if it isn't available)."""
         gpu_usage = []
         
         try:
-            # Try nvidia-smi for NVIDIA GPUs
             result = subprocess.run([
                 'nvidia-smi', 
                 '--query-gpu=index,name,utilization.gpu,memory.used,memory.total,temperature.gpu',
@@ -408,21 +864,411 @@ class SystemResourceManager:
             # nvidia-smi not available or failed
             pass
         
-        # If no NVIDIA GPUs found, try other methods or return basic info
-        if not gpu_usage and self.system_info and self.system_info.gpu_info:
-            for i, gpu in enumerate(self.system_info.gpu_info):
-                gpu_usage.append({
-                    'index': i,
-                    'name': gpu.get('name', 'Unknown GPU'),
-                    'utilization_percent': 0,  # Cannot get real-time usage without nvidia-smi
-                    'memory_used_mb': 0,
-                    'memory_total_mb': gpu.get('memory_gb', 0) * 1024,
-                    'temperature_c': 0,
-                    'note': 'Real-time usage unavailable'
-                })
-        
         return gpu_usage
 
 
+class _SeriesTier:
+    """Fixed-capacity, array-backed ring of points at one resolution."""
+    
+    def __init__(self, resolution: int, capacity: int, fields: Tuple[str, ...], model_slots: int):
+        self.resolution = resolution
+        self.capacity = capacity
+        self.fields = fields
+        self.timestamps = array('d', bytes(8 * capacity))
+        self.values = {name: array('f', bytes(4 * capacity)) for name in fields}
+        self.model_slots = model_slots
+        self.inflight: Dict[str, array] = {}
+        self.head = 0
+        self.count = 0
+        # Pending bucket being accumulated for the current time slot
+        self.bucket_id = None
+        self.bucket_sums = dict.fromkeys(fields, 0.0)
+        self.bucket_samples = 0
+        self.bucket_inflight: Dict[str, int] = {}
+    
+    def add(self, timestamp: float, values: Dict[str, float], inflight: Dict[str, int]):
+        bucket_id = int(timestamp // self.resolution)
+        if self.bucket_id is not None and bucket_id != self.bucket_id:
+            self._flush()
+        self.bucket_id = bucket_id
+        for name in self.fields:
+            self.bucket_sums[name] += values.get(name, 0.0)
+        self.bucket_samples += 1
+        for model, count in inflight.items():
+            # Peak concurrency within the bucket
+            self.bucket_inflight[model] = max(self.bucket_inflight.get(model, 0), count)
+    
+    def _flush(self):
+        if not self.bucket_samples:
+            return
+        slot = self.head
+        self.timestamps[slot] = self.bucket_id * self.resolution
+        for name in self.fields:
+            self.values[name][slot] = self.bucket_sums[name] / self.bucket_samples
+        for series in self.inflight.values():
+            series[slot] = 0
+        for model, count in self.bucket_inflight.items():
+            series = self._model_series(model)
+            series[slot] = min(count, 0xFFFF)
+        self.head = (self.head + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+        self.bucket_sums = dict.fromkeys(self.fields, 0.0)
+        self.bucket_samples = 0
+        self.bucket_inflight = {}
+    
+    def _model_series(self, model: str) -> array:
+        series = self.inflight.get(model)
+        if series is None:
+            if len(self.inflight) >= self.model_slots:
+                model = ResourceTimeSeries.OTHER_MODELS
+                series = self.inflight.get(model)
+            if series is None:
+                series = array('H', bytes(2 * self.capacity))
+                self.inflight[model] = series
+        return series
+    
+    def span_seconds(self) -> int:
+        return self.resolution * self.capacity
+    
+    def export(self, since: float) -> Dict:
+        """Points newer than ``since`` in chronological order."""
+        start = (self.head - self.count) % self.capacity
+        slots = [(start + i) % self.capacity for i in range(self.count)]
+        slots = [slot for slot in slots if self.timestamps[slot] >= since]
+        models = {
+            model: [series[slot] for slot in slots]
+            for model, series in self.inflight.items()
+        }
+        return {
+            'resolution': self.resolution,
+            'timestamps': [self.timestamps[slot] for slot in slots],
+            'series': {name: [round(self.values[name][slot], 2) for slot in slots] for name in self.fields},
+            'inflight': {model: counts for model, counts in models.items() if any(counts)}
+        }
+
+
+class ResourceTimeSeries:
+    """Resource history at 1s resolution with 10s and 1min rollups.
+    
+    Every tier is a preallocated ring (``array`` storage), so total memory is
+    fixed regardless of uptime. Per-model in-flight counts share the same rings
+    with a cap on distinct models; query start/end markers are kept in a
+    bounded deque alongside.
+    """
+    
+    FIELDS = ('cpu_percent', 'memory_percent', 'net_sent_per_sec', 'net_recv_per_sec', 'inflight_total')
+    OTHER_MODELS = '(other)'
+    
+    def __init__(self, tiers: Tuple[Tuple[int, int], ...] = ((1, 600), (10, 360), (60, 1440)),
+                 model_slots: int = 16, max_markers: int = 512):
+        self.tiers = [_SeriesTier(resolution, capacity, self.FIELDS, model_slots) for resolution, capacity in tiers]
+        self.markers = deque(maxlen=max_markers)
+        self._inflight: Dict[str, int] = {}
+        self._lock = threading.Lock()
+    
+    def record(self, usage: Dict):
+        """Add one usage sample (sampler listener)."""
+        if 'error' in usage:
+            return
+        network = usage.get('network', {})
+        with self._lock:
+            inflight = dict(self._inflight)
+            values = {
+                'cpu_percent': usage['cpu']['percent'],
+                'memory_percent': usage['memory']['percent'],
+                'net_sent_per_sec': network.get('sent_per_sec', 0.0),
+                'net_recv_per_sec': network.get('recv_per_sec', 0.0),
+                'inflight_total': float(sum(inflight.values()))
+            }
+            for tier in self.tiers:
+                tier.add(usage['timestamp'], values, inflight)
+    
+    @contextmanager
+    def track_model(self, model_name: str):
+        """Count a model request as in flight for the duration of the block."""
+        with self._lock:
+            self._inflight[model_name] = self._inflight.get(model_name, 0) + 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                remaining = self._inflight.get(model_name, 1) - 1
+                if remaining > 0:
+                    self._inflight[model_name] = remaining
+                else:
+                    self._inflight.pop(model_name, None)
+    
+    def inflight_counts(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._inflight)
+    
+    def mark(self, kind: str, label: str = "", **details):
+        """Annotate the timeline, e.g. ``mark('query_start', 'llama3, mistral')``."""
+        self.markers.append({'timestamp': time.time(), 'kind': kind, 'label': label, **details})
+    
+    def history(self, window: float = 300) -> Dict:
+        """Series covering the last ``window`` seconds at the finest tier that spans it."""
+        window = max(1.0, float(window))
+        tier = next((t for t in self.tiers if t.span_seconds() >= window), self.tiers[-1])
+        since = time.time() - window
+        with self._lock:
+            data = tier.export(since)
+        data['window'] = window
+        data['markers'] = [marker for marker in list(self.markers) if marker['timestamp'] >= since]
+        return data
+
+
+class FootprintLearner:
+    """Exponentially-weighted memory footprints observed per model and context size.
+    
+    Persisted as JSON (by default next to this module, whatever the working
+    directory) so estimates survive restarts. A footprint is only used
+    once it has ``min_samples`` observations.
+    """
+    
+    def __init__(self, path: Optional[str] = DEFAULT_FOOTPRINT_PATH, alpha: float = 0.3, min_samples: int = 3):
+        self.path = path
+        self.alpha = alpha
+        self.min_samples = min_samples
+        self.footprints: Dict[str, Dict[str, Dict]] = {}
+        self._lock = threading.Lock()
+        self._load()
+    
+    def observe(self, model_name: str, num_ctx: int, peak_gb: float):
+        """Fold one observed peak (GB) into the model's estimate for ``num_ctx``."""
+        with self._lock:
+            by_ctx = self.footprints.setdefault(model_name, {})
+            stats = by_ctx.get(str(num_ctx))
+            if stats is None:
+                stats = {'ewma_gb': peak_gb, 'max_gb': peak_gb, 'samples': 0}
+                by_ctx[str(num_ctx)] = stats
+            else:
+                stats['ewma_gb'] = self.alpha * peak_gb + (1 - self.alpha) * stats['ewma_gb']
+                stats['max_gb'] = max(stats['max_gb'], peak_gb)
+            stats['samples'] += 1
+            stats['updated'] = time.time()
+            self._save()
+    
+    def lookup(self, model_name: str, num_ctx: int) -> Optional[Tuple[float, int]]:
+        """Best learned (footprint_gb, observed_ctx) for a model, preferring the closest context size."""
+        by_ctx = self.footprints.get(model_name, {})
+        candidates = [
+            (abs(int(ctx) - num_ctx), int(ctx), stats)
+            for ctx, stats in list(by_ctx.items())
+            if stats['samples'] >= self.min_samples
+        ]
+        if not candidates:
+            return None
+        _, ctx, stats = min(candidates, key=lambda c: c[0])
+        return round(stats['ewma_gb'], 2), ctx
+    
+    def summary(self) -> Dict:
+        with self._lock:
+            return json.loads(json.dumps(self.footprints))
+    
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r') as f:
+                self.footprints = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️  Ignoring unreadable footprint cache: {e}")
+    
+    def _save(self):
+        if not self.path:
+            return
+        try:
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(self.footprints, f, indent=2)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"⚠️  Could not persist model footprints: {e}")
+
+
+class RunnerFootprintTracker:
+    """Attributes Ollama runner process RSS to the models being queried.
+    
+    Each runner's command line names its weights blob (``--model``) and
+    context size (``--ctx-size``). Blobs are mapped back to model tags through
+    Ollama's manifest files (a blob shared by aliases maps to every tag, and is
+    attributed to whichever of them is in flight); when that is not possible
+    and exactly one model is in flight, the runner is attributed to that model. The peak RSS seen while
+    a model is in flight is recorded when its requests finish. Manifests are
+    rescanned for an unknown blob at most every ``rescan_interval`` seconds.
+    """
+    
+    RUNNER_NAMES = ('ollama_llama_server', 'llama-server', 'ollama')
+    
+    def __init__(self, learner: FootprintLearner, timeseries: "ResourceTimeSeries", models_dir: Optional[str] = None,
+                 rescan_interval: float = 60.0):
+        self.learner = learner
+        self.timeseries = timeseries
+        self.models_dir = models_dir or os.environ.get('OLLAMA_MODELS') or os.path.expanduser('~/.ollama/models')
+        self.rescan_interval = rescan_interval
+        self.blob_index: Dict[str, Set[str]] = {}
+        self._last_scan: Optional[float] = None
+        self._peaks: Dict[str, Tuple[float, int]] = {}  # model -> (peak_gb, ctx)
+        self._previous_inflight = set()
+    
+    def sample(self, usage: Optional[Dict] = None):
+        """Sampler listener: update peaks and commit finished models."""
+        inflight = set(self.timeseries.inflight_counts())
+        if not inflight and not self._peaks:
+            self._previous_inflight = inflight
+            return
+        
+        if inflight:
+            for model, rss_gb, ctx in self._attribute(self.find_runners(), inflight):
+                peak_gb, _ = self._peaks.get(model, (0.0, ctx))
+                self._peaks[model] = (max(peak_gb, rss_gb), ctx)
+        
+        for model in (self._previous_inflight | set(self._peaks)) - inflight:
+            if model in self._peaks:
+                peak_gb, ctx = self._peaks.pop(model)
+                self.learner.observe(model, ctx, round(peak_gb, 3))
+        self._previous_inflight = inflight
+    
+    def find_runners(self) -> List[Dict]:
+        """Ollama runner processes with their blob, context size and RSS."""
+        runners = []
+        for proc in psutil.process_iter(['pid', 'name', 'cmdline', 'memory_info']):
+            try:
+                name = (proc.info['name'] or '').lower()
+                cmdline = proc.info['cmdline'] or []
+                if not any(name.startswith(runner) for runner in self.RUNNER_NAMES) or '--model' not in cmdline:
+                    continue
+                runners.append({
+                    'pid': proc.info['pid'],
+                    'blob': self._arg(cmdline, '--model'),
+                    'ctx': int(self._arg(cmdline, '--ctx-size') or DEFAULT_NUM_CTX),
+                    'rss_gb': proc.info['memory_info'].rss / (1024**3)
+                })
+            except (psutil.NoSuchProcess, psutil.AccessDenied, ValueError, TypeError):
+                continue
+        return runners
+    
+    def _attribute(self, runners: List[Dict], inflight: set) -> List[Tuple[str, float, int]]:
+        attributed = []
+        unresolved = []
+        for runner in runners:
+            tags = self.tags_for_blob(runner['blob'])
+            for model in sorted(tags & inflight):
+                attributed.append((model, runner['rss_gb'], runner['ctx']))
+            if not tags:
+                unresolved.append(runner)
+        if unresolved and len(inflight) == 1 and len(unresolved) == 1 and not attributed:
+            runner = unresolved[0]
+            attributed.append((next(iter(inflight)), runner['rss_gb'], runner['ctx']))
+        return attributed
+    
+    def tags_for_blob(self, blob_path: str) -> Set[str]:
+        """Every installed tag whose weights are ``blob_path`` (empty if unknown)."""
+        digest = os.path.basename(blob_path or '').replace('sha256-', 'sha256:')
+        now = time.time()
+        # A blob in no manifest (e.g. a deleted model still loaded) must not walk them every sample
+        if digest not in self.blob_index and (self._last_scan is None or now - self._last_scan >= self.rescan_interval):
+            self.blob_index = self.load_blob_index()
+            self._last_scan = now
+        return self.blob_index.get(digest, set())
+    
+    def load_blob_index(self) -> Dict[str, Set[str]]:
+        """Map model-layer blob digests to their tags by reading Ollama's manifests."""
+        index = {}
+        manifests_dir = os.path.join(self.models_dir, 'manifests')
+        for root, _, files in os.walk(manifests_dir):
+            for tag in files:
+                path = os.path.join(root, tag)
+                parts = os.path.relpath(path, manifests_dir).split(os.sep)
+                if len(parts) < 4:
+                    continue
+                host, namespace, model = parts[0], parts[1], parts[2]
+                if host == 'registry.ollama.ai':
+                    name = f"{model}:{tag}" if namespace == 'library' else f"{namespace}/{model}:{tag}"
+                else:
+                    name = f"{host}/{namespace}/{model}:{tag}"
+                try:
+                    with open(path, 'r') as f:
+                        manifest = json.load(f)
+                except (OSError, ValueError):
+                    continue
+                for layer in manifest.get('layers', []):
+                    if layer.get('mediaType', '').endswith('.model'):
+                        index.setdefault(layer['digest'], set()).add(name)
+        return index
+    
+    @staticmethod
+    def _arg(cmdline: List[str], flag: str) -> Optional[str]:
+        if flag in cmdline and cmdline.index(flag) + 1 < len(cmdline):
+            return cmdline[cmdline.index(flag) + 1]
+        return None
+
+
+class SystemUsageSampler:
+    """Background thread that samples system usage at a fixed interval.
+    
+    Request handlers read the latest snapshot instead of measuring CPU
+    themselves, so no handler ever sleeps inside ``psutil.cpu_percent``.
+    """
+    
+    def __init__(self, manager: SystemResourceManager, interval: float = 1.0, gpu_every: int = 5):
+        self.manager = manager
+        self.interval = max(0.1, interval)
+        self.gpu_every = max(1, gpu_every)  # GPU polling spawns a process; do it less often
+        self.listeners = []
+        self._latest = None
+        self._samples_taken = 0
+        self._stop = threading.Event()
+        self._thread = None
+    
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+    
+    def add_listener(self, listener):
+        """Register a callback invoked with every new sample (on the sampler thread)."""
+        self.listeners.append(listener)
+    
+    def start(self):
+        """Start sampling in the background (idempotent)."""
+        if self.running:
+            return
+        # Prime psutil's CPU counters so the first sample has a real interval behind it
+        psutil.cpu_percent(interval=None)
+        psutil.cpu_percent(interval=None, percpu=True)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="usage-sampler", daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        self._stop.set()
+    
+    def sample(self) -> Dict:
+        """Take one sample now and publish it as the latest snapshot."""
+        include_gpu = self._samples_taken % self.gpu_every == 0
+        usage = self.manager.collect_usage(include_gpu=include_gpu, previous=self._latest)
+        self._samples_taken += 1
+        self._latest = usage
+        for listener in list(self.listeners):
+            try:
+                listener(usage)
+            except Exception as e:
+                print(f"⚠️  Usage sampler listener failed: {e}")
+        return usage
+    
+    def latest(self) -> Dict:
+        """Latest sample with its age in seconds; samples once if nothing is cached yet."""
+        usage = self._latest or self.sample()
+        snapshot = dict(usage)
+        snapshot['sample_age'] = round(max(0.0, time.time() - usage.get('timestamp', time.time())), 2)
+        snapshot['sample_interval'] = self.interval
+        return snapshot
+    
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+
 # Global instance
 resource_manager = SystemResourceManager()
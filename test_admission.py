@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Test script for the query/debate admission queue (works offline).
+"""
+
+import sys
+import threading
+import time
+
+from admission import AdmissionQueue, AdmissionRejected
+
+
+def _blocking_job(started, release):
+    def job(name):
+        started.append(name)
+        release.wait(2)
+    return job
+
+
+def test_queue_reports_position_and_eta():
+    """Jobs beyond max_active wait in order and hear their position and ETA."""
+    started, release, events = [], threading.Event(), []
+    admission = AdmissionQueue(max_active=1, max_depth=5, per_session=5,
+                               on_queued=lambda ticket, position, eta: events.append((ticket.args[0], position, eta)))
+    job = _blocking_job(started, release)
+
+    admission.submit("s1", "query", job, args=("a",), estimate=10.0)
+    admission.submit("s2", "query", job, args=("b",), estimate=20.0)
+    admission.submit("s3", "debate", job, args=("c",), estimate=30.0)
+    time.sleep(0.05)
+
+    assert started == ["a"]
+    status = admission.status()
+    assert [(q['position'], q['kind']) for q in status['queued']] == [(1, 'query'), (2, 'debate')]
+    last = {name: (position, eta) for name, position, eta in events}
+    assert last["b"][0] == 1 and 9.0 < last["b"][1] <= 10.0
+    assert last["c"][0] == 2 and 29.0 < last["c"][1] <= 30.0
+
+    release.set()
+    deadline = time.time() + 2
+    while len(started) < 3 and time.time() < deadline:
+        time.sleep(0.01)
+    assert started == ["a", "b", "c"]
+
+
+def test_rejects_when_full_or_over_session_limit():
+    """Full queues and greedy sessions are rejected immediately with a retry hint."""
+    started, release = [], threading.Event()
+    admission = AdmissionQueue(max_active=1, max_depth=1, per_session=1)
+    job = _blocking_job(started, release)
+    try:
+        admission.submit("s1", "query", job, args=("a",), estimate=10.0)
+        try:
+            admission.submit("s1", "query", job, args=("b",))
+            assert False, "second job for the same session was admitted"
+        except AdmissionRejected as e:
+            assert e.reason == "session_limit" and 0 < e.retry_after <= 10.0
+
+        admission.submit("s2", "query", job, args=("c",), estimate=10.0)
+        try:
+            admission.submit("s3", "query", job, args=("d",))
+            assert False, "job admitted past max_depth"
+        except AdmissionRejected as e:
+            assert e.reason == "queue_full" and 10.0 < e.retry_after <= 20.0
+
+        assert admission.cancel("s2") == 1
+        assert admission.status()['stats'] == {'admitted': 1, 'queued': 1, 'rejected': 2, 'cancelled': 1}
+    finally:
+        release.set()
+
+
+def test_clients_can_only_cancel_their_own_jobs():
+    """A cancel request acts on the sender's session, whatever session_id it names."""
+    import unified_app as unified
+    from socket_rooms import RoomEmitter
+
+    cancelled = []
+    # The ASGI tests may have rebound the app's emitter to their server
+    emitter, unified.emitter = unified.emitter, RoomEmitter(unified.socketio, unified.emitter.topics)
+    cancel, unified.admission.cancel = unified.admission.cancel, lambda session_id, kind=None: cancelled.append(session_id)
+    try:
+        victim, attacker = unified.socketio.test_client(unified.app), unified.socketio.test_client(unified.app)
+        victim_sid = victim.get_received()[0]['args'][0]['session_id']
+        attacker_sid = attacker.get_received()[0]['args'][0]['session_id']
+        attacker.emit('cancel_query', {'session_id': victim_sid})
+        attacker.emit('cancel_debate', {'session_id': victim_sid})
+        victim.disconnect()
+        attacker.disconnect()
+    finally:
+        unified.emitter = emitter
+        unified.admission.cancel = cancel
+    assert cancelled[:2] == [attacker_sid, attacker_sid]
+
+def main():
+    """Main test function."""
+    tests = [
+        test_queue_reports_position_and_eta,
+        test_rejects_when_full_or_over_session_limit,
+        test_clients_can_only_cancel_their_own_jobs,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+
+    print("\n🎉 Admission tests passed!" if not failed else f"\n💥 {failed} admission test(s) failed!")
+    return 0 if not failed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
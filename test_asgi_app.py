@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Test script for the ASGI server mode of the unified app (works offline).
+"""
+
+import asyncio
+import json
+import sys
+import threading
+
+from asgi_app import AsyncServerBridge, WSGIBridge, application
+
+
+class RecordingServer:
+    """Stands in for an AsyncServer: records emits in the order they are sent."""
+
+    def __init__(self):
+        self.sent = []
+        self.manager = None
+
+    async def emit(self, event, data=None, to=None, namespace=None, callback=None, ignore_queue=False):
+        self.sent.append((event, data, to))
+
+
+async def _http_get(app, path, query=b''):
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {'type': 'http', 'method': 'GET', 'path': path, 'query_string': query,
+             'headers': [(b'host', b'localhost'), (b'accept', b'application/json')],
+             'server': ('localhost', 5000), 'client': ('127.0.0.1', 4000)}
+    await app(scope, receive, send)
+    start = next(m for m in messages if m['type'] == 'http.response.start')
+    body = b''.join(m.get('body', b'') for m in messages if m['type'] == 'http.response.body')
+    return start['status'], dict(start['headers']), body
+
+
+def test_flask_routes_are_served_over_asgi():
+    """Plain HTTP requests reach the unchanged Flask routes through the WSGI bridge."""
+    status, headers, body = asyncio.run(_http_get(application, '/api/admission'))
+    assert status == 200
+    assert headers[b'content-type'] == b'application/json'
+    assert json.loads(body)['success'] is True
+
+    status, _, _ = asyncio.run(_http_get(application, '/no-such-route'))
+    assert status == 404
+
+
+def test_wsgi_environ_from_scope():
+    """Query strings, content headers and repeated headers map onto the WSGI environ."""
+    environ = WSGIBridge.environ({
+        'method': 'POST', 'path': '/api/x', 'query_string': b'a=1',
+        'headers': [(b'content-type', b'application/json'), (b'content-length', b'2'),
+                    (b'x-tag', b'one'), (b'x-tag', b'two')]
+    }, b'{}')
+    assert environ['REQUEST_METHOD'] == 'POST' and environ['QUERY_STRING'] == 'a=1'
+    assert environ['CONTENT_TYPE'] == 'application/json' and environ['CONTENT_LENGTH'] == '2'
+    assert environ['HTTP_X_TAG'] == 'one,two'
+    assert environ['wsgi.input'].read() == b'{}'
+
+
+def test_bridge_emits_in_order_from_loop_and_threads():
+    """Emits on the server loop keep call order; emits from other threads are handed to the loop."""
+    async def scenario():
+        server = RecordingServer()
+        bridge = AsyncServerBridge(server)
+        bridge.loop = asyncio.get_running_loop()
+        for i in range(5):
+            bridge.emit('chunk_received', [0, str(i)], room='s1')
+        thread = threading.Thread(target=bridge.emit, args=('models_changed', {}), kwargs={'room': 'models'})
+        thread.start()
+        thread.join()
+        await asyncio.sleep(0.05)
+        return server.sent
+
+    sent = asyncio.run(scenario())
+    assert [data[1] for event, data, _ in sent if event == 'chunk_received'] == ["0", "1", "2", "3", "4"]
+    assert ('models_changed', {}, 'models') in sent
+
+
+def main():
+    """Main test function."""
+    tests = [
+        test_flask_routes_are_served_over_asgi,
+        test_wsgi_environ_from_scope,
+        test_bridge_emits_in_order_from_loop_and_threads,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+
+    print("\n🎉 ASGI app tests passed!" if not failed else f"\n💥 {failed} ASGI app test(s) failed!")
+    return 0 if not failed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Test script for the asset pipeline: extracted, hashed, precompressed page assets (works offline).
+"""
+
+import gzip
+import os
+import re
+import sys
+import tempfile
+
+from flask import Flask
+
+from asset_pipeline import AssetPipeline
+
+PAGE = """<!DOCTYPE html>
+<html>
+<head>
+    <script src="https://cdn.example/socket.io.js"></script>
+    <style>
+        body { color: {{ color }}; }
+        .padding { margin: 0; margin: 0; margin: 0; margin: 0; margin: 0; margin: 0; margin: 0; }
+    </style>
+</head>
+<body>
+    <div id="app"></div>
+    <script>
+        const app = document.getElementById('app');
+        app.textContent = 'ready ready ready ready ready ready ready ready ready ready ready';
+    </script>
+</body>
+</html>
+"""
+
+
+def _app(folder, pipeline):
+    with open(os.path.join(folder, 'page.html'), 'w') as f:
+        f.write(PAGE)
+    app = Flask(__name__, template_folder=folder)
+
+    @app.route('/')
+    def index():
+        return pipeline.page('page.html', color='red')
+
+    @app.route('/assets/<name>')
+    def asset(name):
+        return pipeline.asset(name)
+
+    return app
+
+
+def test_inline_blocks_become_hashed_assets():
+    """Inline CSS/JS move to content-hashed files; external scripts stay in the shell."""
+    with tempfile.TemporaryDirectory() as folder:
+        pipeline = AssetPipeline(asset_dir=os.path.join(folder, 'assets'))
+        client = _app(folder, pipeline).test_client()
+        html = client.get('/').get_data(as_text=True)
+
+        links = re.findall(r'/assets/([\w.]+)', html)
+        assert [os.path.splitext(name)[1] for name in links] == ['.css', '.js']
+        assert all(name.startswith('page.') for name in links)
+        assert '<style>' not in html and 'getElementById' not in html
+        assert 'https://cdn.example/socket.io.js' in html
+
+        css = client.get(f'/assets/{links[0]}')
+        assert css.headers['Cache-Control'] == 'public, max-age=31536000, immutable'
+        assert css.headers['Content-Type'].startswith('text/css')
+        # The template is rendered before extraction, so Jinja values land in the asset
+        assert 'color: red;' in css.get_data(as_text=True)
+        assert client.get('/assets/page.missing.js').status_code == 404
+
+        written = sorted(os.listdir(os.path.join(folder, 'assets')))
+        assert written == sorted(links + [name + '.gz' for name in links])
+
+
+def test_encoding_negotiation_and_revalidation():
+    """Gzip goes only to clients that accept it; the shell revalidates with a per-encoding ETag."""
+    with tempfile.TemporaryDirectory() as folder:
+        client = _app(folder, AssetPipeline(asset_dir=None)).test_client()
+        plain = client.get('/')
+        compressed = client.get('/', headers={'Accept-Encoding': 'gzip'})
+        assert 'Content-Encoding' not in plain.headers
+        assert compressed.headers['Content-Encoding'] == 'gzip'
+        assert compressed.headers['Vary'] == 'Accept-Encoding'
+        assert gzip.decompress(compressed.data) == plain.data
+        assert plain.headers['ETag'] != compressed.headers['ETag']
+        assert plain.headers['Cache-Control'] == 'no-cache'
+
+        again = client.get('/', headers={'Accept-Encoding': 'gzip', 'If-None-Match': compressed.headers['ETag']})
+        assert again.status_code == 304 and again.data == b''
+
+
+def test_edited_template_is_rebuilt_in_debug_mode():
+    """With template auto-reload on, an edited template yields a new shell and asset hash."""
+    with tempfile.TemporaryDirectory() as folder:
+        pipeline = AssetPipeline(asset_dir=None)
+        app = _app(folder, pipeline)
+        app.jinja_env.auto_reload = True
+        client = app.test_client()
+        before = re.findall(r'/assets/([\w.]+)', client.get('/').get_data(as_text=True))
+
+        path = os.path.join(folder, 'page.html')
+        with open(path, 'w') as f:
+            f.write(PAGE.replace('ready', 'steady'))
+        os.utime(path, (os.path.getatime(path), os.path.getmtime(path) + 5))
+        after = re.findall(r'/assets/([\w.]+)', client.get('/').get_data(as_text=True))
+        assert before[0] == after[0] and before[1] != after[1]
+        assert 'steady' in client.get(f'/assets/{after[1]}').get_data(as_text=True)
+
+
+def main():
+    """Main test function."""
+    tests = [
+        test_inline_blocks_become_hashed_assets,
+        test_encoding_negotiation_and_revalidation,
+        test_edited_template_is_rebuilt_in_debug_mode,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+
+    print("\n🎉 Asset pipeline tests passed!" if not failed else f"\n💥 {failed} asset pipeline test(s) failed!")
+    return 0 if not failed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
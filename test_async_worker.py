@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Test script for the shared async worker loop (works offline).
+"""
+
+import asyncio
+import sys
+import threading
+import time
+
+from admission import AdmissionQueue
+from async_worker import AsyncWorker
+
+
+def test_jobs_from_many_threads_share_one_loop():
+    """Coroutines submitted from any thread run on the same loop and thread."""
+    worker = AsyncWorker(name="test-worker")
+    seen = []
+
+    async def job():
+        seen.append((id(asyncio.get_running_loop()), threading.current_thread().name, worker.owns_current_loop()))
+        return len(seen)
+
+    try:
+        threads = [threading.Thread(target=lambda: worker.run(job(), timeout=2)) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(2)
+        assert len(seen) == 5
+        assert set(seen) == {(id(worker.loop), "test-worker", True)}
+        assert not worker.owns_current_loop()
+    finally:
+        worker.stop()
+    assert not worker.running
+
+
+def test_admission_runs_coroutine_jobs_on_worker():
+    """Admitted coroutine jobs run on the worker loop and free their slot when done."""
+    worker = AsyncWorker(name="admission-worker")
+    ran = threading.Event()
+
+    async def job(label):
+        await asyncio.sleep(0)
+        assert threading.current_thread().name == "admission-worker"
+        ran.set()
+
+    admission = AdmissionQueue(max_active=1, worker=worker)
+    try:
+        admission.submit("s1", "query", job, args=("a",))
+        assert ran.wait(2)
+        deadline = time.time() + 2
+        while admission.status()['active'] and time.time() < deadline:
+            time.sleep(0.01)
+        assert admission.status()['active'] == []
+    finally:
+        worker.stop()
+
+
+def main():
+    """Main test function."""
+    tests = [
+        test_jobs_from_many_threads_share_one_loop,
+        test_admission_runs_coroutine_jobs_on_worker,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+
+    print("\n🎉 Async worker tests passed!" if not failed else f"\n💥 {failed} async worker test(s) failed!")
+    return 0 if not failed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Test script for the worker-fleet broker, shared scheduler and sticky routing (works offline).
+"""
+
+import asyncio
+import pickle
+import socket
+import sys
+import threading
+import time
+
+from cluster import _HEADER, Broker, BrokerClient, BrokerManager, CatalogSync, RemoteScheduler, StickyProxy, parse_broker_url
+from model_catalog import CatalogRefresher, ModelCatalog
+from scheduler import set_job_context
+
+
+class BrokerThread:
+    """Runs a broker on a private loop in a daemon thread."""
+
+    def __init__(self, limit=2):
+        self.loop = asyncio.new_event_loop()
+        self.broker = Broker(limit=limit)
+        threading.Thread(target=self.loop.run_forever, daemon=True).start()
+        self.url = asyncio.run_coroutine_threadsafe(self.broker.start(), self.loop).result(5)
+
+    def call(self, fn):
+        """Run ``fn`` on the broker loop and return its result."""
+        async def wrapper():
+            return fn()
+        return asyncio.run_coroutine_threadsafe(wrapper(), self.loop).result(5)
+
+
+def _wait_for(predicate, timeout=2.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_pubsub_and_values():
+    """Published messages reach every other subscriber; values are shared."""
+    broker = BrokerThread()
+    first, second = BrokerClient(broker.url), BrokerClient(broker.url)
+    received = {'first': [], 'second': []}
+    first.subscribe('news', received['first'].append)
+    second.subscribe('news', received['second'].append)
+    for client in (first, second):
+        client.get('missing')  # round trip: the subscription is registered
+
+    first.publish('news', {'n': 1})
+    assert _wait_for(lambda: received['second'] == [{'n': 1}])
+    assert received['first'] == []
+
+    second.set('leader', 0)
+    assert first.get('leader') == 0
+
+
+class _Payload:
+    def __reduce__(self):
+        return (exec, ("import builtins; builtins.cluster_pwned = True",))
+
+
+def test_frames_are_data_only():
+    """Bytes survive the JSON framing; a pickled frame is dropped, never executed."""
+    import builtins
+    broker = BrokerThread()
+    first, second = BrokerClient(broker.url), BrokerClient(broker.url)
+    received = []
+    second.subscribe('blobs', received.append)
+    second.get('missing')
+    first.publish('blobs', {'event': b'\x00\xffdeflated', 'parts': [b'a', 'b']})
+    assert _wait_for(lambda: received == [{'event': b'\x00\xffdeflated', 'parts': [b'a', 'b']}])
+
+    body = pickle.dumps({'op': 'set', 'key': 'k', 'value': _Payload()})
+    with socket.create_connection(parse_broker_url(broker.url)) as sock:
+        sock.sendall(_HEADER.pack(len(body)) + body)
+        time.sleep(0.1)
+    assert not getattr(builtins, 'cluster_pwned', False)
+    assert first.get('k') is None
+
+
+def test_socketio_manager_relays_between_workers():
+    """One worker's Socket.IO message-queue traffic arrives at the other's listener."""
+    broker = BrokerThread()
+    sender = BrokerManager(BrokerClient(broker.url))
+    receiver = BrokerManager(BrokerClient(broker.url))
+    receiver.client.get('sync')
+
+    message = {'method': 'emit', 'event': 'chunk_received', 'data': [[0, "Hi"]], 'room': 'sid-1',
+               'host_id': sender.host_id}
+    sender._publish(message)
+    assert next(receiver._listen()) == message
+
+
+def test_fleet_shares_one_fair_scheduler():
+    """Slots are granted across workers by the broker; cancelled and orphaned requests free up."""
+    broker = BrokerThread(limit=1)
+    first = RemoteScheduler(BrokerClient(broker.url))
+    second_client = BrokerClient(broker.url)
+    second = RemoteScheduler(second_client, resizable=False)
+
+    async def scenario():
+        set_job_context("alice", "interactive")
+        await first.acquire(2.0)
+        waiter = asyncio.ensure_future(second.acquire(2.0))
+        await asyncio.sleep(0.1)
+        assert not waiter.done()
+        assert broker.call(lambda: broker.broker.scheduler.waiting) == 1
+
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        await asyncio.sleep(0.1)
+        assert broker.call(lambda: broker.broker.scheduler.waiting) == 0
+
+        first.release()
+        await asyncio.wait_for(second.acquire(2.0), 2)
+        assert second.in_use == 1 and second.limit == 1
+
+    asyncio.run(scenario())
+
+    # A worker that dies while holding a slot gives it back
+    second_client.close()
+    assert _wait_for(lambda: broker.call(lambda: broker.broker.scheduler.in_use) == 0)
+
+    second.resize(4)
+    first.resize(3)
+    assert _wait_for(lambda: broker.call(lambda: broker.broker.scheduler.limit) == 3)
+    assert first.status()['limit'] == 3 and first.status()['workers'] == 1
+
+
+def test_catalog_changes_reach_other_workers():
+    """A change seen by one worker's refresher is ingested by the others, listeners included."""
+    broker = BrokerThread()
+    tags = {'models': [{'name': "llama3:8b", 'digest': "abc", 'size': 4_000_000_000}]}
+    workers = []
+    for _ in range(2):
+        catalog = ModelCatalog([], cache_path=None)
+        refresher = CatalogRefresher(catalog, fetch=lambda catalog=catalog: catalog.ingest(tags, persist=False))
+        client = BrokerClient(broker.url)
+        CatalogSync(client, catalog, refresher)
+        client.get('sync')  # round trip: the subscription is registered
+        diffs = []
+        refresher.add_listener(diffs.append)
+        workers.append((catalog, refresher, diffs))
+    (origin, origin_refresher, origin_diffs), (other, _, other_diffs) = workers
+
+    origin_refresher.revalidate()
+    assert origin_diffs and origin_diffs[0]['added'] == ["llama3:8b"]
+    assert _wait_for(lambda: other.snapshot.version == origin.snapshot.version)
+    assert other.snapshot.source == "cluster"
+    assert _wait_for(lambda: len(other_diffs) == 1 and other_diffs[0]['added'] == ["llama3:8b"])
+
+
+def test_sticky_routing():
+    """New WebSocket sessions go to the least busy worker; everything else sticks by client IP."""
+    proxy = StickyProxy([('127.0.0.1', 5001), ('127.0.0.1', 5002), ('127.0.0.1', 5003)])
+    proxy.connections = [3, 0, 1]
+    assert proxy.route(b"GET /socket.io/?EIO=4&transport=websocket HTTP/1.1\r\n", "10.0.0.1") == 1
+
+    polling = b"GET /socket.io/?EIO=4&transport=polling&t=abc HTTP/1.1\r\n"
+    upgrade = b"GET /socket.io/?EIO=4&transport=websocket&sid=XyZ HTTP/1.1\r\n"
+    page = b"GET /api/models HTTP/1.1\r\n"
+    for client_ip in ("10.0.0.1", "10.0.0.2", "192.168.1.20"):
+        routes = {proxy.route(line, client_ip) for line in (polling, upgrade, page)}
+        assert len(routes) == 1
+
+
+def main():
+    """Main test function."""
+    tests = [
+        test_pubsub_and_values,
+        test_frames_are_data_only,
+        test_socketio_manager_relays_between_workers,
+        test_fleet_shares_one_fair_scheduler,
+        test_catalog_changes_reach_other_workers,
+        test_sticky_routing,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+
+    print("\n🎉 Cluster tests passed!" if not failed else f"\n💥 {failed} cluster test(s) failed!")
+    return 0 if not failed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
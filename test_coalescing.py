@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Test script for streamed-chunk coalescing and adaptive flushing (works offline).
+"""
+
+import asyncio
+import sys
+
+from coalescing import ChunkCoalescer, FrameStats
+
+
+def test_chunks_flush_on_size_window_and_completion():
+    """Tokens leave as few frames: when the buffer fills, the window expires or the model finishes."""
+    async def scenario():
+        frames, stats = [], FrameStats()
+        coalescer = ChunkCoalescer(lambda model, text: frames.append((model, text)),
+                                   min_window=0.05, max_bytes=8, stats=stats)
+        for token in ["He", "llo", " wor"]:
+            coalescer.add("a", token)
+        coalescer.add("b", "x")
+        assert frames == [("a", "Hello wor")]
+
+        coalescer.add("a", "ld")
+        await asyncio.sleep(0.1)
+        assert sorted(frames[1:]) == [("a", "ld"), ("b", "x")]
+
+        coalescer.add("a", "!")
+        coalescer.finish("a")
+        coalescer.finish("b")
+        assert frames[-1] == ("a", "!")
+        return stats.snapshot()
+
+    snapshot = asyncio.run(scenario())
+    assert snapshot['chunks'] == 6 and snapshot['frames'] == 4
+    assert snapshot['tokens_per_frame'] == 1.5
+    assert snapshot['active_streams'] == 0
+
+
+def test_window_adapts_to_rtt_and_load():
+    """The window tracks half the client RTT, grows with active streams and is capped."""
+    stats = FrameStats()
+    rtt = {'value': None}
+    coalescer = ChunkCoalescer(lambda model, text: None, min_window=0.02, max_window=0.25,
+                               rtt=lambda: rtt['value'], stats=stats)
+    assert coalescer.window == 0.02
+
+    rtt['value'] = 0.1
+    assert coalescer.window == 0.05
+
+    for stream in range(6):
+        stats.stream_started(stream)
+    assert abs(coalescer.window - 0.15) < 1e-9
+
+    rtt['value'] = 1.0
+    assert coalescer.window == 0.25
+
+
+def test_cancelled_streams_are_closed():
+    """Streams cancelled mid-flight stop counting as active once their coalescer is closed."""
+    async def stream(coalescer, model):
+        try:
+            coalescer.add(model, "partial")
+            await asyncio.sleep(30)
+            coalescer.finish(model)
+        finally:
+            coalescer.close()
+
+    async def scenario(stats, frames):
+        coalescers = [ChunkCoalescer(lambda model, text: frames.append(text), stats=stats) for _ in range(6)]
+        tasks = [asyncio.create_task(stream(c, "m")) for c in coalescers]
+        await asyncio.sleep(0.005)
+        assert stats.active_streams == 6
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await asyncio.sleep(0.05)
+
+    stats, frames = FrameStats(), []
+    asyncio.run(scenario(stats, frames))
+    assert stats.active_streams == 0 and frames == []
+    assert ChunkCoalescer(lambda model, text: None, stats=stats).window == 0.02
+
+
+def test_disabled_coalescer_emits_every_chunk():
+    """With coalescing off each chunk is its own frame, even outside an event loop."""
+    frames = []
+    coalescer = ChunkCoalescer(lambda model, text: frames.append(text), enabled=False, stats=FrameStats())
+    for token in "abc":
+        coalescer.add("m", token)
+    assert frames == ["a", "b", "c"]
+
+
+def main():
+    """Main test function."""
+    tests = [
+        test_chunks_flush_on_size_window_and_completion,
+        test_window_adapts_to_rtt_and_load,
+        test_cancelled_streams_are_closed,
+        test_disabled_coalescer_emits_every_chunk,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+
+    print("\n🎉 Coalescing tests passed!" if not failed else f"\n💥 {failed} coalescing test(s) failed!")
+    return 0 if not failed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Test script for the resizable query slots and AIMD concurrency controller (works offline).
+"""
+
+import asyncio
+import sys
+import threading
+import time
+
+from concurrency import ResizableSemaphore, AIMDController, PerformanceRegistry
+
+
+def test_semaphore_resizes_across_event_loops():
+    """Holders on different loops share the limit; growing it wakes a waiter."""
+    slots = ResizableSemaphore(1)
+    acquired = threading.Event()
+    release = threading.Event()
+    order = []
+
+    async def hold():
+        async with slots:
+            order.append("first")
+            acquired.set()
+            await asyncio.get_running_loop().run_in_executor(None, release.wait)
+
+    async def wait_for_slot():
+        async with slots:
+            order.append("second")
+
+    holder = threading.Thread(target=lambda: asyncio.run(hold()))
+    holder.start()
+    acquired.wait(2)
+    waiter = threading.Thread(target=lambda: asyncio.run(wait_for_slot()))
+    waiter.start()
+    time.sleep(0.1)
+    assert slots.waiting == 1
+
+    slots.resize(2)
+    waiter.join(2)
+    assert order == ["first", "second"]
+    release.set()
+    holder.join(2)
+    assert slots.in_use == 0
+
+
+def test_semaphore_cancelled_waiter_frees_queue():
+    """Cancelling a waiting acquire removes it without leaking a slot."""
+    async def scenario():
+        slots = ResizableSemaphore(1)
+        await slots.acquire()
+        pending = asyncio.ensure_future(slots.acquire())
+        await asyncio.sleep(0)
+        pending.cancel()
+        await asyncio.gather(pending, return_exceptions=True)
+        slots.release()
+        return slots.in_use, slots.waiting
+
+    assert asyncio.run(scenario()) == (0, 0)
+
+
+def _controller(limit=2, **kwargs):
+    slots = ResizableSemaphore(limit)
+    return AIMDController(slots, max_limit=8, window=10.0, **kwargs), slots
+
+
+def test_controller_increases_while_throughput_improves():
+    """Saturated slots with rising tokens/s grow the limit by one; a plateau holds it."""
+    controller, _ = _controller()
+    start = controller._window_start
+
+    controller.record(100, 0.5, 5.0)
+    controller._saturated = True
+    assert controller.evaluate(start + 10)['action'] == 'increase'
+    assert controller.limit == 3
+
+    controller.record(200, 0.5, 5.0)
+    controller._saturated = True
+    assert controller.evaluate(start + 20)['action'] == 'increase'
+
+    controller.record(200, 0.5, 5.0)
+    controller._saturated = True
+    decision = controller.evaluate(start + 30)
+    assert decision['action'] == 'hold' and decision['reason'] == "throughput plateau"
+    assert controller.limit == 4
+
+
+def test_controller_cuts_on_latency_and_swap():
+    """TTFT spikes and swap traffic halve the limit, and decisions are logged."""
+    class Timeline:
+        def __init__(self):
+            self.marks = []
+
+        def mark(self, kind, label="", **details):
+            self.marks.append((kind, label))
+
+    timeline = Timeline()
+    controller, slots = _controller(limit=8, timeline=timeline)
+    start = controller._window_start
+
+    controller.record(100, 0.5, 5.0)
+    controller.evaluate(start + 10)
+    controller.record(100, 2.0, 5.0)
+    decision = controller.evaluate(start + 20)
+    assert decision['action'] == 'decrease' and "TTFT" in decision['reason']
+    assert slots.limit == 4
+
+    controller.on_usage({'timestamp': start + 30, 'memory': {'available_gb': 8.0},
+                         'swap': {'in_per_sec': 5 * 1024**2, 'out_per_sec': 0.0}})
+    assert controller.decisions[-1]['action'] == 'decrease'
+    assert "swapping" in controller.decisions[-1]['reason']
+    assert slots.limit == 2
+    assert timeline.marks == [('concurrency', "8 → 4"), ('concurrency', "4 → 2")]
+    assert len(controller.status()['decisions']) == 3
+
+
+def test_timeouts_are_flagged_for_the_controller():
+    """Requests that hit request_timeout carry timed_out; other errors never count as timeouts."""
+    from models import ConfigManager, ModelResponse, OllamaModelManager
+
+    async def scenario():
+        # A server that accepts connections and never answers
+        server = await asyncio.start_server(lambda reader, writer: None, '127.0.0.1', 0)
+        config = ConfigManager()
+        config.config = {"ollama_url": f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}",
+                         "request_timeout": 0.2, "pressure_max_wait": 0, "catalog_cache_path": None}
+        manager = OllamaModelManager(config)
+        recorded = []
+        manager.concurrency.record = lambda tokens, ttft, duration, timed_out=False: recorded.append(timed_out)
+        try:
+            result = await manager.query_model("slow:latest", "hi")
+            streamed = await manager.query_model_streaming("slow:latest", "hi")
+        finally:
+            server.close()
+        manager._record_completion(ModelResponse("m", "", 1.0, error="Timeout parsing model reply"))
+        return result, streamed, recorded
+
+    result, streamed, recorded = asyncio.run(scenario())
+    assert result.timed_out and streamed.timed_out
+    assert recorded == [True, True, False]
+
+
+def test_performance_registry_estimates():
+    """Per-model averages drive parallel and sequential time estimates."""
+    registry = PerformanceRegistry(alpha=0.5, default_seconds=30.0)
+    assert registry.expected_time("unknown") == 30.0
+
+    registry.record("fast", 2.0, tokens=100, ttft=0.2)
+    registry.record("fast", 4.0, tokens=100, ttft=0.4)
+    registry.record("slow", 12.0)
+    registry.record("slow", 99.0, ok=False)
+    assert registry.expected_time("fast") == 3.0
+    assert registry.expected_time("new") == 7.5
+    assert registry.estimate_parallel(["fast", "slow"], concurrency=2) == 12.0
+    assert registry.estimate_parallel(["fast", "fast", "fast", "fast"], concurrency=2) == 6.0
+    assert registry.estimate_sequential(["fast", "slow"], repeats=2) == 30.0
+    assert registry.summary()["slow"]["errors"] == 1
+
+
+def main():
+    """Main test function."""
+    tests = [
+        test_semaphore_resizes_across_event_loops,
+        test_semaphore_cancelled_waiter_frees_queue,
+        test_controller_increases_while_throughput_improves,
+        test_controller_cuts_on_latency_and_swap,
+        test_timeouts_are_flagged_for_the_controller,
+        test_performance_registry_estimates,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+
+    print("\n🎉 Concurrency tests passed!" if not failed else f"\n💥 {failed} concurrency test(s) failed!")
+    return 0 if not failed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
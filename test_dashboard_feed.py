@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Test script for the per-widget dashboard feed (works offline).
+"""
+
+import copy
+import sys
+import time
+
+from dashboard_feed import DashboardFeed, diff_fields
+
+
+class Recorder:
+    """Collects the feed's emits as (target, payload) pairs."""
+
+    def __init__(self):
+        self.sent = []
+
+    def to_topic(self, event, data, topic):
+        self.sent.append((topic, data))
+
+    def to_session(self, event, data, session_id):
+        self.sent.append((session_id, data))
+
+    def take(self):
+        sent, self.sent = self.sent, []
+        return sent
+
+
+def _feed(values, intervals=None):
+    recorder = Recorder()
+    computes = {name: (lambda name=name: copy.deepcopy(values[name])) for name in values}
+    feed = DashboardFeed(computes, recorder.to_topic, recorder.to_session, intervals=intervals)
+    return feed, recorder
+
+
+def test_diff_fields():
+    """Only changed fields are kept, nested dicts are diffed, and removed keys force a snapshot."""
+    old = {'price': 1, 'stocks': {'AAPL': {'price': '1.00'}, 'MSFT': {'price': '2.00'}}}
+    new = {'price': 1, 'stocks': {'AAPL': {'price': '1.10'}, 'MSFT': {'price': '2.00'}}}
+    assert diff_fields(old, new) == {'stocks': {'AAPL': {'price': '1.10'}}}
+    assert diff_fields(new, new) == {}
+    assert diff_fields(old, {'price': 1}) is None
+
+
+def test_nothing_is_computed_without_subscribers():
+    """The updater idles with no subscribers; each widget is computed only while watched."""
+    feed, recorder = _feed({'time': {'time': '12:00'}, 'quote': {'text': 'Hi'}})
+    assert feed.tick(now=1e12) is None
+    assert all(widget.computes == 0 for widget in feed.widgets.values())
+
+    feed.subscribe('a', ['dashboard:time'])
+    assert feed.widgets['time'].computes == 1 and feed.widgets['quote'].computes == 0
+    assert feed.expand(['dashboard', 'models']) == ['dashboard:time', 'dashboard:quote', 'models']
+
+    feed.forget_session('a')
+    assert feed.tick() is None
+
+
+def test_subscribers_get_snapshot_then_deltas():
+    """A new subscriber gets a full snapshot; later changes reach the topic as field deltas."""
+    values = {'time': {'time': '12:00', 'day': 'Monday'}}
+    feed, recorder = _feed(values, intervals={'time': 1.0})
+    feed.subscribe('a', ['dashboard:time'])
+    feed.subscribe('b', ['dashboard:time'])
+    (target_a, first), (target_b, second) = recorder.take()
+    assert (target_a, target_b) == ('a', 'b')
+    assert first['full'] and first['fields'] == values['time'] and second == first
+
+    # Unchanged values are not re-sent; a change goes once to the topic with only its fields
+    assert feed.tick(now=feed.widgets['time'].next_due) == 1.0
+    assert recorder.take() == []
+    values['time']['time'] = '12:01'
+    feed.tick(now=feed.widgets['time'].next_due)
+    [(target, delta)] = recorder.take()
+    assert target == 'dashboard:time'
+    assert delta == {'widget': 'time', 'version': delta['version'], 'base': first['version'],
+                     'full': False, 'fields': {'time': '12:01'}}
+
+
+def test_clients_at_different_versions_get_their_own_deltas():
+    """A reconnecting client sends its versions and receives only what changed since then."""
+    values = {'stocks': {'stocks': {'AAPL': {'price': '1.00'}, 'MSFT': {'price': '2.00'}}}}
+    feed, recorder = _feed(values)
+    feed.subscribe('a', ['dashboard:stocks'])
+    old_version = recorder.take()[0][1]['version']
+
+    values['stocks']['stocks']['MSFT'] = {'price': '2.50'}
+    feed.tick(now=feed.widgets['stocks'].next_due)
+    recorder.take()
+
+    # Client b had the first version before reconnecting: it gets a delta from there
+    feed.subscribe('b', ['dashboard:stocks'], versions={'stocks': old_version})
+    [(target, delta)] = recorder.take()
+    assert target == 'b' and not delta['full']
+    assert delta['fields'] == {'stocks': {'MSFT': {'price': '2.50'}}}
+
+    # An unknown version (e.g. from another worker) gets a full snapshot; a current one gets nothing
+    feed.subscribe('c', ['dashboard:stocks'], versions={'stocks': 'elsewhere.1'})
+    feed.subscribe('d', ['dashboard:stocks'], versions={'stocks': delta['version']})
+    [(target, snapshot)] = recorder.take()
+    assert target == 'c' and snapshot['full']
+    assert feed.stats()['widgets']['stocks']['subscribers'] == 4
+
+
+def test_bundle_serves_cached_widgets():
+    """A bundle recomputes only stale widgets and leaves out the ones the caller already has."""
+    values = {'time': {'time': '12:00'}, 'quote': {'text': 'Hi'}}
+    feed, recorder = _feed(values, intervals={'time': 1.0, 'quote': 3600.0})
+    start = time.time()
+    first = feed.bundle(now=start)
+    assert set(first['widgets']) == {'time', 'quote'} and first['unchanged'] == []
+    assert first['max_age'] == 1 and first['widgets']['quote']['max_age'] == 3600
+
+    # Within max-age nothing is recomputed; a caller holding both versions gets nothing back
+    again = feed.bundle(have=first['versions'], now=start + 0.5)
+    assert again['widgets'] == {} and sorted(again['unchanged']) == ['quote', 'time']
+    assert all(widget.computes == 1 for widget in feed.widgets.values())
+
+    # Once 'time' is stale it is recomputed and sent to its subscribers as well
+    feed.subscribe('a', ['dashboard:time'])
+    recorder.take()
+    values['time']['time'] = '12:01'
+    later = feed.bundle(have=first['versions'], now=start + 1.5)
+    assert list(later['widgets']) == ['time'] and later['unchanged'] == ['quote']
+    assert recorder.take() == [('dashboard:time', {
+        'widget': 'time', 'version': later['versions']['time'], 'base': first['versions']['time'],
+        'full': False, 'fields': {'time': '12:01'}})]
+
+
+def test_bundle_endpoint_is_conditional():
+    """/api/dashboard/bundle answers 304 only for a matching ETag; a client with every widget gets none."""
+    import unified_app as unified
+
+    client = unified.app.test_client()
+    response = client.get('/api/dashboard/bundle?widgets=quote,puzzle')
+    bundle = response.get_json()
+    assert response.status_code == 200 and set(bundle['widgets']) == {'quote', 'puzzle'}
+    assert 'max-age=' in response.headers['Cache-Control']
+
+    etag = response.headers['ETag']
+    assert client.get('/api/dashboard/bundle?widgets=quote,puzzle',
+                      headers={'If-None-Match': etag}).status_code == 304
+    have = ','.join(f"{name}:{version}" for name, version in bundle['versions'].items())
+    current = client.get(f'/api/dashboard/bundle?widgets=quote,puzzle&have={have}')
+    assert current.status_code == 200 and current.get_json()['widgets'] == {}
+    assert set(current.get_json()['unchanged']) == {'quote', 'puzzle'}
+    # A different have= set is a different body, so it carries a different ETag
+    assert current.headers['ETag'] != etag
+    assert client.get(f'/api/dashboard/bundle?widgets=quote,puzzle&have={have}',
+                      headers={'If-None-Match': current.headers['ETag']}).status_code == 304
+
+
+def test_unified_app_subscribe_sends_widget_snapshots():
+    """Subscribing to 'dashboard' joins every widget topic and delivers one snapshot each."""
+    import unified_app as unified
+    from socket_rooms import RoomEmitter
+
+    # The ASGI tests may have rebound the app's emitter to their server
+    emitter, unified.emitter = unified.emitter, RoomEmitter(unified.socketio, unified.emitter.topics)
+    try:
+        client = unified.socketio.test_client(unified.app)
+        client.get_received()
+        client.emit('subscribe', {'topics': ['dashboard']})
+        received = client.get_received()
+        client.disconnect()
+    finally:
+        unified.emitter = emitter
+    deltas = {p['args'][0]['widget']: p['args'][0] for p in received if p['name'] == 'dashboard_delta'}
+    subscribed = next(p['args'][0] for p in received if p['name'] == 'subscribed')
+    assert set(deltas) == set(unified.dashboard_feed.widgets)
+    assert set(subscribed['topics']) == {f"dashboard:{name}" for name in deltas}
+    assert all(delta['full'] for delta in deltas.values())
+    assert set(deltas['stocks']['fields']['stocks']) == set(unified.dashboard_provider.stocks)
+    assert unified.dashboard_feed.stats()['sessions'] == 0
+
+
+def main():
+    """Main test function."""
+    tests = [
+        test_diff_fields,
+        test_nothing_is_computed_without_subscribers,
+        test_subscribers_get_snapshot_then_deltas,
+        test_clients_at_different_versions_get_their_own_deltas,
+        test_bundle_serves_cached_widgets,
+        test_bundle_endpoint_is_conditional,
+        test_unified_app_subscribe_sends_widget_snapshots,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+
+    print("\n🎉 Dashboard feed tests passed!" if not failed else f"\n💥 {failed} dashboard feed test(s) failed!")
+    return 0 if not failed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Test script for memory-pressure model substitution (works offline).
+"""
+
+import sys
+
+from degradation import DegradationPolicy
+from model_catalog import ModelCatalog
+from system_resources import SystemResourceManager
+
+
+def _policy():
+    catalog = ModelCatalog(["codellama"], cache_path=None)
+    catalog.ingest({"models": [
+        {"name": "llama3.1:8b", "size": 8 * 1024**3, "digest": "a1",
+         "details": {"family": "llama", "parameter_size": "8.0B", "quantization_level": "Q8_0"}},
+        {"name": "llama3.1:8b-q4", "size": 4 * 1024**3, "digest": "a2",
+         "details": {"family": "llama", "parameter_size": "8.0B", "quantization_level": "Q4_K_M"}},
+        {"name": "llama3.1:latest", "size": 8 * 1024**3, "digest": "a1",
+         "details": {"family": "llama", "parameter_size": "8.0B", "quantization_level": "Q8_0"}},
+        {"name": "llama3.2:3b", "size": 2 * 1024**3, "digest": "b1",
+         "details": {"family": "llama", "parameter_size": "3.2B", "quantization_level": "Q4_K_M"}},
+        {"name": "codellama:7b", "size": 4 * 1024**3, "digest": "c1",
+         "details": {"family": "llama", "parameter_size": "7B", "quantization_level": "Q4_0"}},
+        {"name": "mistral:7b", "size": 4 * 1024**3, "digest": "e1",
+         "details": {"family": "llama", "parameter_size": "7.2B", "quantization_level": "Q4_0"}},
+        {"name": "tinyllama:latest", "size": 1 * 1024**3, "digest": "f1",
+         "details": {"family": "llama", "parameter_size": "1B", "quantization_level": "Q4_0"}},
+        {"name": "phi3:mini", "size": 2 * 1024**3, "digest": "d1",
+         "details": {"family": "phi3", "parameter_size": "3.8B", "quantization_level": "Q4_0"}},
+    ]})
+    manager = SystemResourceManager(footprint_path=None)
+    manager.attach_catalog(catalog)
+    manager.get_live_available_ram_gb = lambda: 100.0
+    return DegradationPolicy(manager, catalog), catalog
+
+
+def test_variants_exclude_aliases_and_prefer_same_line():
+    """Variants share the base name, never the same weights."""
+    _, catalog = _policy()
+    variants = [entry.name for entry in catalog.snapshot.variants_of("llama3.1:8b")]
+    assert variants == ["llama3.1:8b-q4"]
+
+
+def test_shared_family_is_not_a_variant():
+    """Unrelated models of the same architecture family are never swapped for each other."""
+    policy, catalog = _policy()
+    assert catalog.snapshot.variants_of("mistral:7b") == []
+    decision = policy.evaluate(["mistral:7b"], reason="memory pressure 30.0%")
+    assert decision.substitutions == {} and decision.deferred == ["mistral:7b"]
+
+
+def test_pressure_substitutes_smaller_variant_or_defers():
+    """Under pressure, same-line smaller weights are used; models with nothing smaller are deferred."""
+    policy, _ = _policy()
+    decision = policy.evaluate(["llama3.1:8b", "phi3:mini", "codellama:7b"], reason="memory pressure 30.0%")
+
+    assert decision.substitutions == {"llama3.1:8b": "llama3.1:8b-q4"}
+    assert decision.deferred == ["phi3:mini", "codellama:7b"]  # codellama won't fall back to a chat model
+    assert decision.served_by("phi3:mini") == "phi3:mini"
+    assert decision.to_dict()["reason"] == "memory pressure 30.0%"
+
+
+def test_no_pressure_is_a_no_op():
+    """Without pressure every model is served as requested."""
+    policy, _ = _policy()
+    policy.pressure_reason = lambda: None
+    decision = policy.evaluate(["llama3.1:8b"])
+    assert not decision.degraded and decision.reason is None
+
+
+def main():
+    """Main test function."""
+    tests = [
+        test_variants_exclude_aliases_and_prefer_same_line,
+        test_shared_family_is_not_a_variant,
+        test_pressure_substitutes_smaller_variant_or_defers,
+        test_no_pressure_is_a_no_op,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+
+    print("\n🎉 Degradation tests passed!" if not failed else f"\n💥 {failed} degradation test(s) failed!")
+    return 0 if not failed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
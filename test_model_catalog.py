@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Test script for the model catalog (works offline, no Ollama required).
+"""
+
+import os
+import sys
+import tempfile
+
+from model_catalog import ModelCatalog, CatalogRefresher, parameters_from_name, parse_parameter_size
+
+TAGS_PAYLOAD = {
+    "models": [
+        {"name": "llama3:latest", "size": 4661224676, "digest": "365c0bd3c000",
+         "details": {"family": "llama", "parameter_size": "8.0B", "quantization_level": "Q4_0"}},
+        {"name": "codellama:7b", "size": 3825819519, "digest": "8fdf8f752f6e",
+         "details": {"family": "llama", "parameter_size": "7B", "quantization_level": "Q4_0"}},
+        {"name": "qwen2.5:72b", "size": 47415724032, "digest": "424bad2cc13f",
+         "details": {"family": "qwen2", "parameter_size": "72.7B", "quantization_level": "Q4_K_M"}},
+        {"name": "mistral:custom", "size": 4113301824, "digest": "f974a74358d6", "details": {}},
+    ]
+}
+
+
+def test_name_parsing():
+    """Parameter counts are parsed from metadata and tags without false matches."""
+    assert parse_parameter_size("8.0B") == 8.0
+    assert abs(parse_parameter_size("137M") - 0.137) < 1e-9
+    assert parameters_from_name("llama3.1:70b") == 70.0
+    assert parameters_from_name("phi3:3.8b-mini-instruct") == 3.8
+    assert parameters_from_name("mixtral:8x7b") == 56.0
+    assert parameters_from_name("llama3.1-mmlu-finetune") == 0.0
+
+
+def test_snapshot_precomputes_facts():
+    """Ingesting tags precomputes coding, large and specialty facts per model."""
+    catalog = ModelCatalog(["codellama", "llama3"], cache_path=None)
+    snapshot = catalog.ingest(TAGS_PAYLOAD)
+
+    assert snapshot.names() == ["llama3:latest", "codellama:7b", "qwen2.5:72b", "mistral:custom"]
+    assert snapshot.get("qwen2.5:72b").is_large
+    assert not snapshot.get("llama3:latest").is_large
+    assert snapshot.coding_names() == ["llama3:latest", "codellama:7b"]
+    assert snapshot.get("codellama:7b").category == "💻 Coding & Development"
+    assert snapshot.get("llama3:latest").size_bytes == 4661224676
+
+    kept, excluded = snapshot.split_large(snapshot.names())
+    assert excluded == ["qwen2.5:72b"]
+    assert "qwen2.5:72b" not in kept
+
+
+def test_snapshot_is_swapped_not_mutated():
+    """A reader's snapshot is unaffected by later ingests."""
+    catalog = ModelCatalog([], cache_path=None)
+    first = catalog.ingest(TAGS_PAYLOAD)
+    second = catalog.ingest({"models": TAGS_PAYLOAD["models"][:1]})
+
+    assert len(first.entries) == 4
+    assert len(second.entries) == 1
+    assert catalog.snapshot is second
+    assert first.version != second.version
+
+
+def test_persisted_snapshot_loads_offline():
+    """A persisted catalog is available on the next startup without Ollama."""
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_path = os.path.join(tmp, "model_catalog.json")
+        ModelCatalog(["codellama"], cache_path=cache_path).ingest(TAGS_PAYLOAD)
+
+        restored = ModelCatalog(["codellama"], cache_path=cache_path).snapshot
+        assert restored.source == "cache"
+        assert restored.names() == [m["name"] for m in TAGS_PAYLOAD["models"]]
+        assert restored.get("codellama:7b").is_coding
+
+
+def test_refresher_notifies_on_change_only():
+    """The refresher reports a diff to listeners only when the installed set changes."""
+    catalog = ModelCatalog([], cache_path=None)
+    catalog.ingest(TAGS_PAYLOAD)
+    payloads = [TAGS_PAYLOAD, {"models": TAGS_PAYLOAD["models"][1:]}]
+    refresher = CatalogRefresher(catalog, fetch=lambda: catalog.ingest(payloads.pop(0)))
+    events = []
+    refresher.add_listener(events.append)
+
+    refresher.revalidate()
+    assert events == []
+
+    diff = refresher.revalidate()
+    assert diff["removed"] == ["llama3:latest"]
+    assert events == [diff]
+
+
+def test_refresher_reports_unreachable_ollama():
+    """A manager's refresher records the error when Ollama is down instead of a fallback list."""
+    from models import ConfigManager, OllamaModelManager
+
+    config = ConfigManager()
+    config.config = {"ollama_url": "http://127.0.0.1:9", "catalog_cache_path": None}
+    manager = OllamaModelManager(config)
+    manager.available_models = ["cached:latest"]
+    refresher = manager.get_refresher()
+    refresher.revalidate()
+    assert refresher.last_error is not None
+    assert manager.available_models == ["cached:latest"]
+
+
+def test_dedupe_by_digest():
+    """Tags sharing a digest collapse to the first requested tag."""
+    payload = {"models": TAGS_PAYLOAD["models"] + [
+        {"name": "llama3:8b", "size": 4661224676, "digest": "365c0bd3c000",
+         "details": {"family": "llama", "parameter_size": "8.0B", "quantization_level": "Q4_0"}},
+    ]}
+    snapshot = ModelCatalog([], cache_path=None).ingest(payload)
+
+    assert snapshot.aliases_of("llama3:8b") == ["llama3:latest"]
+    representatives, aliases = snapshot.dedupe(["llama3:8b", "codellama:7b", "llama3:latest"])
+    assert representatives == ["llama3:8b", "codellama:7b"]
+    assert aliases == {"llama3:8b": ["llama3:latest"]}
+
+
+def main():
+    """Main test function."""
+    tests = [
+        test_name_parsing,
+        test_snapshot_precomputes_facts,
+        test_snapshot_is_swapped_not_mutated,
+        test_persisted_snapshot_loads_offline,
+        test_refresher_notifies_on_change_only,
+        test_refresher_reports_unreachable_ollama,
+        test_dedupe_by_digest,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+
+    print("\n🎉 Model catalog tests passed!" if not failed else f"\n💥 {failed} model catalog test(s) failed!")
+    return 0 if not failed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Test script for the fair multi-session query scheduler (works offline).
+"""
+
+import asyncio
+import sys
+
+from scheduler import FairScheduler, set_job_context, job_context
+
+
+async def _run_requests(scheduler, requests):
+    """Queue ``requests`` ((session, lane, cost) tuples) behind a held slot; return grant order."""
+    order = []
+
+    async def request(name, session, lane, cost):
+        set_job_context(session, lane)
+        async with scheduler.slot(cost):
+            order.append(name)
+
+    await scheduler.acquire()
+    tasks = [asyncio.ensure_future(request(f"{session}{i}", session, lane, cost))
+             for i, (session, lane, cost) in enumerate(requests)]
+    await asyncio.sleep(0.01)
+    status = scheduler.status()
+    scheduler.release()
+    await asyncio.gather(*tasks)
+    return order, status
+
+
+def test_sessions_share_slots_round_robin():
+    """A session with many queued requests can't starve a later single request."""
+    scheduler = FairScheduler(1, quantum=1.0)
+    requests = [("a", "interactive", 8.0)] * 4 + [("b", "interactive", 8.0)]
+    order, status = asyncio.run(_run_requests(scheduler, requests))
+    assert order == ["a0", "b4", "a1", "a2", "a3"]
+    assert status['waiting'] == 5
+    assert status['lanes']['interactive']['depth'] == 5
+    assert status['lanes']['interactive']['sessions'] == 2
+
+
+def test_interactive_lane_outweighs_batch():
+    """Interactive requests earn credit faster than batch work queued before them."""
+    scheduler = FairScheduler(1, quantum=1.0)
+    requests = [("batch", "batch", 8.0)] * 2 + [("chat", "interactive", 8.0)] * 2
+    order, _ = asyncio.run(_run_requests(scheduler, requests))
+    assert order == ["chat2", "chat3", "batch0", "batch1"]
+
+    status = scheduler.status()
+    assert status['lanes']['interactive']['granted'] == 2
+    assert status['lanes']['batch']['granted'] == 3  # includes the untagged holder
+    assert status['lanes']['batch']['max_wait'] >= status['lanes']['interactive']['max_wait']
+    assert status['waiting'] == 0 and status['in_use'] == 0
+
+
+def test_cancelled_request_leaves_queue():
+    """Cancelling a queued request drops its session queue; untagged work is batch/local."""
+    async def scenario():
+        scheduler = FairScheduler(1)
+        await scheduler.acquire()
+
+        async def tagged():
+            set_job_context("s1", "debate")
+            await scheduler.acquire(30.0)
+
+        pending = asyncio.ensure_future(tagged())
+        await asyncio.sleep(0)
+        queued = scheduler.status()['sessions']
+        pending.cancel()
+        await asyncio.gather(pending, return_exceptions=True)
+        scheduler.release()
+        return queued, scheduler.status(), job_context()
+
+    queued, status, context = asyncio.run(scenario())
+    assert queued == [{'session_id': 's1', 'lane': 'debate', 'depth': 1, 'deficit': 0.0,
+                       'oldest_wait': queued[0]['oldest_wait']}]
+    assert status['sessions'] == [] and status['waiting'] == 0 and status['in_use'] == 0
+    assert context == ("local", "batch")
+
+
+def main():
+    """Main test function."""
+    tests = [
+        test_sessions_share_slots_round_robin,
+        test_interactive_lane_outweighs_batch,
+        test_cancelled_request_leaves_queue,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+
+    print("\n🎉 Scheduler tests passed!" if not failed else f"\n💥 {failed} scheduler test(s) failed!")
+    return 0 if not failed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Test script for per-session byte accounting, caps and cleanup (works offline).
+"""
+
+import asyncio
+import sys
+
+from session_state import SessionBudgetExceeded, SessionRegistry
+
+
+def test_charges_are_capped_and_returned():
+    """Chunks are charged while a job runs, the cap is hard, and charges return when the job ends."""
+    registry = SessionRegistry(max_bytes=10)
+    with registry.job('a') as job:
+        job.charge("héllo")  # 6 bytes in UTF-8
+        try:
+            job.charge("world")
+            assert False, "the cap should have been enforced"
+        except SessionBudgetExceeded as e:
+            assert e.session_id == 'a' and e.limit == 10
+        job.charge("ok")
+        stats = registry.stats()
+        assert stats['held_bytes'] == 8 and stats['active_sessions'] == 1
+        assert stats['bytes_per_active_session'] == 8
+
+    [session] = registry.stats()['per_session']
+    assert session['held_bytes'] == 0 and session['peak_bytes'] == 8 and session['jobs'] == 0
+    assert registry.counters['capped'] == 1
+
+
+def test_release_cancels_running_jobs():
+    """Releasing a session (disconnect) cancels its running job and drops its state."""
+    registry = SessionRegistry()
+
+    async def job():
+        with registry.job('a') as running:
+            running.charge("x" * 100)
+            await asyncio.sleep(30)
+
+    async def main():
+        task = asyncio.create_task(job())
+        await asyncio.sleep(0.01)
+        assert registry.release('a') == 100
+        try:
+            await task
+        except asyncio.CancelledError:
+            return True
+        return False
+
+    assert asyncio.run(main())
+    assert registry.stats()['sessions'] == 0
+    assert registry.counters == {'released': 1, 'expired': 0, 'capped': 0, 'cancelled_jobs': 1}
+    assert registry.release('a') == 0
+
+
+def test_idle_sessions_expire():
+    """Only sessions idle past the timeout with no running job are expired."""
+    expired = []
+    registry = SessionRegistry(idle_timeout=60, on_expire=expired.append)
+    idle = registry.touch('idle')
+    busy = registry.touch('busy')
+    fresh = registry.touch('fresh')
+    idle.last_active = busy.last_active = fresh.last_active - 120
+    job = registry.job('busy').__enter__()
+    busy.last_active = fresh.last_active - 120
+
+    assert registry.sweep(now=fresh.last_active) == ['idle'] and expired == ['idle']
+    job.__exit__(None, None, None)
+
+
+def test_unified_app_streams_are_charged_and_released():
+    """The app's streaming handler charges chunks to the job; ending the session drops its state."""
+    import unified_app as unified
+
+    limit = unified.sessions.max_bytes
+    unified.sessions.max_bytes = 64
+    try:
+        with unified.sessions.job('session-x') as job:
+            handler = unified.WebStreamingHandler('session-x', job)
+            handler.coalescer.add = lambda model, chunk: None
+            asyncio.run(handler.streaming_callback('m', "a" * 40, False))
+            try:
+                asyncio.run(handler.streaming_callback('m', "b" * 40, False))
+                assert False, "the cap should have been enforced"
+            except SessionBudgetExceeded:
+                pass
+            assert job.charged == 40
+            assert not hasattr(handler, 'responses')
+        unified.end_session('session-x')
+        assert 'session-x' not in unified.sessions.sessions
+    finally:
+        unified.sessions.max_bytes = limit
+
+
+def test_query_and_debate_apps_release_on_disconnect():
+    """The standalone query and debate apps charge their streams and release sessions on disconnect."""
+    import debate_app
+    import web_app
+
+    for app, handler_class in ((web_app, web_app.WebStreamingHandler),
+                               (debate_app, debate_app.DebateStreamingHandler)):
+        with app.sessions.job('session-y') as job:
+            handler = handler_class('session-y', job)
+            handler.coalescer.add = lambda model, chunk: None
+            asyncio.run(handler.streaming_callback('m', "a" * 40, False))
+            assert app.sessions.stats()['held_bytes'] == 40
+        app.end_session('session-y')
+        assert 'session-y' not in app.sessions.sessions
+        assert app.sessions.counters['released'] >= 1
+
+def main():
+    """Main test function."""
+    tests = [
+        test_charges_are_capped_and_returned,
+        test_release_cancels_running_jobs,
+        test_idle_sessions_expire,
+        test_unified_app_streams_are_charged_and_released,
+        test_query_and_debate_apps_release_on_disconnect,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+
+    print("\n🎉 Session state tests passed!" if not failed else f"\n💥 {failed} session state test(s) failed!")
+    return 0 if not failed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Test script for the shared-memory token ring buffer (works offline).
+"""
+
+import multiprocessing as mp
+import sys
+
+from shm_ring import ChunkRing
+
+
+def _produce(name, streams, tokens):
+    ring = ChunkRing.attach(name)
+    writer = ring.writer()
+    for i in range(tokens):
+        writer.write(i % streams, f"tok{i} ")
+    for stream in range(streams):
+        writer.write(stream, "", done=True)
+    ring.close()
+
+
+def test_streams_keep_order_and_close():
+    """Chunks come back per stream in order with sequence numbers; done closes the stream cursor."""
+    ring = ChunkRing.create(64 * 1024)
+    try:
+        writer, reader = ring.writer(), ring.reader()
+        writer.write(1, "Hel")
+        writer.write(2, "Bon")
+        writer.write(1, "lo ✓")
+        writer.write(2, "jour", done=True)
+
+        chunks = reader.poll()
+        assert [(c.stream_id, c.seq, c.text, c.done) for c in chunks] == [
+            (1, 0, "Hel", False), (2, 0, "Bon", False), (1, 1, "lo ✓", False), (2, 1, "jour", True)]
+        assert reader.cursors == {1: 2}
+        assert reader.poll() == []
+
+        # A filtered reader only delivers the streams it follows
+        filtered = ring.reader(streams=[1], from_start=True)
+        assert [c.text for c in filtered.poll()] == ["Hel", "lo ✓"]
+    finally:
+        ring.close()
+
+
+def test_wraparound_keeps_every_chunk_intact():
+    """A reader that keeps up sees every chunk across many laps of a small ring."""
+    ring = ChunkRing.create(4096)
+    try:
+        writer, reader = ring.writer(), ring.reader()
+        received = []
+        for i in range(2000):
+            writer.write(i % 3, "x" * (i % 37) + str(i))
+            if i % 5 == 0:
+                received.extend(reader.poll())
+        received.extend(reader.poll())
+        assert ring.write_pos > 10 * ring.capacity
+        assert [c.text for c in received] == ["x" * (i % 37) + str(i) for i in range(2000)]
+        assert reader.overruns == 0 and reader.gaps == {}
+    finally:
+        ring.close()
+
+
+def test_lapped_reader_reports_loss_not_garbage():
+    """When the producer laps a reader, it skips ahead and reports per-stream gaps."""
+    ring = ChunkRing.create(4096)
+    try:
+        writer, reader = ring.writer(), ring.reader()
+        writer.write(7, "first")
+        assert [c.text for c in reader.poll()] == ["first"]
+
+        for i in range(500):
+            writer.write(7, f"lost {i}")
+        assert reader.poll() == []
+        assert reader.overruns == 1
+
+        writer.write(7, "after")
+        chunks = reader.poll()
+        assert [(c.seq, c.text) for c in chunks] == [(501, "after")]
+        assert reader.gaps == {7: 500}
+    finally:
+        ring.close()
+
+
+def test_chunks_cross_process_boundaries():
+    """A producer process streams into the ring; the parent reads every chunk."""
+    ring = ChunkRing.create(1 << 20)
+    try:
+        reader = ring.reader()
+        process = mp.get_context('spawn').Process(target=_produce, args=(ring.name, 4, 1000))
+        process.start()
+        process.join(60)
+        assert process.exitcode == 0
+
+        chunks = reader.poll(limit=10000)
+        texts = [c.text for c in chunks if not c.done]
+        assert texts == [f"tok{i} " for i in range(1000)]
+        assert sum(c.done for c in chunks) == 4 and reader.cursors == {}
+    finally:
+        ring.close()
+
+
+def main():
+    """Main test function."""
+    tests = [
+        test_streams_keep_order_and_close,
+        test_wraparound_keeps_every_chunk_intact,
+        test_lapped_reader_reports_loss_not_garbage,
+        test_chunks_cross_process_boundaries,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+
+    print("\n🎉 Ring buffer tests passed!" if not failed else f"\n💥 {failed} ring buffer test(s) failed!")
+    return 0 if not failed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Test script for session/topic room routing of Socket.IO events (works offline).
+"""
+
+import sys
+
+from flask import Flask, request
+from flask_socketio import SocketIO, emit
+
+from socket_rooms import RoomEmitter
+
+
+def _app_with_clients(count):
+    app = Flask(__name__)
+    socketio = SocketIO(app)
+    emitter = RoomEmitter(socketio)
+
+    @socketio.on('connect')
+    def handle_connect():
+        emit('connected', {'session_id': request.sid})
+
+    @socketio.on('subscribe')
+    def handle_subscribe(data):
+        emitter.subscribe(request.sid, data.get('topics', []))
+
+    clients = [socketio.test_client(app) for _ in range(count)]
+    sids = [client.get_received()[0]['args'][0]['session_id'] for client in clients]
+    return emitter, clients, sids
+
+
+def _events(client):
+    return [(packet['name'], packet['args'][0]) for packet in client.get_received()]
+
+
+def test_session_events_reach_only_their_client():
+    """Chunks for one session are delivered once, to that session alone."""
+    emitter, (first, second, third), sids = _app_with_clients(3)
+    for chunk in ("Hel", "lo"):
+        emitter.to_session('chunk_received', {'chunk': chunk, 'session_id': sids[0]}, sids[0])
+
+    assert [data['chunk'] for _, data in _events(first)] == ["Hel", "lo"]
+    assert _events(second) == [] and _events(third) == []
+
+    stats = emitter.stats()
+    room = stats['rooms'][f"session:{sids[0]}"]
+    assert room['events'] == 2 and room['deliveries'] == 2 and room['members'] == 1
+    assert room['by_event'] == {'chunk_received': 2}
+    assert stats['totals']['broadcast_deliveries'] == 6
+    assert stats['totals']['saved_deliveries'] == 4
+
+
+def test_topic_events_reach_subscribers():
+    """Shared-view events go to subscribed clients; unknown topics are ignored."""
+    emitter, (viewer, other), sids = _app_with_clients(2)
+    viewer.emit('subscribe', {'topics': ['dashboard', 'secret']})
+    assert emitter.has_subscribers('dashboard')
+    assert not emitter.has_subscribers('models')
+
+    emitter.to_topic('dashboard_update', {'time': '12:00'}, 'dashboard')
+    assert _events(viewer) == [('dashboard_update', {'time': '12:00'})]
+    assert _events(other) == []
+
+    emitter.forget_session(sids[0])
+    assert list(emitter.stats()['rooms']) == ['topic:dashboard']
+
+
+def test_queue_position_reaches_waiting_client():
+    """Admission queue updates go to the waiting session only."""
+    from admission import AdmissionTicket
+
+    emitter, (waiting, other), sids = _app_with_clients(2)
+    emitter.queued(AdmissionTicket(1, sids[0], 'query', 12.0, print), 2, 24.04)
+
+    assert _events(waiting) == [('queued', {'kind': 'query', 'position': 2, 'eta': 24.0, 'session_id': sids[0]})]
+    assert _events(other) == []
+
+def main():
+    """Main test function."""
+    tests = [
+        test_session_events_reach_only_their_client,
+        test_topic_events_reach_subscribers,
+        test_queue_position_reaches_waiting_client,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+
+    print("\n🎉 Socket room tests passed!" if not failed else f"\n💥 {failed} socket room test(s) failed!")
+    return 0 if not failed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
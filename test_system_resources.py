@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+"""
+Test script for system resource sampling and estimation (works offline).
+"""
+
+import json
+import os
+import sys
+import tempfile
+import time
+
+from model_catalog import ModelCatalog
+from system_resources import (
+    SystemResourceManager, SystemUsageSampler, ResourceTimeSeries, FootprintLearner, RunnerFootprintTracker,
+    read_cgroup_limits
+)
+
+
+def test_usage_sampler_serves_cached_snapshot():
+    """Usage reads return the sampler's latest snapshot instantly, with its age."""
+    manager = SystemResourceManager(footprint_path=None)
+    sampler = SystemUsageSampler(manager, interval=60)
+    first = sampler.sample()
+
+    start = time.time()
+    latest = sampler.latest()
+    assert time.time() - start < 0.5
+    assert latest['timestamp'] == first['timestamp']
+    assert 'sample_age' in latest
+    assert 'per_core' in latest['cpu']
+    assert 'sent_per_sec' in latest['network']
+
+
+def test_usage_sampler_notifies_listeners():
+    """Every sample is pushed to registered listeners."""
+    sampler = SystemUsageSampler(SystemResourceManager(footprint_path=None), interval=60)
+    seen = []
+    sampler.add_listener(seen.append)
+    sampler.sample()
+    sampler.sample()
+    assert len(seen) == 2
+    assert seen[1]['timestamp'] >= seen[0]['timestamp']
+
+
+def _usage(timestamp, cpu, memory=50.0):
+    return {'timestamp': timestamp, 'cpu': {'percent': cpu}, 'memory': {'percent': memory},
+            'network': {'sent_per_sec': 0.0, 'recv_per_sec': 0.0}}
+
+
+def test_timeseries_rollups_and_bounds():
+    """Samples roll up into 1s/10s tiers and never exceed the ring capacity."""
+    series = ResourceTimeSeries(tiers=((1, 30), (10, 6)))
+    now = time.time()
+    base = now - 25
+    with series.track_model("llama3"):
+        for i in range(25):
+            series.record(_usage(base + i, cpu=float(i)))
+    series.record(_usage(now, cpu=0.0))
+
+    fine = series.history(window=30)
+    assert fine['resolution'] == 1
+    assert len(fine['timestamps']) <= 30
+    assert fine['series']['cpu_percent'][-1] == 24.0
+    assert max(fine['inflight']['llama3']) == 1
+
+    coarse = series.history(window=60)
+    assert coarse['resolution'] == 10
+    assert len(coarse['timestamps']) >= 2
+
+    for i in range(100):
+        series.record(_usage(now + i + 1, cpu=1.0))
+    assert series.tiers[0].count == 30
+
+
+def test_timeseries_markers_and_inflight():
+    """In-flight counts are tracked per model and markers land in the window."""
+    series = ResourceTimeSeries()
+    with series.track_model("a"), series.track_model("a"), series.track_model("b"):
+        assert series.inflight_counts() == {"a": 2, "b": 1}
+    assert series.inflight_counts() == {}
+
+    series.mark('query_start', 'a, b')
+    markers = series.history(window=60)['markers']
+    assert [m['kind'] for m in markers] == ['query_start']
+
+
+def test_estimates_use_reported_size_and_quantization():
+    """Estimates come from Ollama's blob size, not an FP16 guess from the name."""
+    catalog = ModelCatalog([], cache_path=None)
+    catalog.ingest({"models": [
+        {"name": "llama3.1:8b", "size": 4920753328, "digest": "46e0c10c039e",
+         "details": {"parameter_size": "8.0B", "quantization_level": "Q4_K_M"}},
+    ]})
+    manager = SystemResourceManager(footprint_path=None)
+    manager.attach_catalog(catalog, num_ctx=2048)
+
+    info = manager.estimate_model_requirements("llama3.1:8b")
+    assert info.source == "metadata"
+    assert info.size_gb == 4.6
+    assert info.quantization == "Q4_K_M"
+    assert 0 < info.kv_cache_gb < 1.0
+    assert info.min_ram_gb < 8  # the old FP16 formula said 24GB
+    assert manager.estimate_model_requirements("llama3.1:8b") is info
+
+    larger_ctx = manager.estimate_model_requirements("llama3.1:8b", num_ctx=8192)
+    assert larger_ctx.kv_cache_gb > info.kv_cache_gb
+
+
+def test_estimates_without_metadata():
+    """Names without metadata use tag-anchored parameter counts and 4-bit weights."""
+    manager = SystemResourceManager(footprint_path=None)
+    assert manager.estimate_model_requirements("llama3.1-finetune").source == "default"
+    info = manager.estimate_model_requirements("mistral:7b")
+    assert info.parameters == "7B"
+    assert 3.0 < info.size_gb < 4.5
+
+
+def test_runner_rss_is_learned_per_model():
+    """Peak runner RSS during a request is attributed via the manifests (to any alias) and learned."""
+    with tempfile.TemporaryDirectory() as tmp:
+        manifest_dir = os.path.join(tmp, "manifests", "registry.ollama.ai", "library", "llama3")
+        os.makedirs(manifest_dir)
+        for tag in ("8b", "latest"):
+            with open(os.path.join(manifest_dir, tag), "w") as f:
+                json.dump({"layers": [{"mediaType": "application/vnd.ollama.image.model", "digest": "sha256:abc"}]}, f)
+
+        series = ResourceTimeSeries()
+        learner = FootprintLearner(path=os.path.join(tmp, "footprints.json"), min_samples=2)
+        tracker = RunnerFootprintTracker(learner, series, models_dir=tmp)
+        rss = iter([5.0, 6.0, 5.5, 5.8])
+        tracker.find_runners = lambda: [{"pid": 1, "blob": f"{tmp}/blobs/sha256-abc", "ctx": 8192, "rss_gb": next(rss)}]
+
+        for _ in range(2):
+            with series.track_model("llama3:8b"):
+                tracker.sample()
+                tracker.sample()
+            tracker.sample()
+
+        footprint, ctx = learner.lookup("llama3:8b", 2048)
+        assert ctx == 8192
+        assert 5.8 <= footprint <= 6.0
+        assert FootprintLearner(path=os.path.join(tmp, "footprints.json")).footprints["llama3:8b"]["8192"]["samples"] == 2
+
+        # An alias of the same weights is attributed too
+        assert tracker.tags_for_blob(f"{tmp}/blobs/sha256-abc") == {"llama3:8b", "llama3:latest"}
+        rss = iter([4.0, 4.2])
+        with series.track_model("llama3:latest"):
+            tracker.sample()
+            tracker.sample()
+        tracker.sample()
+        assert learner.footprints["llama3:latest"]["8192"]["samples"] == 1
+
+
+def test_unknown_blobs_do_not_rescan_every_sample():
+    """A runner whose blob is in no manifest triggers at most one manifest scan per interval."""
+    with tempfile.TemporaryDirectory() as tmp:
+        tracker = RunnerFootprintTracker(FootprintLearner(path=None), ResourceTimeSeries(), models_dir=tmp)
+        scans = []
+        tracker.load_blob_index = lambda: scans.append(1) or {}
+        for _ in range(5):
+            assert tracker.tags_for_blob(f"{tmp}/blobs/sha256-deleted") == set()
+        assert len(scans) == 1
+
+        tracker._last_scan -= tracker.rescan_interval
+        tracker.tags_for_blob(f"{tmp}/blobs/sha256-deleted")
+        assert len(scans) == 2
+
+
+def test_learned_footprint_overrides_static_estimate():
+    """The planner's estimate switches to the learned footprint once it has enough samples."""
+    manager = SystemResourceManager(footprint_path=None)
+    manager.footprints = FootprintLearner(path=None, min_samples=1)
+    static = manager.estimate_model_requirements("mistral:7b")
+    manager.footprints.observe("mistral:7b", manager.num_ctx, 9.0)
+
+    learned = manager.estimate_model_requirements("mistral:7b")
+    assert static.source != "learned"
+    assert learned.source == "learned"
+    assert learned.min_ram_gb == 9.0
+
+    # Each new observation replaces the memoized estimate instead of adding one
+    manager.footprints.observe("mistral:7b", manager.num_ctx, 10.0)
+    assert manager.estimate_model_requirements("mistral:7b").min_ram_gb > 9.0
+    assert len(manager.model_size_cache) == 1
+
+
+def _planner(footprints):
+    manager = SystemResourceManager(footprint_path=None)
+    manager.footprints = FootprintLearner(path=None, min_samples=1)
+    for model, gb in footprints.items():
+        manager.footprints.observe(model, manager.num_ctx, gb)
+    return manager
+
+
+def test_planner_packs_waves_within_budget():
+    """Waves never exceed the RAM budget, and the big model does not share with the small ones."""
+    manager = _planner({"big:13b": 9.0, "a:3b": 2.5, "b:3b": 2.5, "c:3b": 2.5})
+    plan = manager.plan_concurrent_waves(["a:3b", "big:13b", "b:3b", "c:3b"], ram_budget_gb=10.0, cpu_budget=4)
+
+    assert all(ram <= 10.0 for ram in plan.wave_ram_gb)
+    assert plan.waves[0] == ["big:13b"]
+    assert sorted(plan.waves[1]) == ["a:3b", "b:3b", "c:3b"]
+    assert plan.max_concurrent == 3
+    assert plan.oversized == []
+
+
+def test_planner_caps_cpu_and_isolates_oversized():
+    """The CPU budget limits wave width; models larger than the budget run alone last."""
+    manager = _planner({"a:3b": 1.0, "b:3b": 1.0, "c:3b": 1.0, "huge:70b": 40.0})
+    plan = manager.plan_concurrent_waves(["a:3b", "b:3b", "c:3b", "huge:70b"], ram_budget_gb=8.0, cpu_budget=2)
+
+    assert [len(wave) for wave in plan.waves] == [2, 1, 1]
+    assert plan.waves[-1] == ["huge:70b"]
+    assert plan.oversized == ["huge:70b"]
+
+
+def _write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(text)
+
+
+def test_cgroup_limits_cap_memory_and_cpu():
+    """Inside a cgroup, totals come from memory.max/cpu.max rather than the host."""
+    with tempfile.TemporaryDirectory() as tmp:
+        cgroup, proc = os.path.join(tmp, "cgroup"), os.path.join(tmp, "proc")
+        _write(os.path.join(proc, "self", "cgroup"), "0::/app/worker\n")
+        _write(os.path.join(cgroup, "app", "memory.max"), str(2 * 1024**3))
+        _write(os.path.join(cgroup, "app", "cpu.max"), "150000 100000")
+        _write(os.path.join(cgroup, "app", "worker", "memory.max"), "max")
+        _write(os.path.join(cgroup, "app", "worker", "cpu.max"), "max 100000")
+
+        limits = read_cgroup_limits(cgroup, proc)
+        assert limits == {'memory_max_bytes': 2 * 1024**3, 'cpu_quota_cores': 1.5}
+
+        _write(os.path.join(cgroup, "app", "memory.current"), str(1536 * 1024**2))
+        _write(os.path.join(cgroup, "app", "memory.stat"), "anon 1\ninactive_file %d\n" % (512 * 1024**2))
+        manager = SystemResourceManager(footprint_path=None)
+        manager.cgroup_root, manager.proc_root = cgroup, proc
+        info = manager.detect_system_resources()
+        assert info.total_ram_gb <= 2.0 and info.memory_limit_gb == 2.0
+        assert abs(manager.get_live_available_ram_gb() - 1.0) < 0.01
+        assert info.cpu_cores <= 2 and info.cpu_quota == 1.5
+
+
+def test_pressure_throttles_launches():
+    """PSI "some" averages above the thresholds hold back new model launches."""
+    with tempfile.TemporaryDirectory() as proc:
+        manager = SystemResourceManager(footprint_path=None)
+        manager.proc_root = proc
+        assert manager.read_pressure() == {} and manager.launch_pressure() is None
+
+        _write(os.path.join(proc, "pressure", "memory"),
+               "some avg10=25.00 avg60=5.00 avg300=1.00 total=100\nfull avg10=3.00 avg60=1.00 avg300=0.00 total=10\n")
+        _write(os.path.join(proc, "pressure", "cpu"), "some avg10=1.00 avg60=1.00 avg300=1.00 total=5\n")
+        assert manager.read_pressure()['memory']['full']['avg10'] == 3.0
+        assert manager.launch_pressure() == "memory pressure 25.0%"
+
+
+def _fake_gpu_host(tmp, amd=True):
+    sys_root, proc = os.path.join(tmp, "sys"), os.path.join(tmp, "proc")
+    os.makedirs(os.path.join(sys_root, "class", "drm"))
+    os.makedirs(proc)
+    if amd:
+        device = os.path.join(sys_root, "class", "drm", "card0", "device")
+        _write(os.path.join(device, "vendor"), "0x1002\n")
+        _write(os.path.join(device, "mem_info_vram_total"), str(16 * 1024**3))
+        _write(os.path.join(device, "mem_info_vram_used"), str(4 * 1024**3))
+        _write(os.path.join(device, "gpu_busy_percent"), "37\n")
+        _write(os.path.join(device, "hwmon", "hwmon3", "temp1_input"), "61000\n")
+        _write(os.path.join(sys_root, "class", "drm", "card0-DP-1", "status"), "connected\n")
+    manager = SystemResourceManager(footprint_path=None)
+    manager.sys_root, manager.proc_root = sys_root, proc
+    return manager
+
+
+def _forbid_subprocess():
+    import subprocess
+    original = subprocess.run
+
+    def refuse(*args, **kwargs):
+        raise AssertionError(f"unexpected subprocess call: {args[0]}")
+    subprocess.run = refuse
+    return lambda: setattr(subprocess, "run", original)
+
+
+def test_gpu_detection_reads_sysfs_and_caches():
+    """AMD GPUs are found (with VRAM) from sysfs alone, and detection is cached."""
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = _fake_gpu_host(tmp)
+        restore = _forbid_subprocess()
+        try:
+            gpus = manager._detect_gpu()
+            assert [(gpu['type'], gpu['total_memory_mb']) for gpu in gpus] == [('AMD', 16384.0)]
+            assert manager.gpu_available and manager.gpu_memory_gb == 16.0
+
+            manager.detect_system_resources()
+            usage = manager._get_gpu_usage()
+            assert usage[0]['utilization_percent'] == 37.0
+            assert usage[0]['memory_used_mb'] == 4096.0 and usage[0]['temperature_c'] == 61.0
+        finally:
+            restore()
+
+        os.remove(os.path.join(tmp, "sys", "class", "drm", "card0", "device", "vendor"))
+        assert manager._detect_gpu() is gpus
+        assert manager._detect_gpu(force=True) == []
+
+
+def test_no_gpu_means_no_polling():
+    """Without any GPU, detection and usage polling never spawn a process."""
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = _fake_gpu_host(tmp, amd=False)
+        restore = _forbid_subprocess()
+        try:
+            info = manager.detect_system_resources()
+            assert info.gpu_info == [] and not manager.gpu_available
+            assert manager._get_gpu_usage() == []
+        finally:
+            restore()
+
+
+def main():
+    """Main test function."""
+    tests = [
+        test_usage_sampler_serves_cached_snapshot,
+        test_usage_sampler_notifies_listeners,
+        test_timeseries_rollups_and_bounds,
+        test_timeseries_markers_and_inflight,
+        test_estimates_use_reported_size_and_quantization,
+        test_estimates_without_metadata,
+        test_runner_rss_is_learned_per_model,
+        test_unknown_blobs_do_not_rescan_every_sample,
+        test_learned_footprint_overrides_static_estimate,
+        test_planner_packs_waves_within_budget,
+        test_planner_caps_cpu_and_isolates_oversized,
+        test_cgroup_limits_cap_memory_and_cpu,
+        test_pressure_throttles_launches,
+        test_gpu_detection_reads_sysfs_and_caches,
+        test_no_gpu_means_no_polling,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+
+    print("\n🎉 System resource tests passed!" if not failed else f"\n💥 {failed} system resource test(s) failed!")
+    return 0 if not failed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
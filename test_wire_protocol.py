@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Test script for the compact Socket.IO wire protocol (works offline).
+"""
+
+import json
+import sys
+import zlib
+
+from wire_protocol import CompactWire, msgpack
+
+
+def _compact(**kwargs):
+    wire = CompactWire(**kwargs)
+    # Payload shaping doesn't depend on msgpack being installed
+    wire.enabled = True
+    return wire
+
+
+def test_model_ids_are_per_session():
+    """IDs are assigned once per session, in first-use order, and dropped on disconnect."""
+    wire = _compact()
+    assert wire.model_id("s1", "llama3") == 0
+    assert wire.model_id("s1", "mistral") == 1
+    assert wire.model_id("s1", "llama3") == 0
+    assert wire.model_id("s2", "mistral") == 0
+
+    wire.forget_session("s1")
+    assert wire.model_id("s1", "mistral") == 0
+
+
+def test_chunk_payloads():
+    """Compact chunks are [model_id, text]; the JSON protocol keeps the keyed dict."""
+    assert CompactWire(enabled=False).chunk("s1", "llama3", "Hi") == \
+        {'model': "llama3", 'chunk': "Hi", 'session_id': "s1"}
+
+    wire = _compact()
+    wire.model_id("s1", "llama3")
+    assert wire.chunk("s1", "mistral", "Hello") == [1, "Hello"]
+
+
+def test_large_payloads_are_deflated_above_threshold():
+    """Only payloads above the threshold are deflated, and they inflate back intact."""
+    wire = _compact(compress_threshold=200)
+    small = {'summary': "short", 'session_id': "s1"}
+    assert wire.large(small) is small
+
+    history = {'debate_history': [{'model': "llama3", 'content': "point " * 100}] * 5, 'session_id': "s1"}
+    packed = wire.large(history)
+    assert set(packed) == {'deflated'}
+    assert len(packed['deflated']) < len(json.dumps(history)) / 10
+    assert json.loads(zlib.decompress(packed['deflated'])) == history
+    assert CompactWire(enabled=False).large(history) is history
+
+
+def test_serializer_falls_back_without_msgpack():
+    """compact_wire only switches the serializer when msgpack is importable."""
+    wire = CompactWire(enabled=True)
+    assert wire.serializer == ('msgpack' if msgpack is not None else 'default')
+    assert CompactWire.from_config({}).serializer == 'default'
+
+
+def main():
+    """Main test function."""
+    tests = [
+        test_model_ids_are_per_session,
+        test_chunk_payloads,
+        test_large_payloads_are_deflated_above_threshold,
+        test_serializer_falls_back_without_msgpack,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+
+    print("\n🎉 Wire protocol tests passed!" if not failed else f"\n💥 {failed} wire protocol test(s) failed!")
+    return 0 if not failed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
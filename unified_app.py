@@ -5,14 +5,14 @@ Flask-based web interface for both querying multiple models and conducting model
 """
 
 import asyncio
+import hashlib
 import json
 import requests
 import random
 import calendar
 from datetime import datetime, timedelta
-from flask import Flask, render_template, request, jsonify, Response
+from flask import Flask, request, jsonify, Response
 from flask_socketio import SocketIO, emit
-import threading
 import queue
 import time
 
@@ -23,44 +23,58 @@ from models import (
     PromptEnhancer,
     ModelResponse
 )
+from admission import AdmissionQueue, AdmissionRejected
+from async_worker import async_worker
+from scheduler import set_job_context
+from socket_rooms import RoomEmitter, TOPICS
+from dashboard_feed import DashboardFeed, DASHBOARD_TOPICS
+from coalescing import ChunkCoalescer, frame_stats
+from wire_protocol import CompactWire
+from cluster import ClusterNode
+from asset_pipeline import AssetPipeline
+from session_state import SessionRegistry
+
+# Global instances
+config_manager = ConfigManager()
+
+# Optional MessagePack wire protocol (integer model IDs, deflated large payloads)
+wire = CompactWire.from_config(config_manager)
+
+# Worker fleets (run_web.py) share Socket.IO rooms through the cluster broker
+cluster = ClusterNode.from_env(config_manager)
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'unified-secret-key-here'
-socketio = SocketIO(app, cors_allowed_origins="*")
+socketio = SocketIO(app, cors_allowed_origins="*", serializer=wire.serializer, **cluster.socketio_options())
+
+# Pages are served as cached shells with their inline CSS/JS moved to hashed, precompressed assets
+assets = AssetPipeline.from_config(config_manager)
+
+# Events go to the asking session's room (or a subscribed topic), never to everyone
+emitter = RoomEmitter(socketio, TOPICS + DASHBOARD_TOPICS)
 
-# Global instances
-config_manager = ConfigManager()
 model_manager = OllamaModelManager(config_manager)
+# In a fleet: one broker-hosted scheduler, and catalog/performance updates shared by all workers
+cluster.attach(model_manager)
 available_models = []
 
+# Bounded admission in front of the query/debate workers (the emitter is looked
+# up per call: under ASGI it is rebound after import)
+admission = AdmissionQueue.from_config(config_manager, on_queued=lambda *args: emitter.queued(*args))
+
+# Per-session byte accounting and caps; state is released on disconnect or when idle
+sessions = SessionRegistry.from_config(config_manager, on_expire=lambda session_id: expire_session(session_id))
+
 # Debate configuration
 DEBATE_ROUNDS = 3
 MAX_DEBATE_MODELS = 6
 
 def filter_large_models(models):
     """Filter out ultra-large models (70B+ parameters) that may be too resource intensive."""
-    filtered_models = []
-    excluded_models = []
+    filtered_models, excluded_models = model_manager.catalog.snapshot.split_large(models)
     
-    for model in models:
-        model_lower = model.lower()
-        
-        # Check for ultra-large model indicators
-        is_ultra_large = any([
-            '70b' in model_lower,
-            '72b' in model_lower,
-            '405b' in model_lower,
-            'llama3.1:70b' in model_lower,
-            'llama3.2:70b' in model_lower,
-            'qwen2.5:72b' in model_lower,
-            'codellama:70b' in model_lower
-        ])
-        
-        if is_ultra_large:
-            excluded_models.append(model)
-            print(f"⚠️  Excluding ultra-large model: {model} (likely 70B+ parameters)")
-        else:
-            filtered_models.append(model)
+    for model in excluded_models:
+        print(f"⚠️  Excluding ultra-large model: {model} (likely 70B+ parameters)")
     
     if excluded_models:
         print(f"📊 Filtered {len(excluded_models)} ultra-large models, {len(filtered_models)} models available")
@@ -113,80 +127,92 @@ def initialize_models_on_startup():
 class WebStreamingHandler:
     """Handles streaming responses for web interface."""
     
-    def __init__(self, session_id):
+    def __init__(self, session_id, job=None):
         self.session_id = session_id
-        self.responses = {}
+        # Streamed text is not kept here: the model query builds it, charged to the session's job
+        self.job = job
         self.start_times = {}
+        self.coalescer = ChunkCoalescer.from_config(
+            config_manager, self._emit_chunk, rtt=lambda: emitter.rtt(session_id))
+        emitter.probe_rtt(session_id)
+    
+    def _emit_chunk(self, model_name: str, text: str):
+        """Send one coalesced frame of streamed text to the client."""
+        emitter.to_session('chunk_received', wire.chunk(self.session_id, model_name, text), self.session_id)
     
     async def streaming_callback(self, model_name: str, chunk: str, is_done: bool):
         """Callback for streaming model responses."""
         if chunk and not is_done:
             # Initialize model tracking if first chunk
-            if model_name not in self.responses:
-                self.responses[model_name] = ""
+            if model_name not in self.start_times:
                 self.start_times[model_name] = time.time()
-                socketio.emit('model_started', {
+                emitter.to_session('model_started', {
                     'model': model_name,
+                    'model_id': wire.model_id(self.session_id, model_name),
                     'session_id': self.session_id
-                })
-            
-            # Add chunk to response
-            self.responses[model_name] += chunk
+                }, self.session_id)
             
-            # Emit chunk to client
-            socketio.emit('chunk_received', {
-                'model': model_name,
-                'chunk': chunk,
-                'session_id': self.session_id
-            })
+            # Count the chunk against the session's cap; the coalescer batches chunks into frames
+            if self.job:
+                self.job.charge(chunk)
+            self.coalescer.add(model_name, chunk)
             
         elif is_done:
+            # Final flush before announcing completion
+            self.coalescer.finish(model_name)
+            
             # Model completed
             elapsed_time = time.time() - self.start_times.get(model_name, 0)
-            socketio.emit('model_completed', {
+            emitter.to_session('model_completed', {
                 'model': model_name,
                 'elapsed_time': elapsed_time,
                 'session_id': self.session_id
-            })
+            }, self.session_id)
 
 class DebateStreamingHandler:
     """Handles streaming responses for debate interface."""
     
-    def __init__(self, session_id):
+    def __init__(self, session_id, job=None):
         self.session_id = session_id
-        self.responses = {}
+        # Streamed text is not kept here: the model query builds it, charged to the session's job
+        self.job = job
         self.start_times = {}
+        self.coalescer = ChunkCoalescer.from_config(
+            config_manager, self._emit_chunk, rtt=lambda: emitter.rtt(session_id))
+        emitter.probe_rtt(session_id)
+    
+    def _emit_chunk(self, model_name: str, text: str):
+        """Send one coalesced frame of streamed text to the client."""
+        emitter.to_session('debate_chunk_received', wire.chunk(self.session_id, model_name, text), self.session_id)
     
     async def streaming_callback(self, model_name: str, chunk: str, is_done: bool):
         """Callback for streaming model responses during debate."""
         if chunk and not is_done:
             # Initialize model tracking if first chunk
-            if model_name not in self.responses:
-                self.responses[model_name] = ""
+            if model_name not in self.start_times:
                 self.start_times[model_name] = time.time()
-                socketio.emit('debate_model_started', {
+                emitter.to_session('debate_model_started', {
                     'model': model_name,
+                    'model_id': wire.model_id(self.session_id, model_name),
                     'session_id': self.session_id
-                })
-            
-            # Add chunk to response
-            self.responses[model_name] += chunk
+                }, self.session_id)
             
-            # Emit chunk to client
-            socketio.emit('debate_chunk_received', {
-                'model': model_name,
-                'chunk': chunk,
-                'session_id': self.session_id
-            })
+            # Count the chunk against the session's cap; the coalescer batches chunks into frames
+            if self.job:
+                self.job.charge(chunk)
+            self.coalescer.add(model_name, chunk)
             
         elif is_done:
+            # Final flush before announcing completion
+            self.coalescer.finish(model_name)
+            
             # Model completed
             elapsed_time = time.time() - self.start_times.get(model_name, 0)
-            socketio.emit('debate_model_completed', {
+            emitter.to_session('debate_model_completed', {
                 'model': model_name,
                 'elapsed_time': elapsed_time,
                 'session_id': self.session_id
-            })
+            }, self.session_id)
 
 class EnhancedDebateManager:
     """Enhanced debate manager with improved inter-model interaction."""
@@ -626,36 +652,26 @@ class DashboardDataProvider:
         }
     
     def get_system_stats(self):
-        try:
-            import psutil
-            cpu_percent = psutil.cpu_percent(interval=1)
-            memory = psutil.virtual_memory()
-            disk = psutil.disk_usage('/')
-            
-            return {
-                'available': True,
-                'cpu_usage': f"{cpu_percent:.1f}%",
-                'memory_usage': f"{memory.percent:.1f}%",
-                'disk_usage': f"{disk.percent:.1f}%",
-                'memory_total': f"{memory.total / (1024**3):.1f} GB",
-                'cpu_percent': cpu_percent,
-                'memory_percent': memory.percent,
-                'disk_percent': disk.percent
-            }
-        except ImportError:
-            cpu_rand = random.randint(10, 80)
-            mem_rand = random.randint(30, 70)
-            disk_rand = random.randint(20, 60)
-            return {
-                'available': True,
-                'cpu_usage': f"{cpu_rand}%",
-                'memory_usage': f"{mem_rand}%",
-                'disk_usage': f"{disk_rand}%",
-                'memory_total': "16.0 GB",
-                'cpu_percent': cpu_rand,
-                'memory_percent': mem_rand,
-                'disk_percent': disk_rand
-            }
+        # Read the background sampler's latest snapshot instead of blocking on cpu_percent
+        usage = model_manager.resource_manager.get_real_time_usage()
+        if 'error' in usage:
+            return {'available': False, 'error': usage['error']}
+        
+        cpu_percent = usage['cpu']['percent']
+        memory = usage['memory']
+        disk_percent = usage['disk'].get('percent', 0)
+        
+        return {
+            'available': True,
+            'cpu_usage': f"{cpu_percent:.1f}%",
+            'memory_usage': f"{memory['percent']:.1f}%",
+            'disk_usage': f"{disk_percent:.1f}%",
+            'memory_total': f"{memory['total_gb']:.1f} GB",
+            'cpu_percent': cpu_percent,
+            'memory_percent': memory['percent'],
+            'disk_percent': disk_percent,
+            'sample_age': usage['sample_age']
+        }
     
     def get_llm_chat_data(self):
         responses = [
@@ -677,238 +693,142 @@ class DashboardDataProvider:
 # Create dashboard data provider instance
 dashboard_provider = DashboardDataProvider()
 
+def stocks_by_symbol():
+    """Stock data keyed by symbol, so dashboard deltas carry only the stocks that moved."""
+    data = dashboard_provider.get_stock_data()
+    return dict(data, stocks={stock['symbol']: stock for stock in data['stocks']})
+
+# Per-widget dashboard topics, recomputed only while subscribed and sent as deltas
+# (emits resolve the module-level emitter, which the ASGI mode rebinds)
+dashboard_feed = DashboardFeed.from_config(config_manager, {
+    'time': dashboard_provider.get_time_data,
+    'calendar': dashboard_provider.get_calendar_data,
+    'vocabulary': dashboard_provider.get_vocabulary_data,
+    'quote': dashboard_provider.get_quote_data,
+    'puzzle': dashboard_provider.get_puzzle_data,
+    'weather': dashboard_provider.get_weather_data,
+    'stocks': stocks_by_symbol,
+    'system': dashboard_provider.get_system_stats
+}, to_topic=lambda *args: emitter.to_topic(*args), to_session=lambda *args: emitter.to_session(*args))
+
 
 @app.route('/')
 def index():
     """Main unified page."""
-    return render_template('unified.html')
+    return assets.page('unified.html', compact_wire=wire.enabled)
 
-def get_model_specialties():
-    """Get specialties and descriptions for different models."""
+@app.route('/assets/<name>')
+def asset(name):
+    """Serve a hashed CSS/JS asset extracted from the page templates."""
+    return assets.asset(name)
+
+def get_model_info(model_name):
+    """Get specialty information for a specific model from the model catalog."""
+    entry = model_manager.catalog.describe(model_name)
     return {
-        # Llama models
-        "llama3.2": {
-            "specialty": "General Reasoning",
-            "description": "Balanced performance across tasks, good reasoning",
-            "strengths": ["reasoning", "analysis", "general knowledge"]
-        },
-        "llama3.1": {
-            "specialty": "Advanced Reasoning", 
-            "description": "Enhanced reasoning and complex problem solving",
-            "strengths": ["complex reasoning", "logic", "analysis"]
-        },
-        "llama3": {
-            "specialty": "Conversational AI",
-            "description": "Natural conversation and general assistance", 
-            "strengths": ["conversation", "helpfulness", "general tasks"]
-        },
-        "llama2": {
-            "specialty": "Stable Performance",
-            "description": "Reliable and consistent responses",
-            "strengths": ["stability", "consistency", "general use"]
-        },
-        
-        # Coding models
-        "codellama": {
-            "specialty": "Code Generation",
-            "description": "Specialized for programming and code tasks",
-            "strengths": ["coding", "debugging", "programming"]
-        },
-        "deepseek-coder": {
-            "specialty": "Advanced Coding",
-            "description": "Superior code understanding and generation",
-            "strengths": ["complex coding", "algorithms", "code review"]
-        },
-        "codegemma": {
-            "specialty": "Code Analysis",
-            "description": "Code comprehension and explanation",
-            "strengths": ["code analysis", "explanation", "debugging"]
-        },
-        "starcoder": {
-            "specialty": "Multi-language Coding",
-            "description": "Supports many programming languages",
-            "strengths": ["multi-language", "code completion", "syntax"]
-        },
-        "magicoder": {
-            "specialty": "Code Generation",
-            "description": "Efficient code generation and problem solving",
-            "strengths": ["quick coding", "algorithms", "optimization"]
-        },
-        "phind-codellama": {
-            "specialty": "Code Explanation",
-            "description": "Explains code and programming concepts",
-            "strengths": ["code explanation", "teaching", "documentation"]
-        },
-        "wizardcoder": {
-            "specialty": "Code Wizardry",
-            "description": "Advanced coding capabilities and problem solving",
-            "strengths": ["complex problems", "optimization", "best practices"]
-        },
-        
-        # Specialized models
-        "qwen2.5": {
-            "specialty": "Multilingual Intelligence",
-            "description": "Strong multilingual and reasoning capabilities",
-            "strengths": ["multilingual", "reasoning", "diverse knowledge"]
-        },
-        "mistral": {
-            "specialty": "Efficient Reasoning",
-            "description": "Fast and efficient reasoning and analysis",
-            "strengths": ["efficiency", "reasoning", "concise answers"]
-        },
-        "mixtral": {
-            "specialty": "Expert Mixture",
-            "description": "Mixture of experts for diverse capabilities",
-            "strengths": ["versatility", "expertise", "specialized knowledge"]
-        },
-        "phi3": {
-            "specialty": "Compact Intelligence",
-            "description": "Small but capable model with good performance",
-            "strengths": ["efficiency", "speed", "resource-friendly"]
-        },
-        "gemma": {
-            "specialty": "Research & Analysis",
-            "description": "Strong analytical and research capabilities",
-            "strengths": ["research", "analysis", "factual accuracy"]
-        },
-        "neural-chat": {
-            "specialty": "Conversational Expert",
-            "description": "Optimized for natural conversation",
-            "strengths": ["conversation", "empathy", "natural responses"]
-        },
-        "orca-mini": {
-            "specialty": "Quick Responses",
-            "description": "Fast and efficient for quick questions",
-            "strengths": ["speed", "efficiency", "quick answers"]
-        },
-        "tinyllama": {
-            "specialty": "Lightweight Assistant",
-            "description": "Compact model for basic tasks",
-            "strengths": ["speed", "low resource", "basic tasks"]
-        },
-        "vicuna": {
-            "specialty": "Open Assistant",
-            "description": "Open-source conversational assistant",
-            "strengths": ["helpfulness", "conversation", "general assistance"]
-        },
-        "alpaca": {
-            "specialty": "Instruction Following",
-            "description": "Good at following instructions and tasks",
-            "strengths": ["instruction following", "task completion", "helpfulness"]
-        }
+        "specialty": entry.specialty,
+        "description": entry.description,
+        "strengths": list(entry.strengths),
+        "category": entry.category
     }
 
-def get_model_info(model_name):
-    """Get specialty information for a specific model."""
-    specialties = get_model_specialties()
-    
-    # Try exact match first
-    if model_name in specialties:
-        info = specialties[model_name].copy()
-    else:
-        # Try partial match for versioned models
-        found = False
-        for key, spec_info in specialties.items():
-            if key in model_name.lower() or model_name.lower().startswith(key):
-                info = spec_info.copy()
-                found = True
-                break
-        
-        if not found:
-            # Default info for unknown models
-            info = {
-                "specialty": "General Purpose",
-                "description": "Multi-purpose language model",
-                "strengths": ["general tasks", "conversation", "assistance"]
-            }
-    
-    # Simplify categories into broader groups
-    specialty = info["specialty"]
-    
-    # Map specific specialties to broader categories
-    if any(keyword in specialty.lower() for keyword in ["code", "coding", "programming", "development"]):
-        info["category"] = "💻 Coding & Development"
-    elif any(keyword in specialty.lower() for keyword in ["creative", "writing", "literature", "storytelling"]):
-        info["category"] = "✍️ Creative & Writing"
-    elif any(keyword in specialty.lower() for keyword in ["science", "research", "analysis", "mathematical", "reasoning"]):
-        info["category"] = "🔬 Research & Analysis"
-    elif any(keyword in specialty.lower() for keyword in ["conversation", "chat", "assistant", "helpful"]):
-        info["category"] = "💬 Conversational AI"
-    elif any(keyword in specialty.lower() for keyword in ["compact", "lightweight", "efficient", "quick", "fast"]):
-        info["category"] = "⚡ Efficient & Lightweight"
-    else:
-        info["category"] = "🤖 General Purpose"
-    
-    return info
+# Cached JSON payloads keyed by catalog snapshot version (stale-while-revalidate)
+_payload_cache = {}
 
-@app.route('/api/models')
-def get_models():
-    """Get available models with specialty information (always refreshes from Ollama)."""
+def conditional_json(payload, etag, max_age=None):
+    """Serve a JSON payload with ETag/If-None-Match support (304 when unchanged).
+
+    With ``max_age`` the browser may reuse the response that long before revalidating.
+    """
+    response = jsonify(payload)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache' if max_age is None else f'private, max-age={max_age}'
+    return response.make_conditional(request)
+
+def build_models_payload():
+    """Build (or reuse) the /api/models payload for the current catalog snapshot."""
     global available_models
     
-    # Always force refresh to detect newly downloaded models
-    print("🔄 Refreshing model list from Ollama...")
-    try:
-        all_models = model_manager.get_available_models(force_refresh=True)
-        available_models = filter_large_models(all_models)
-        
-        coding_models = model_manager.get_models_for_question_type(QuestionType.CODING)
-        # Also filter coding models
-        coding_models = [m for m in coding_models if m in available_models]
-    except Exception as e:
-        print(f"❌ Error refreshing models: {e}")
-        # Fallback to existing models if refresh fails
-        if not available_models:
-            available_models = []
-        coding_models = []
+    snapshot = model_manager.catalog.snapshot
+    cached = _payload_cache.get('models')
+    if cached and cached['version'] == snapshot.version:
+        return cached
+    
+    # Derive everything from the one snapshot so the payload is self-consistent
+    models, _ = snapshot.split_large(snapshot.names())
+    available_models = models
+    coding_models = snapshot.coding_names(models)
     
     # Add specialty information to each model
     models_with_info = []
-    for model in available_models:
-        model_info = get_model_info(model)
+    for model in models:
+        entry = snapshot.get(model)
         models_with_info.append({
             'name': model,
-            'specialty': model_info['specialty'],
-            'category': model_info['category'],
-            'description': model_info['description'],
-            'strengths': model_info['strengths'],
-            'is_coding': model in coding_models
+            'specialty': entry.specialty,
+            'category': entry.category,
+            'description': entry.description,
+            'strengths': list(entry.strengths),
+            'is_coding': entry.is_coding,
+            'size_gb': round(entry.size_gb, 1),
+            'parameter_size': entry.parameter_size,
+            'quantization': entry.quantization_level,
+            'aliases': [name for name in snapshot.aliases_of(model) if name in models]
         })
     
-    return jsonify({
-        'success': True,
-        'models': available_models,  # Keep original format for compatibility
-        'models_with_info': models_with_info,  # New enhanced format
-        'coding_models': coding_models,
-        'total_count': len(available_models),
-        'coding_count': len(coding_models),
-        'max_debate_participants': MAX_DEBATE_MODELS,
-        'debate_rounds': DEBATE_ROUNDS,
-        'note': 'Ultra-large models (70B+ parameters) are filtered out for optimal performance'
-    })
+    cached = {
+        'version': snapshot.version,
+        'etag': f"models-{snapshot.version}",
+        'payload': {
+            'success': True,
+            'models': models,  # Keep original format for compatibility
+            'models_with_info': models_with_info,  # New enhanced format
+            'coding_models': coding_models,
+            'total_count': len(models),
+            'coding_count': len(coding_models),
+            'max_debate_participants': MAX_DEBATE_MODELS,
+            'debate_rounds': DEBATE_ROUNDS,
+            'catalog_version': snapshot.version,
+            'catalog_source': snapshot.source,
+            'fetched_at': snapshot.fetched_at,
+            'note': 'Ultra-large models (70B+ parameters) are filtered out for optimal performance'
+        }
+    }
+    _payload_cache['models'] = cached
+    return cached
+
+def on_models_changed(diff):
+    """Push installed-model changes found by the background refresher to model-list subscribers."""
+    build_models_payload()
+    print(f"📣 Models changed: +{len(diff['added'])} -{len(diff['removed'])} ~{len(diff['changed'])}")
+    emitter.to_topic('models_changed', diff, 'models')
+
+model_manager.get_refresher().add_listener(on_models_changed)
+
+@app.route('/api/models')
+def get_models():
+    """Get available models with specialty information from the cached catalog snapshot."""
+    cached = build_models_payload()
+    return conditional_json(cached['payload'], cached['etag'])
 
 @app.route('/api/models/refresh')
 def refresh_models():
-    """Explicitly refresh the model list from Ollama."""
+    """Explicitly revalidate the model list against Ollama."""
     try:
         print("🔄 Explicit model refresh requested...")
         
-        # Get all models from Ollama
-        all_models = model_manager.get_available_models(force_refresh=True)
-        
-        # Filter out ultra-large models
-        filtered_models = filter_large_models(all_models)
-        
-        # Update global available models
-        global available_models
-        available_models = filtered_models
+        diff = model_manager.get_refresher().revalidate()
+        snapshot = model_manager.catalog.snapshot
+        filtered_models = build_models_payload()['payload']['models']
+        total_found = len(snapshot.entries)
         
         return jsonify({
             'success': True,
             'models': filtered_models,
             'count': len(filtered_models),
-            'total_found': len(all_models),
-            'filtered_count': len(all_models) - len(filtered_models),
+            'total_found': total_found,
+            'filtered_count': total_found - len(filtered_models),
+            'changes': diff,
             'timestamp': time.time(),
             'note': 'Models refreshed successfully. Ultra-large models (70B+ parameters) are automatically filtered out.'
         })
@@ -938,11 +858,18 @@ def get_system_info():
     """Get current system resource information."""
     try:
         info = model_manager.resource_manager.system_info
-        optimal_concurrent, _ = model_manager.resource_manager.optimize_concurrent_models(
-            model_manager.get_available_models()
-        )
+        snapshot = model_manager.catalog.snapshot
         
-        return jsonify({
+        # Concurrency only depends on the installed models, so compute it once per snapshot
+        cached = _payload_cache.get('concurrency')
+        if not cached or cached['version'] != snapshot.version:
+            optimal_concurrent, _ = model_manager.resource_manager.optimize_concurrent_models(
+                build_models_payload()['payload']['models']
+            )
+            cached = {'version': snapshot.version, 'optimal_concurrency': optimal_concurrent}
+            _payload_cache['concurrency'] = cached
+        
+        payload = {
             'success': True,
             'ram': {
                 'available': round(info.available_ram_gb, 1),
@@ -950,9 +877,15 @@ def get_system_info():
                 'usage_percent': round((1 - info.available_ram_gb / info.total_ram_gb) * 100, 1)
             },
             'cpu_cores': info.cpu_cores,
+            'limits': {
+                'memory_gb': round(info.memory_limit_gb, 1) if info.memory_limit_gb else None,
+                'cpu_quota': info.cpu_quota
+            },
             'gpus': info.gpu_info,
-            'optimal_concurrency': optimal_concurrent
-        })
+            'optimal_concurrency': cached['optimal_concurrency']
+        }
+        etag = hashlib.sha1(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+        return conditional_json(payload, f"system-{etag}")
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -970,6 +903,65 @@ def get_system_usage():
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@app.route('/api/system-usage/history')
+def get_system_usage_history():
+    """Get resource usage history (CPU, memory, network, in-flight models) for a time window."""
+    try:
+        window = request.args.get('window', 300, type=float)
+        return jsonify({
+            'success': True,
+            'history': model_manager.resource_manager.timeseries.history(window)
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/models/plan')
+def get_concurrency_plan():
+    """Get the concurrent wave plan for the selected (or all available) models."""
+    try:
+        selected = request.args.get('models')
+        models = selected.split(',') if selected else model_manager.get_available_models()
+        plan = model_manager.resource_manager.plan_concurrent_waves(
+            models, cpu_budget=model_manager.config.get("max_concurrent_requests", 3))
+        return jsonify({'success': True, 'plan': plan.to_dict()})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/concurrency')
+def get_concurrency_status():
+    """Get the live concurrency limit and recent controller decisions."""
+    try:
+        limit = request.args.get('limit', 50, type=int)
+        return jsonify({'success': True, 'concurrency': model_manager.concurrency.status(limit)})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/admission')
+def get_admission_status():
+    """Get running and queued query/debate jobs."""
+    return jsonify({'success': True, 'admission': admission.status()})
+
+@app.route('/api/admin/assets')
+def get_asset_stats():
+    """Get per-page shell and asset sizes for each content encoding."""
+    return jsonify({'success': True, 'pages': assets.stats()})
+
+@app.route('/api/admin/sessions')
+def get_session_stats():
+    """Get per-session held bytes, caps and cleanup counters."""
+    return jsonify({'success': True, 'sessions': sessions.stats()})
+
+@app.route('/api/admin/emits')
+def get_emit_stats():
+    """Get per-room Socket.IO emit counters, deliveries saved versus broadcasting, and frames/s vs tokens/s."""
+    return jsonify({'success': True, 'emits': emitter.stats(), 'streaming': frame_stats.snapshot(),
+                    'dashboard': dashboard_feed.stats()})
+
+@app.route('/api/admin/scheduler')
+def get_scheduler_status():
+    """Get per-lane/per-session queue depths and wait times of the query scheduler."""
+    return jsonify({'success': True, 'scheduler': model_manager.query_slots.status(), 'cluster': cluster.status()})
+
 
 # ========== DASHBOARD API ENDPOINTS ==========
 
@@ -1018,6 +1010,22 @@ def dashboard_llm():
     """Get LLM chat data for dashboard."""
     return jsonify(dashboard_provider.get_llm_chat_data())
 
+@app.route('/api/dashboard/bundle')
+def dashboard_bundle():
+    """Get every dashboard widget in one response (first paint and refreshes).
+
+    ``?widgets=time,stocks`` limits the bundle; ``?have=time:<version>,...``
+    leaves out widgets the client already has (an empty 'widgets' when that
+    is all of them). 304 only answers a matching If-None-Match.
+    """
+    names = request.args.get('widgets')
+    have = dict(item.split(':', 1) for item in request.args.get('have', '').split(',') if ':' in item)
+    bundle = dashboard_feed.bundle(names.split(',') if names else None, have)
+    # The body depends on which widgets the caller already has as well as on the versions
+    state = json.dumps([bundle['versions'], sorted(bundle['unchanged'])], sort_keys=True).encode('utf-8')
+    etag = f"dashboard-{hashlib.sha1(state).hexdigest()[:16]}"
+    return conditional_json(bundle, etag, max_age=bundle['max_age'])
+
 @app.route('/api/dashboard/models')
 def dashboard_models():
     """Get available models for dashboard LLM widget."""
@@ -1037,7 +1045,48 @@ def dashboard_models():
 @app.route('/dashboard')
 def dashboard():
     """Serve the dashboard page."""
-    return render_template('dashboard.html')
+    return assets.page('dashboard.html', compact_wire=wire.enabled)
+
+
+@socketio.on('ask_llm')
+def handle_ask_llm(data):
+    """Handle a dashboard quick question to a single model."""
+    reply = submit_dashboard_question(data, request.sid)
+    if reply:
+        emit(*reply)
+
+def submit_dashboard_question(data, session_id):
+    """Validate and admit a dashboard quick question; returns an (event, payload) error reply or None."""
+    sessions.touch(session_id)
+    question = data.get('question', '').strip()
+    model = data.get('model', '').strip()
+    
+    if not question or not model:
+        return 'llm_error', {'message': 'Please provide a question and select a model'}
+    
+    try:
+        admission.submit(
+            session_id, 'dashboard', process_dashboard_question,
+            args=(question, model, session_id),
+            estimate=model_manager.estimate_query_time([model])
+        )
+    except AdmissionRejected as e:
+        return 'llm_error', {'message': str(e), 'reason': e.reason, 'retry_after': e.retry_after}
+    return None
+
+async def process_dashboard_question(question: str, model: str, session_id: str):
+    """Answer a dashboard quick question on the shared async worker loop."""
+    set_job_context(session_id, 'dashboard')
+    emitter.to_session('llm_started', {'model': model}, session_id)
+    result = await model_manager.query_model(model, question)
+    if result.is_successful():
+        emitter.to_session('llm_response', {
+            'model': model,
+            'response': result.response,
+            'response_time': result.response_time
+        }, session_id)
+    else:
+        emitter.to_session('llm_error', {'message': result.error or 'No response'}, session_id)
 
 
 # ========== Q&A MODE ENDPOINTS ==========
@@ -1045,206 +1094,221 @@ def dashboard():
 @socketio.on('query_models')
 def handle_query(data):
     """Handle regular Q&A model query request."""
+    reply = submit_query(data, request.sid)
+    if reply:
+        emit(*reply)
+
+def submit_query(data, session_id):
+    """Validate and admit a Q&A query; returns an (event, payload) error reply or None."""
+    sessions.touch(session_id)
     question = data.get('question', '').strip()
     question_type_str = data.get('type', 'general')
     use_streaming = data.get('streaming', True)
     selected_models = data.get('selected_models', [])
-    session_id = request.sid
     
     if not question:
-        emit('error', {'message': 'Please provide a question'})
-        return
+        return 'error', {'message': 'Please provide a question'}
     
     # Determine question type
     question_type = QuestionType.CODING if question_type_str == 'coding' else QuestionType.GENERAL
     
-    # Start processing in background
-    thread = threading.Thread(
-        target=process_query_async,
-        args=(question, question_type, use_streaming, selected_models, session_id)
-    )
-    thread.daemon = True
-    thread.start()
-
-def process_query_async(question: str, question_type: QuestionType, use_streaming: bool, selected_models: list, session_id: str):
-    """Process query asynchronously."""
+    # Start processing in background once admitted
     try:
-        # Run in new event loop for thread
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        
-        loop.run_until_complete(
-            process_query(question, question_type, use_streaming, selected_models, session_id)
+        admission.submit(
+            session_id, 'query', process_query_async,
+            args=(question, question_type, use_streaming, selected_models, session_id),
+            estimate=model_manager.estimate_query_time(selected_models or available_models[:3])
         )
-        
-        loop.close()
-        
+    except AdmissionRejected as e:
+        return 'error', {'message': str(e), 'reason': e.reason, 'retry_after': e.retry_after}
+    return None
+
+async def process_query_async(question: str, question_type: QuestionType, use_streaming: bool, selected_models: list, session_id: str):
+    """Process the query on the shared async worker loop."""
+    set_job_context(session_id, 'interactive')
+    try:
+        with sessions.job(session_id) as job:
+            await process_query(question, question_type, use_streaming, selected_models, session_id, job)
     except Exception as e:
-        socketio.emit('error', {
+        emitter.to_session('error', {
             'message': f'Error processing query: {str(e)}',
             'session_id': session_id
-        })
+        }, session_id)
 
-async def process_query(question: str, question_type: QuestionType, use_streaming: bool, selected_models: list, session_id: str):
+async def process_query(question: str, question_type: QuestionType, use_streaming: bool, selected_models: list, session_id: str,
+                        job=None):
     """Process the actual query."""
     try:
         # Use selected models if provided, otherwise get appropriate models
         if selected_models:
-            # Validate that selected models are available
-            available_models = model_manager.get_available_models()
+            # Validate that selected models are available (listing may hit Ollama,
+            # so keep the blocking call off the shared loop)
+            available_models = await asyncio.get_running_loop().run_in_executor(
+                None, model_manager.get_available_models)
             models_to_query = [model for model in selected_models if model in available_models]
             
             if not models_to_query:
-                socketio.emit('error', {
+                emitter.to_session('error', {
                     'message': 'None of the selected models are available',
                     'session_id': session_id
-                })
+                }, session_id)
                 return
         else:
             # Fallback to automatic model selection
-            models_to_query = model_manager.get_models_for_question_type(question_type)
+            models_to_query = await asyncio.get_running_loop().run_in_executor(
+                None, model_manager.get_models_for_question_type, question_type)
         
         if not models_to_query:
-            socketio.emit('error', {
+            emitter.to_session('error', {
                 'message': 'No suitable models found for this question type',
                 'session_id': session_id
-            })
+            }, session_id)
             return
         
         # Enhance prompt
         enhanced_prompt = PromptEnhancer.enhance_prompt(question, question_type)
         
         # Emit query start
-        socketio.emit('query_started', {
+        emitter.to_session('query_started', {
             'question': question,
             'type': question_type.value,
             'models': models_to_query,
             'streaming': use_streaming,
             'session_id': session_id
-        })
+        }, session_id)
+        
+        async def notify_degraded(decision):
+            # Let the user know which models were swapped or deferred under memory pressure
+            emitter.to_session('models_substituted', dict(decision.to_dict(), session_id=session_id), session_id)
         
         if use_streaming:
             # Setup streaming handler
-            streaming_handler = WebStreamingHandler(session_id)
+            streaming_handler = WebStreamingHandler(session_id, job)
             
             # Query with streaming
-            responses = await model_manager.query_multiple_models(
-                models_to_query,
-                enhanced_prompt,
-                max_concurrent=3,
-                stream=True,
-                callback=streaming_handler.streaming_callback
-            )
+            try:
+                responses = await model_manager.query_multiple_models(
+                    models_to_query,
+                    enhanced_prompt,
+                    max_concurrent=3,
+                    stream=True,
+                    callback=streaming_handler.streaming_callback,
+                    on_degraded=notify_degraded
+                )
+            finally:
+                streaming_handler.coalescer.close()
         else:
             # Query without streaming
             responses = await model_manager.query_multiple_models(
                 models_to_query,
                 enhanced_prompt,
                 max_concurrent=3,
-                stream=False
+                stream=False,
+                on_degraded=notify_degraded
             )
             
             # Emit all responses at once
             for response in responses:
-                socketio.emit('response_received', {
+                if job:
+                    job.charge(response.response)
+                emitter.to_session('response_received', wire.large({
                     'model': response.model_name,
                     'response': response.response,
                     'response_time': response.response_time,
                     'error': response.error,
+                    'substituted_by': response.substituted_by,
                     'session_id': session_id
-                })
+                }), session_id)
         
         # Emit completion summary
         successful = [r for r in responses if r.is_successful()]
         failed = [r for r in responses if not r.is_successful()]
         
-        socketio.emit('query_completed', {
+        emitter.to_session('query_completed', {
             'successful_count': len(successful),
             'failed_count': len(failed),
             'failed_models': [{'model': r.model_name, 'error': r.error} for r in failed],
             'session_id': session_id
-        })
+        }, session_id)
         
     except Exception as e:
-        socketio.emit('error', {
+        emitter.to_session('error', {
             'message': f'Error during query processing: {str(e)}',
             'session_id': session_id
-        })
+        }, session_id)
 
 # ========== DEBATE MODE ENDPOINTS ==========
 
 @socketio.on('start_debate')
 def handle_start_debate(data):
     """Handle debate start request."""
+    reply = submit_debate(data, request.sid)
+    if reply:
+        emit(*reply)
+
+def submit_debate(data, session_id):
+    """Validate and admit a debate; returns an (event, payload) error reply or None."""
+    sessions.touch(session_id)
     topic = data.get('topic', '').strip()
     selected_models = data.get('selected_models', [])
     debate_rounds = data.get('debate_rounds', 3)  # Default to 3 rounds
-    session_id = request.sid
     
     if not topic:
-        emit('error', {'message': 'Please provide a debate topic'})
-        return
+        return 'error', {'message': 'Please provide a debate topic'}
     
     if not selected_models:
-        emit('error', {'message': 'Please select at least one model for the debate'})
-        return
+        return 'error', {'message': 'Please select at least one model for the debate'}
     
     if len(selected_models) > MAX_DEBATE_MODELS:
-        emit('error', {'message': f'Please select no more than {MAX_DEBATE_MODELS} models for optimal debate quality'})
-        return
+        return 'error', {'message': f'Please select no more than {MAX_DEBATE_MODELS} models for optimal debate quality'}
     
     # Validate rounds range
     if debate_rounds < 2 or debate_rounds > 5:
-        emit('error', {'message': 'Number of rounds must be between 2 and 5'})
-        return
+        return 'error', {'message': 'Number of rounds must be between 2 and 5'}
     
-    # Start processing in background
-    thread = threading.Thread(
-        target=process_enhanced_debate_async,
-        args=(topic, selected_models, debate_rounds, session_id)
-    )
-    thread.daemon = True
-    thread.start()
-
-def process_enhanced_debate_async(topic: str, selected_models: list, debate_rounds: int, session_id: str):
-    """Process enhanced debate asynchronously."""
+    # Start processing in background once admitted
     try:
-        # Run in new event loop for thread
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        
-        loop.run_until_complete(
-            process_enhanced_debate(topic, selected_models, debate_rounds, session_id)
+        admission.submit(
+            session_id, 'debate', process_enhanced_debate_async,
+            args=(topic, selected_models, debate_rounds, session_id),
+            estimate=model_manager.estimate_debate_time(selected_models, debate_rounds)
         )
-        
-        loop.close()
-        
+    except AdmissionRejected as e:
+        return 'error', {'message': str(e), 'reason': e.reason, 'retry_after': e.retry_after}
+    return None
+
+async def process_enhanced_debate_async(topic: str, selected_models: list, debate_rounds: int, session_id: str):
+    """Process the enhanced debate on the shared async worker loop."""
+    set_job_context(session_id, 'debate')
+    try:
+        with sessions.job(session_id) as job:
+            await process_enhanced_debate(topic, selected_models, debate_rounds, session_id, job)
     except Exception as e:
-        socketio.emit('error', {
+        emitter.to_session('error', {
             'message': f'Error processing debate: {str(e)}',
             'session_id': session_id
-        })
+        }, session_id)
 
-async def process_enhanced_debate(topic: str, selected_models: list, debate_rounds: int, session_id: str):
+async def process_enhanced_debate(topic: str, selected_models: list, debate_rounds: int, session_id: str, job=None):
     """Process the enhanced debate with better inter-model interaction."""
     try:
         global available_models
         
         if not available_models:
-            socketio.emit('error', {
+            emitter.to_session('error', {
                 'message': 'No models available for debate',
                 'session_id': session_id
-            })
+            }, session_id)
             return
         
         # Filter available models to only selected ones
         debate_models = [model for model in available_models if model in selected_models]
         
         if not debate_models:
-            socketio.emit('error', {
+            emitter.to_session('error', {
                 'message': 'Selected models are not available',
                 'session_id': session_id
-            })
+            }, session_id)
             return
         
         # Initialize enhanced debate manager
@@ -1255,22 +1319,23 @@ async def process_enhanced_debate(topic: str, selected_models: list, debate_roun
         selected_models = debate_models
         
         # Emit debate start
-        socketio.emit('debate_started', {
+        emitter.to_session('debate_started', {
             'topic': topic,
             'participants': selected_models,
             'rounds': debate_rounds,
             'session_id': session_id
-        })
+        }, session_id)
+        model_manager.resource_manager.timeseries.mark('debate_start', topic[:60], session_id=session_id)
         
         # Conduct enhanced debate rounds
         for round_num in range(1, debate_rounds + 1):
             debate_manager.current_round = round_num
             
-            socketio.emit('debate_round_started', {
+            emitter.to_session('debate_round_started', {
                 'round': round_num,
                 'total_rounds': debate_rounds,
                 'session_id': session_id
-            })
+            }, session_id)
             
             # Process each model individually for better interaction
             for model in selected_models:
@@ -1283,14 +1348,17 @@ async def process_enhanced_debate(topic: str, selected_models: list, debate_roun
                 )
                 
                 # Setup streaming handler
-                streaming_handler = DebateStreamingHandler(session_id)
+                streaming_handler = DebateStreamingHandler(session_id, job)
                 
                 # Query this model with streaming
-                response = await model_manager.query_model_streaming(
-                    model,
-                    prompt,
-                    callback=streaming_handler.streaming_callback
-                )
+                try:
+                    response = await model_manager.query_model_streaming(
+                        model,
+                        prompt,
+                        callback=streaming_handler.streaming_callback
+                    )
+                finally:
+                    streaming_handler.coalescer.close()
                 
                 # Store response immediately for next model to see
                 if response.is_successful():
@@ -1315,32 +1383,35 @@ async def process_enhanced_debate(topic: str, selected_models: list, debate_roun
                 if arg['round'] == round_num
             ]
             
-            socketio.emit('debate_round_completed', {
+            emitter.to_session('debate_round_completed', {
                 'round': round_num,
                 'results': round_results,
                 'session_id': session_id
-            })
+            }, session_id)
             
             # Pause between rounds
             if round_num < debate_rounds:
                 await asyncio.sleep(3)
         
         # Generate enhanced final summary
-        socketio.emit('debate_summary_started', {
+        emitter.to_session('debate_summary_started', {
             'session_id': session_id
-        })
+        }, session_id)
         
         # Use best model for summary
         summary_model = selected_models[0]
         summary_prompt = debate_manager.create_summary_prompt(topic, debate_manager.debate_history)
         
         summary_response = await model_manager.query_model(summary_model, summary_prompt, stream=False)
+        if job:
+            job.charge(summary_response.response)
         
         # Generate consensus analysis
         consensus_analysis = debate_manager.analyze_debate_consensus(topic, debate_manager.debate_history)
+        model_manager.resource_manager.timeseries.mark('debate_end', topic[:60], session_id=session_id)
         
         # Emit final results with enhanced analytics
-        socketio.emit('debate_completed', {
+        emitter.to_session('debate_completed', wire.large({
             'topic': topic,
             'participants': selected_models,
             'total_rounds': DEBATE_ROUNDS,
@@ -1352,55 +1423,44 @@ async def process_enhanced_debate(topic: str, selected_models: list, debate_roun
             'consensus_analysis': consensus_analysis,
             'debate_history': debate_manager.debate_history,
             'session_id': session_id
-        })
+        }), session_id)
         
     except Exception as e:
-        socketio.emit('error', {
+        emitter.to_session('error', {
             'message': f'Error during enhanced debate processing: {str(e)}',
             'session_id': session_id
-        })
+        }, session_id)
 
 @socketio.on('cancel_debate')
 def handle_cancel_debate(data):
     """Handle debate cancellation request."""
-    session_id = data.get('session_id') or request.sid
-    
-    try:
-        # Emit cancellation confirmation
-        socketio.emit('debate_cancelled', {
-            'message': 'Debate has been cancelled by user',
-            'session_id': session_id
-        }, room=session_id)
-        
-        print(f"🛑 Debate cancelled for session: {session_id}")
-        
-    except Exception as e:
-        print(f"❌ Error cancelling debate: {e}")
-        socketio.emit('error', {
-            'message': f'Error cancelling debate: {str(e)}',
-            'session_id': session_id
-        })
+    cancel_job(request.sid, 'debate')
 
 @socketio.on('cancel_query')
 def handle_cancel_query(data):
     """Handle query cancellation request."""
-    session_id = data.get('session_id') or request.sid
-    
+    cancel_job(request.sid, 'query')
+
+def cancel_job(session_id, kind):
+    """Drop a session's job of ``kind`` if it is still waiting for admission, and confirm."""
+    label = kind.capitalize()
     try:
+        admission.cancel(session_id, kind)
+        
         # Emit cancellation confirmation
-        socketio.emit('query_cancelled', {
-            'message': 'Query has been cancelled by user',
+        emitter.to_session(f'{kind}_cancelled', {
+            'message': f'{label} has been cancelled by user',
             'session_id': session_id
-        }, room=session_id)
+        }, session_id)
         
-        print(f"🛑 Query cancelled for session: {session_id}")
+        print(f"🛑 {label} cancelled for session: {session_id}")
         
     except Exception as e:
-        print(f"❌ Error cancelling query: {e}")
-        socketio.emit('error', {
-            'message': f'Error cancelling query: {str(e)}',
+        print(f"❌ Error cancelling {kind}: {e}")
+        emitter.to_session('error', {
+            'message': f'Error cancelling {kind}: {str(e)}',
             'session_id': session_id
-        })
+        }, session_id)
 
 # ========== COMMON ENDPOINTS ==========
 
@@ -1409,48 +1469,71 @@ def handle_connect():
     """Handle client connection."""
     print(f"Client connected: {request.sid}")
     emit('connected', {'session_id': request.sid})
+    sessions.touch(request.sid)
+    emitter.probe_rtt(request.sid)
+
+@socketio.on('subscribe')
+def handle_subscribe(data):
+    """Join shared-view topic rooms (e.g. 'dashboard', 'dashboard:stocks', 'models')."""
+    emit('subscribed', {'topics': subscribe_topics(request.sid, data)})
+
+@socketio.on('unsubscribe')
+def handle_unsubscribe(data):
+    """Leave shared-view topic rooms."""
+    unsubscribe_topics(request.sid, data)
+
+def subscribe_topics(session_id, data):
+    """Join topic rooms and start the dashboard widgets among them; returns the topics joined.
+
+    'dashboard' stands for every widget topic; ``data['versions']`` (widget ->
+    version) lets a reconnecting dashboard receive only what changed since.
+    """
+    sessions.touch(session_id)
+    topics = emitter.subscribe(session_id, dashboard_feed.expand(data.get('topics', [])))
+    dashboard_feed.subscribe(session_id, topics, data.get('versions'))
+    return topics
+
+def unsubscribe_topics(session_id, data):
+    topics = data.get('topics')
+    if topics is not None:
+        topics = dashboard_feed.expand(topics)
+    emitter.unsubscribe(session_id, topics)
+    dashboard_feed.unsubscribe(session_id, topics)
 
 @socketio.on('disconnect')
 def handle_disconnect():
     """Handle client disconnection."""
     print(f"Client disconnected: {request.sid}")
+    end_session(request.sid)
+
+def end_session(session_id):
+    """Drop a disconnected session's queued and running jobs and per-session state."""
+    admission.cancel(session_id)
+    sessions.release(session_id)
+    emitter.forget_session(session_id)
+    dashboard_feed.forget_session(session_id)
+    wire.forget_session(session_id)
+
+def expire_session(session_id):
+    """Release an idle session; one that is no longer connected is ended entirely."""
+    if emitter.members(session_id):
+        sessions.release(session_id)
+    else:
+        end_session(session_id)
 
 
 # ========== DASHBOARD BACKGROUND UPDATES ==========
 
 def start_dashboard_background_updates():
-    """Start background thread for dashboard data updates."""
-    def update_dashboard():
-        while True:
-            try:
-                # Update every 5 seconds
-                time.sleep(5)
-                
-                # Emit dashboard updates to all connected clients
-                socketio.emit('dashboard_update', {
-                    'time': dashboard_provider.get_time_data(),
-                    'stocks': dashboard_provider.get_stock_data(),
-                    'system': dashboard_provider.get_system_stats(),
-                    'llm': dashboard_provider.get_llm_chat_data()
-                }, namespace='/')
-                
-            except Exception as e:
-                print(f"Dashboard update error: {e}")
-                time.sleep(10)  # Wait longer on error
-    
-    # Start background thread
-    update_thread = threading.Thread(target=update_dashboard, daemon=True)
-    update_thread.start()
+    """Start the dashboard feed thread (idle until a dashboard subscribes)."""
+    dashboard_feed.start()
     print("📊 Dashboard background updates started")
 
 
 # ========== MAIN APPLICATION ==========
 
-if __name__ == '__main__':
-    print("🚀 Starting Unified Multi-Model Application...")
-    print("📡 Server will be available at: http://localhost:5000")
-    print("🔄 Features: Q&A Mode + Enhanced Debate Mode + Live Dashboard")
-    
+def start_background_services():
+    """Load the model list and start the refresher and usage sampler (shared by both server modes)."""
     # Initialize models on startup with filtering
     startup_models = initialize_models_on_startup()
     
@@ -1458,8 +1541,33 @@ if __name__ == '__main__':
         print("⚠️  Warning: No models available. The application will start but functionality will be limited.")
         print("   Please ensure Ollama is running and models are installed.")
     
+    # Revalidate the model list in the background instead of on page loads
+    model_manager.start_background_refresh()
+    
+    # Sample system usage in the background so usage endpoints never block
+    model_manager.resource_manager.start_usage_sampler(config_manager.get("usage_sample_interval", 1.0))
+    
+    # Expire state of sessions that have gone idle (or whose disconnect was missed)
+    sessions.start_sweeper()
+    
+    # Extract and precompress page assets before the first page load
+    for template in ('unified.html', 'dashboard.html'):
+        assets.warm(app, template, compact_wire=wire.enabled)
+
+def run_flask(host='0.0.0.0', port=5000, debug=True):
+    """Run the threaded Flask-SocketIO server (the default mode; see asgi_app.py for ASGI)."""
+    print("🚀 Starting Unified Multi-Model Application...")
+    print(f"📡 Server will be available at: http://localhost:{port}")
+    print("🔄 Features: Q&A Mode + Enhanced Debate Mode + Live Dashboard")
+    
+    start_background_services()
+    async_worker.start(config_manager.get("use_uvloop", True))
+    
     # Start dashboard background updates
     start_dashboard_background_updates()
     
     print("\n🌐 Starting unified web server...")
-    socketio.run(app, debug=True, host='0.0.0.0', port=5000)
+    socketio.run(app, debug=debug, host=host, port=port, allow_unsafe_werkzeug=not debug)
+
+if __name__ == '__main__':
+    run_flask()
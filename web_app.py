@@ -7,9 +7,8 @@ Flask-based web interface for querying multiple models through Ollama.
 import asyncio
 import json
 from datetime import datetime
-from flask import Flask, render_template, request, jsonify, Response
+from flask import Flask, request, jsonify, Response
 from flask_socketio import SocketIO, emit
-import threading
 import queue
 import time
 
@@ -20,40 +19,39 @@ from models import (
     PromptEnhancer,
     ModelResponse
 )
+from admission import AdmissionQueue, AdmissionRejected
+from async_worker import async_worker
+from scheduler import set_job_context
+from socket_rooms import RoomEmitter
+from coalescing import ChunkCoalescer, frame_stats
+from asset_pipeline import AssetPipeline
+from session_state import SessionRegistry
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'your-secret-key-here'
 socketio = SocketIO(app, cors_allowed_origins="*")
 
+# Events go to the asking session's room (or a subscribed topic), never to everyone
+emitter = RoomEmitter(socketio)
+
 # Global instances
 config_manager = ConfigManager()
 model_manager = OllamaModelManager(config_manager)
+assets = AssetPipeline.from_config(config_manager)
 available_models = []
 
+# Bounded admission in front of the query/debate workers
+admission = AdmissionQueue.from_config(config_manager, on_queued=emitter.queued)
+
+# Per-session byte accounting and caps; state is released on disconnect or when idle
+sessions = SessionRegistry.from_config(config_manager, on_expire=lambda session_id: expire_session(session_id))
+
 def filter_large_models(models):
     """Filter out ultra-large models (70B+ parameters) that may be too resource intensive."""
-    filtered_models = []
-    excluded_models = []
+    filtered_models, excluded_models = model_manager.catalog.snapshot.split_large(models)
     
-    for model in models:
-        model_lower = model.lower()
-        
-        # Check for ultra-large model indicators
-        is_ultra_large = any([
-            '70b' in model_lower,
-            '72b' in model_lower,
-            '405b' in model_lower,
-            'llama3.1:70b' in model_lower,
-            'llama3.2:70b' in model_lower,
-            'qwen2.5:72b' in model_lower,
-            'codellama:70b' in model_lower
-        ])
-        
-        if is_ultra_large:
-            excluded_models.append(model)
-            print(f"⚠️  Excluding ultra-large model: {model} (likely 70B+ parameters)")
-        else:
-            filtered_models.append(model)
+    for model in excluded_models:
+        print(f"⚠️  Excluding ultra-large model: {model} (likely 70B+ parameters)")
     
     if excluded_models:
         print(f"📊 Filtered {len(excluded_models)} ultra-large models, {len(filtered_models)} models available")
@@ -108,46 +106,60 @@ def initialize_models_on_startup():
 class WebStreamingHandler:
     """Handles streaming responses for web interface."""
     
-    def __init__(self, session_id):
+    def __init__(self, session_id, job=None):
         self.session_id = session_id
-        self.responses = {}
+        # Streamed text is not kept here: the model query builds it, charged to the session's job
+        self.job = job
         self.start_times = {}
+        self.coalescer = ChunkCoalescer.from_config(
+            config_manager, self._emit_chunk, rtt=lambda: emitter.rtt(session_id))
+        emitter.probe_rtt(session_id)
+    
+    def _emit_chunk(self, model_name: str, text: str):
+        """Send one coalesced frame of streamed text to the client."""
+        emitter.to_session('chunk_received', {
+            'model': model_name,
+            'chunk': text,
+            'session_id': self.session_id
+        }, self.session_id)
     
     async def streaming_callback(self, model_name: str, chunk: str, is_done: bool):
         """Callback for streaming model responses."""
         if chunk and not is_done:
             # Initialize model tracking if first chunk
-            if model_name not in self.responses:
-                self.responses[model_name] = ""
+            if model_name not in self.start_times:
                 self.start_times[model_name] = time.time()
-                socketio.emit('model_started', {
+                emitter.to_session('model_started', {
                     'model': model_name,
                     'session_id': self.session_id
-                })
-            
-            # Add chunk to response
-            self.responses[model_name] += chunk
+                }, self.session_id)
             
-            # Emit chunk to client
-            socketio.emit('chunk_received', {
-                'model': model_name,
-                'chunk': chunk,
-                'session_id': self.session_id
-            })
+            # Count the chunk against the session's cap; the coalescer batches chunks into frames
+            if self.job:
+                self.job.charge(chunk)
+            self.coalescer.add(model_name, chunk)
             
         elif is_done:
+            # Final flush before announcing completion
+            self.coalescer.finish(model_name)
+            
             # Model completed
             elapsed_time = time.time() - self.start_times.get(model_name, 0)
-            socketio.emit('model_completed', {
+            emitter.to_session('model_completed', {
                 'model': model_name,
                 'elapsed_time': elapsed_time,
                 'session_id': self.session_id
-            })
+            }, self.session_id)
 
 @app.route('/')
 def index():
     """Main page."""
-    return render_template('index.html')
+    return assets.page('index.html')
+
+@app.route('/assets/<name>')
+def asset(name):
+    """Serve a hashed CSS/JS asset extracted from the page template."""
+    return assets.asset(name)
 
 @app.route('/api/models')
 def get_models():
@@ -216,6 +228,18 @@ def get_system_usage():
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@app.route('/api/system-usage/history')
+def get_system_usage_history():
+    """Get resource usage history (CPU, memory, network, in-flight models) for a time window."""
+    try:
+        window = request.args.get('window', 300, type=float)
+        return jsonify({
+            'success': True,
+            'history': model_manager.resource_manager.timeseries.history(window)
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 @app.route('/api/models/refresh')
 def refresh_models():
     """Refresh the model list from Ollama with filtering."""
@@ -268,15 +292,21 @@ def get_model_analysis():
                 'size_gb': model_info.size_gb,
                 'min_ram_gb': model_info.min_ram_gb,
                 'recommended_ram_gb': model_info.recommended_ram_gb,
+                'kv_cache_gb': model_info.kv_cache_gb,
+                'quantization': model_info.quantization,
+                'estimate_source': model_info.source,
                 'type': model_info.type,
                 'status': status
             })
         
         available_ram = model_manager.resource_manager.system_info.available_ram_gb
+        plan = model_manager.resource_manager.plan_concurrent_waves(
+            models, cpu_budget=model_manager.config.get("max_concurrent_requests", 3))
         
         return jsonify({
             'success': True,
             'models': analysis,
+            'plan': plan.to_dict(),
             'summary': {
                 'total_estimated_ram': round(total_estimated_ram, 1),
                 'available_ram': round(available_ram, 1),
@@ -288,16 +318,51 @@ def get_model_analysis():
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@app.route('/api/concurrency')
+def get_concurrency_status():
+    """Get the live concurrency limit and recent controller decisions."""
+    try:
+        limit = request.args.get('limit', 50, type=int)
+        return jsonify({'success': True, 'concurrency': model_manager.concurrency.status(limit)})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/admin/sessions')
+def get_session_stats():
+    """Get per-session held bytes, caps and cleanup counters."""
+    return jsonify({'success': True, 'sessions': sessions.stats()})
+
+@app.route('/api/admin/emits')
+def get_emit_stats():
+    """Get per-room Socket.IO emit counters, deliveries saved versus broadcasting, and frames/s vs tokens/s."""
+    return jsonify({'success': True, 'emits': emitter.stats(), 'streaming': frame_stats.snapshot()})
+
 @socketio.on('connect')
 def handle_connect():
     """Handle client connection."""
     print(f"Client connected: {request.sid}")
     emit('connected', {'session_id': request.sid})
+    sessions.touch(request.sid)
+    emitter.probe_rtt(request.sid)
 
 @socketio.on('disconnect')
 def handle_disconnect():
     """Handle client disconnection."""
     print(f"Client disconnected: {request.sid}")
+    end_session(request.sid)
+
+def end_session(session_id):
+    """Drop a disconnected session's queued and running jobs and per-session state."""
+    admission.cancel(session_id)
+    sessions.release(session_id)
+    emitter.forget_session(session_id)
+
+def expire_session(session_id):
+    """Release an idle session; one that is no longer connected is ended entirely."""
+    if emitter.members(session_id):
+        sessions.release(session_id)
+    else:
+        end_session(session_id)
 
 @socketio.on('query_models')
 def handle_query(data):
@@ -314,105 +379,115 @@ def handle_query(data):
     # Determine question type
     question_type = QuestionType.CODING if question_type_str == 'coding' else QuestionType.GENERAL
     
-    # Start processing in background
-    thread = threading.Thread(
-        target=process_query_async,
-        args=(question, question_type, use_streaming, session_id)
-    )
-    thread.daemon = True
-    thread.start()
-
-def process_query_async(question: str, question_type: QuestionType, use_streaming: bool, session_id: str):
-    """Process query asynchronously."""
+    # Start processing in background once admitted
     try:
-        # Run in new event loop for thread
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        
-        result = loop.run_until_complete(
-            process_query(question, question_type, use_streaming, session_id)
+        admission.submit(
+            session_id, 'query', process_query_async,
+            args=(question, question_type, use_streaming, session_id),
+            estimate=model_manager.estimate_query_time(available_models[:3])
         )
-        
-        loop.close()
-        
+    except AdmissionRejected as e:
+        emit('error', {'message': str(e), 'reason': e.reason, 'retry_after': e.retry_after})
+
+async def process_query_async(question: str, question_type: QuestionType, use_streaming: bool, session_id: str):
+    """Process the query on the shared async worker loop."""
+    set_job_context(session_id, 'interactive')
+    try:
+        with sessions.job(session_id) as job:
+            await process_query(question, question_type, use_streaming, session_id, job)
     except Exception as e:
-        socketio.emit('error', {
+        emitter.to_session('error', {
             'message': f'Error processing query: {str(e)}',
             'session_id': session_id
-        })
+        }, session_id)
 
-async def process_query(question: str, question_type: QuestionType, use_streaming: bool, session_id: str):
+async def process_query(question: str, question_type: QuestionType, use_streaming: bool, session_id: str,
+                        job=None):
     """Process the actual query."""
     try:
         # Get appropriate models
-        models_to_query = model_manager.get_models_for_question_type(question_type)
+        # Model listing may hit Ollama; keep blocking I/O off the shared loop
+        models_to_query = await asyncio.get_running_loop().run_in_executor(
+            None, model_manager.get_models_for_question_type, question_type)
         
         if not models_to_query:
-            socketio.emit('error', {
+            emitter.to_session('error', {
                 'message': 'No suitable models found for this question type',
                 'session_id': session_id
-            })
+            }, session_id)
             return
         
         # Enhance prompt
         enhanced_prompt = PromptEnhancer.enhance_prompt(question, question_type)
         
         # Emit query start
-        socketio.emit('query_started', {
+        emitter.to_session('query_started', {
             'question': question,
             'type': question_type.value,
             'models': models_to_query,
             'streaming': use_streaming,
             'session_id': session_id
-        })
+        }, session_id)
+        
+        async def notify_degraded(decision):
+            # Let the user know which models were swapped or deferred under memory pressure
+            emitter.to_session('models_substituted', dict(decision.to_dict(), session_id=session_id), session_id)
         
         if use_streaming:
             # Setup streaming handler
-            streaming_handler = WebStreamingHandler(session_id)
+            streaming_handler = WebStreamingHandler(session_id, job)
             
             # Query with streaming
-            responses = await model_manager.query_multiple_models(
-                models_to_query,
-                enhanced_prompt,
-                max_concurrent=3,
-                stream=True,
-                callback=streaming_handler.streaming_callback
-            )
+            try:
+                responses = await model_manager.query_multiple_models(
+                    models_to_query,
+                    enhanced_prompt,
+                    max_concurrent=3,
+                    stream=True,
+                    callback=streaming_handler.streaming_callback,
+                    on_degraded=notify_degraded
+                )
+            finally:
+                streaming_handler.coalescer.close()
         else:
             # Query without streaming
             responses = await model_manager.query_multiple_models(
                 models_to_query,
                 enhanced_prompt,
                 max_concurrent=3,
-                stream=False
+                stream=False,
+                on_degraded=notify_degraded
             )
             
             # Emit all responses at once
             for response in responses:
-                socketio.emit('response_received', {
+                if job:
+                    job.charge(response.response)
+                emitter.to_session('response_received', {
                     'model': response.model_name,
                     'response': response.response,
                     'response_time': response.response_time,
                     'error': response.error,
+                    'substituted_by': response.substituted_by,
                     'session_id': session_id
-                })
+                }, session_id)
         
         # Emit completion summary
         successful = [r for r in responses if r.is_successful()]
         failed = [r for r in responses if not r.is_successful()]
         
-        socketio.emit('query_completed', {
+        emitter.to_session('query_completed', {
             'successful_count': len(successful),
             'failed_count': len(failed),
             'failed_models': [{'model': r.model_name, 'error': r.error} for r in failed],
             'session_id': session_id
-        })
+        }, session_id)
         
     except Exception as e:
-        socketio.emit('error', {
+        emitter.to_session('error', {
             'message': f'Error during query processing: {str(e)}',
             'session_id': session_id
-        })
+        }, session_id)
 
 if __name__ == '__main__':
     print("🚀 Starting Multi-Model Query Web UI...")
@@ -425,5 +500,11 @@ if __name__ == '__main__':
         print("⚠️  Warning: No models available. The application will start but functionality will be limited.")
         print("   Please ensure Ollama is running and models are installed.")
     
+    # Sample system usage in the background so usage endpoints never block
+    model_manager.resource_manager.start_usage_sampler(config_manager.get("usage_sample_interval", 1.0))
+    # Expire state of sessions that have gone idle (or whose disconnect was missed)
+    sessions.start_sweeper()
+    async_worker.start(config_manager.get("use_uvloop", True))
+    
     print("\n🌐 Starting web server...")
     socketio.run(app, debug=True, host='0.0.0.0', port=5000)
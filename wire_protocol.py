@@ -0,0 +1,80 @@
+"""
+Compact wire protocol module for the multi-model query application.
+
+With ``compact_wire`` enabled the unified app uses the Socket.IO MessagePack
+serializer and shrinks its two kinds of heavy traffic:
+
+- streamed chunks are sent as ``[model_id, text]`` instead of a dict that
+  repeats the ``model``, ``chunk`` and ``session_id`` keys; IDs are assigned
+  once per session and announced in ``model_started`` events;
+- large end-of-query payloads (full responses, the debate history) above
+  ``compress_threshold`` bytes are sent as ``{'deflated': <zlib bytes>}``,
+  which browsers inflate with ``DecompressionStream('deflate')``.
+
+The threading server's WebSocket transport has no permessage-deflate support,
+so compression is applied per payload rather than per connection. MessagePack
+is optional; without it the app keeps the JSON protocol.
+"""
+
+import json
+import threading
+import zlib
+from typing import Dict, List, Union
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+class CompactWire:
+    """Per-session model IDs and payload compression for the compact protocol."""
+
+    def __init__(self, enabled: bool = False, compress_threshold: int = 4096):
+        self.requested = enabled
+        self.enabled = enabled and msgpack is not None
+        self.compress_threshold = compress_threshold
+        self._ids: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+        if enabled and not self.enabled:
+            print("⚠️  compact_wire needs the msgpack package; using JSON payloads")
+
+    @classmethod
+    def from_config(cls, config) -> "CompactWire":
+        """Build the protocol from the ``compact_wire`` settings of a ConfigManager."""
+        return cls(
+            enabled=config.get("compact_wire", False),
+            compress_threshold=config.get("wire_compress_threshold", 4096)
+        )
+
+    @property
+    def serializer(self) -> str:
+        """The python-socketio serializer name for this protocol."""
+        return 'msgpack' if self.enabled else 'default'
+
+    def model_id(self, session_id: str, model: str) -> int:
+        """Integer ID of ``model`` within ``session_id``, assigned on first use."""
+        with self._lock:
+            ids = self._ids.setdefault(session_id, {})
+            if model not in ids:
+                ids[model] = len(ids)
+            return ids[model]
+
+    def chunk(self, session_id: str, model: str, text: str) -> Union[Dict, List]:
+        """Payload for one streamed chunk."""
+        if self.enabled:
+            return [self.model_id(session_id, model), text]
+        return {'model': model, 'chunk': text, 'session_id': session_id}
+
+    def large(self, payload: Dict) -> Dict:
+        """Deflate a large payload (compact mode only, above the threshold)."""
+        if not self.enabled:
+            return payload
+        encoded = json.dumps(payload).encode('utf-8')
+        if len(encoded) < self.compress_threshold:
+            return payload
+        return {'deflated': zlib.compress(encoded)}
+
+    def forget_session(self, session_id: str):
+        with self._lock:
+            self._ids.pop(session_id, None)